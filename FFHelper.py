@@ -1,14 +1,167 @@
-#import pandas to read csv files, math to perform calculations and round, random to randomize weather
-import pandas as pd
+#import csv to read csv files, math to perform calculations and round, random to randomize weather
+#pandas and numpy are heavy to import, so they are only imported inside the functions that use them
+import csv
+import heapq
 import math
 import random
+import json
+import os
+from array import array
+from collections import namedtuple
+
+import league
+from cache_utils import cache_dir, file_digest
+from weather import WEATHER_TYPES, default_sampler
+
+#model constants shared by the per-game simulator and the vectorized engine
+HOME_MULTIPLIER = 1.05
+WIN_STREAK_BONUS = 0.02
+
+#weather -> (team efficiency multiplier, net production multiplier)
+WEATHER_EFFECTS = {
+    "Clear": (1, 1),
+    "Rain": (0.9, 1.1), #worse passing, better rushing
+    "Snow": (0.8, 1.2), #worse offense entirely, boost defense entirely
+    "Wind": (0.85, 1.15), #worse passing, better defense
+}
+
+#LSRL (slope, intercept) pairs for expected points for, expected points allowed and expected wins
+X_OFF_LINE = (0.19, 12)
+X_DEF_LINE = (-1.24, 30.8)
+X_WINS_LINE = (0.418, 8.5)
+
+#one simulated game, scores are the final ones after the home and win streak multipliers
+GameResult = namedtuple("GameResult", ["week", "home", "away", "weather", "home_score", "away_score", "outcome", "season"], defaults=[0])
+
+
+class TeamTable:
+    """
+    This class stores the stats of many teams with one contiguous column per stat
+    """
+
+    #float columns, Team reads and writes its row of each of these
+    FLOAT_COLUMNS = ("points_per_game", "off", "plays_per_game", "team_efficiency",
+                     "points_allowed_per_game", "de", "offensive_production_allowed",
+                     "x_off", "x_def", "net", "x_wins", "x_losses",
+                     "qb_production", "rb_production", "wr_production", "te_production",
+                     "qb_allowed", "rb_allowed", "wr_allowed", "te_allowed")
+
+    __slots__ = FLOAT_COLUMNS + ("net_production", "names", "version", "_matchups")
+
+    def __init__(self):
+        """
+        Initialize an empty table.
+        """
+        for column in self.FLOAT_COLUMNS:
+            setattr(self, column, array("d"))
+        #rounded net production, precomputed so simulate_game never recalculates it
+        self.net_production = array("q")
+        self.names = []
+        #bumped on every write through Team, so cached matchup scores know when they are stale
+        self.version = 0
+        self._matchups = None
+
+
+    def __len__(self):
+        """
+        Return the number of teams in the table
+        """
+        return len(self.names)
+
+
+    def add_row(self, name):
+        """
+        Add a zeroed row for a team
+
+        args:
+        name: name of the team
+
+        return:
+        index of the new row
+        """
+        for column in self.FLOAT_COLUMNS:
+            getattr(self, column).append(0.0)
+        self.net_production.append(0)
+        self.names.append(name)
+        self.version += 1
+        return len(self.names) - 1
+
+
+    def column(self, column):
+        """
+        Return a whole stat column
+
+        args:
+        column: name of the column, one of FLOAT_COLUMNS or "net_production"
+
+        return:
+        array.array, numpy can view it without copying through numpy.frombuffer
+        """
+        return getattr(self, column)
+
+
+    def matchups(self):
+        """
+        Return the matchup index of the table's teams, rebuilding it only after a stat changed
+
+        return:
+        matchups.MatchupIndex indexed by row, None when the table has too many teams for a pairwise index
+        """
+        if self._matchups is None or self._matchups.version != self.version:
+            from matchups import MAX_INDEX_TEAMS, MatchupIndex
+            if len(self) > MAX_INDEX_TEAMS:
+                return None
+            self._matchups = MatchupIndex(self)
+        return self._matchups
+
+
+
+def _table_column(column):
+    """
+    Create a property that reads and writes a team's row of a TeamTable column
+
+    args:
+    column: name of the column
+    """
+    def get(self):
+        return getattr(self.table, column)[self.index]
+
+    def set(self, value):
+        getattr(self.table, column)[self.index] = value
+        self.table.version += 1
+
+    return property(get, set)
+
+
 
 class Team:
     """
     This class creates an individual team object
     """
+
+    __slots__ = ("name", "table", "index", "games_played", "current_wins", "current_losses", "current_ties", "win_streak")
+
+    #stats live in the team's TeamTable row
+    points_per_game = _table_column("points_per_game")
+    plays_per_game = _table_column("plays_per_game")
+    team_efficiency = _table_column("team_efficiency")
+    points_allowed_per_game = _table_column("points_allowed_per_game")
+    offensive_production_allowed = _table_column("offensive_production_allowed")
+    x_off = _table_column("x_off")
+    x_def = _table_column("x_def")
+    net = _table_column("net")
+    x_wins = _table_column("x_wins")
+    x_losses = _table_column("x_losses")
+    qb_production = _table_column("qb_production")
+    rb_production = _table_column("rb_production")
+    wr_production = _table_column("wr_production")
+    te_production = _table_column("te_production")
+    qb_allowed = _table_column("qb_allowed")
+    rb_allowed = _table_column("rb_allowed")
+    wr_allowed = _table_column("wr_allowed")
+    te_allowed = _table_column("te_allowed")
     
-    def __init__(self, name, offense_stats, defense_stats):
+    def __init__(self, name, offense_stats, defense_stats, table=None):
         """  
         Initialize a team instance.
 
@@ -16,8 +169,11 @@ class Team:
         name: Name of the team.
         offense_stats: A dictionary containing the team's offensive production
         defense_stats: A dictionary containing the team's defensive production
+        table: TeamTable to store the stats in, a new one-team table is made when None
         """
         self.name = name
+        self.table = table if table is not None else TeamTable()
+        self.index = self.table.add_row(name)
 
         #offense stats
         self.games_played = offense_stats.get("GP", 0)
@@ -25,10 +181,18 @@ class Team:
         self.off = offense_stats.get("All", 0)
         self.plays_per_game = offense_stats.get("Run", 0) + offense_stats.get("Pass", 0)
         self.team_efficiency = self.off / self.plays_per_game
+        self.qb_production = offense_stats.get("QB", 0)
+        self.rb_production = offense_stats.get("RB", 0)
+        self.wr_production = offense_stats.get("WR", 0)
+        self.te_production = offense_stats.get("TE", 0)
 
         #defense stats
         self.points_allowed_per_game = defense_stats.get("PA", 0)
         self.de = defense_stats.get("DEF", 0)
+        self.qb_allowed = defense_stats.get("QB", 0)
+        self.rb_allowed = defense_stats.get("RB", 0)
+        self.wr_allowed = defense_stats.get("WR", 0)
+        self.te_allowed = defense_stats.get("TE", 0)
         self.offensive_production_allowed = defense_stats.get("QB", 0) + defense_stats.get("RB", 0) + defense_stats.get("WR", 0) + defense_stats.get("TE", 0)
         
         # stats to calculate expected wins and losses
@@ -48,23 +212,28 @@ class Team:
         self.calculate_expected_wins()
     
     
-    def calculate_expected_wins(self):
+    def calculate_expected_wins(self, x_off_line=None, x_def_line=None, x_wins_line=None):
         """
         Calculate the expected wins for each team based on offensive and defensive production
         
         args:
         self
+        x_off_line, x_def_line, x_wins_line: (slope, intercept) pairs, e.g. refit by regression.fit_lsrl,
+                                             default to X_OFF_LINE, X_DEF_LINE and X_WINS_LINE
         """
+        x_off_line = x_off_line or X_OFF_LINE
+        x_def_line = x_def_line or X_DEF_LINE
+        x_wins_line = x_wins_line or X_WINS_LINE
         # Calculate Expected Points on offense per game
-        self.x_off = 0.19 * (self.off) + 12
+        self.x_off = x_off_line[0] * (self.off) + x_off_line[1]
         # Calculate Expected Points allowed on defense per game
-        self.x_def = -1.24 * (self.de) + 30.8
+        self.x_def = x_def_line[0] * (self.de) + x_def_line[1]
         # Calculate Net Rating
         self.net = self.x_off - self.x_def
         # Calculate expected wins
-        self.x_wins = 0.418 * (self.net) + 8.5
+        self.x_wins = x_wins_line[0] * (self.net) + x_wins_line[1]
         # Calculate expected losses
-        self.x_losses = 17 - self.x_wins
+        self.x_losses = league.SEASON_GAMES - self.x_wins
         
         
     def expected_points_for(self):
@@ -80,9 +249,40 @@ class Team:
         return self.points_per_game * self.team_efficiency
      
         
+    @property
+    def off(self):
+        return self.table.off[self.index]
+
+    @off.setter
+    def off(self, value):
+        self.table.off[self.index] = value
+        self.update_net_production()
+
+
+    @property
+    def de(self):
+        return self.table.de[self.index]
+
+    @de.setter
+    def de(self, value):
+        self.table.de[self.index] = value
+        self.update_net_production()
+
+
+    def update_net_production(self):
+        """
+        Recalculate the stored net production after off or de changes
+        
+        args:
+        self
+        """
+        self.table.net_production[self.index] = round(self.off + self.de * 7.06)
+        self.table.version += 1
+
+
     def calculate_net_production(self):
         """
-        Calculate the team's net production using an original formula
+        Return the team's net production using an original formula, round(off + de * 7.06)
         
         args:
         self
@@ -90,7 +290,7 @@ class Team:
         return:
         rounded value
         """
-        return round(self.off + self.de * 7.06)
+        return self.table.net_production[self.index]
 
 
     def __repr__(self):
@@ -111,6 +311,43 @@ class Team:
                 f"Net Production: {self.calculate_net_production()}, Expected Net Rating: {round(self.net, 2)}")
         
         
+    def to_dict(self):
+        """
+        Return the team's stats as a dictionary of plain values
+        
+        args:
+        self
+        
+        return:
+        dictionary of stats
+        """
+        return {
+            "name": self.name,
+            "games_played": self.games_played,
+            "points_per_game": self.points_per_game,
+            "off": self.off,
+            "plays_per_game": self.plays_per_game,
+            "team_efficiency": self.team_efficiency,
+            "points_allowed_per_game": self.points_allowed_per_game,
+            "de": self.de,
+            "offensive_production_allowed": self.offensive_production_allowed,
+            "x_off": self.x_off,
+            "x_def": self.x_def,
+            "net_production": self.calculate_net_production(),
+            "net": self.net,
+            "x_wins": self.x_wins,
+            "x_losses": self.x_losses,
+            "qb_production": self.qb_production,
+            "rb_production": self.rb_production,
+            "wr_production": self.wr_production,
+            "te_production": self.te_production,
+            "qb_allowed": self.qb_allowed,
+            "rb_allowed": self.rb_allowed,
+            "wr_allowed": self.wr_allowed,
+            "te_allowed": self.te_allowed,
+        }
+        
+        
     def update_record(self, result):
         """
         Update the team's record based on a game result
@@ -155,88 +392,169 @@ def reset_all_teams(teams):
 
 
 
-def create_teams(offense_file, defense_file):
+#offense csv header, the file has two "All" columns: total fantasy production, then total plays
+OFFENSE_COLUMNS = ["Name", "GP", "PTS", "All", "QB", "RB", "WR", "TE", "Plays", "Run", "Run%", "Pass", "Pass%"]
+
+#columns Team needs from each file and the dtypes they are parsed with
+OFFENSE_DTYPES = {"Name": str, "GP": "int64", "PTS": "float64", "All": "float64", "QB": "float64", "RB": "float64",
+                  "WR": "float64", "TE": "float64", "Run": "float64", "Pass": "float64"}
+DEFENSE_DTYPES = {"Name": str, "PA": "float64", "DEF": "float64", "QB": "float64", "RB": "float64", "WR": "float64", "TE": "float64"}
+
+#bump when the cached team rows change shape
+TEAM_CACHE_VERSION = 2
+
+
+def read_team_rows(offense_file, defense_file):
     """
-    Create a dictionary of teams using offense and defense data from CSV files
+    Read the offense and defense CSV files and join them into one row per team
 
     offense_file: Path to the Fantasy Offense Stats CSV file
     defense_file: Path to the Fantasy Defense Stats CSV file
-    
-    return A dictionary where the keys are team names and the values are Team instances
+
+    return:
+    list of (team name, offense stats dictionary, defense stats dictionary) in offense file order
     """
-    #read CSV files
-    offense_df = pd.read_csv(offense_file)
-    defense_df = pd.read_csv(defense_file)
+    import pandas as pd
 
-    #create a dictionary of teams
-    teams = {}
-    for i, offense_row in offense_df.iterrows():
-        team_name = offense_row["Name"]
+    #read only the needed columns, naming the duplicated "All" columns explicitly
+    offense_df = pd.read_csv(offense_file, header=0, names=OFFENSE_COLUMNS,
+                             usecols=list(OFFENSE_DTYPES), dtype=OFFENSE_DTYPES)
+    defense_df = pd.read_csv(defense_file, usecols=list(DEFENSE_DTYPES), dtype=DEFENSE_DTYPES)
+
+    #one join instead of filtering the defense frame for every team, the defense's positional columns get a suffix
+    merged = offense_df.merge(defense_df, on="Name", how="left", validate="one_to_one", indicator=True,
+                              suffixes=("", " allowed"))
+    missing = merged.loc[merged["_merge"] == "left_only", "Name"].tolist()
+    if missing:
+        raise KeyError(f"No defense stats for {', '.join(missing)}")
 
-        #find the matching defense row for the same team
-        defense_row = defense_df[defense_df["Name"] == team_name].iloc[0].to_dict()
+    offense_names = [column for column in OFFENSE_DTYPES if column != "Name"]
+    defense_names = [column for column in DEFENSE_DTYPES if column != "Name"]
+    rows = []
+    for record in merged.to_dict("records"):
+        rows.append((record["Name"],
+                     {column: record[column] for column in offense_names},
+                     {column: record[column + " allowed" if column in OFFENSE_DTYPES else column] for column in defense_names}))
+    return rows
 
-        #convert offense row to dictionary
-        offense_stats = offense_row.to_dict()
 
-        #create and store the team object
-        teams[team_name] = Team(team_name, offense_stats, defense_row)
+
+def read_team_rows_csv(offense_file, defense_file):
+    """
+    Read the offense and defense CSV files with the csv module, without importing pandas
+
+    Gives the same rows as read_team_rows.
+
+    offense_file: Path to the Fantasy Offense Stats CSV file
+    defense_file: Path to the Fantasy Defense Stats CSV file
+
+    return:
+    list of (team name, offense stats dictionary, defense stats dictionary) in offense file order
+    """
+    def parse(row, columns, dtypes):
+        return {column: int(row[column]) if dtypes[column] == "int64" else float(row[column]) for column in columns}
+
+    offense_names = [column for column in OFFENSE_DTYPES if column != "Name"]
+    defense_names = [column for column in DEFENSE_DTYPES if column != "Name"]
+
+    with open(defense_file, newline="") as f:
+        defense = {row["Name"]: parse(row, defense_names, DEFENSE_DTYPES) for row in csv.DictReader(f)}
+
+    rows = []
+    missing = []
+    with open(offense_file, newline="") as f:
+        reader = csv.reader(f)
+        next(reader)
+        #name the duplicated "All" columns by position, like read_team_rows
+        for values in reader:
+            row = dict(zip(OFFENSE_COLUMNS, values))
+            if row["Name"] not in defense:
+                missing.append(row["Name"])
+                continue
+            rows.append((row["Name"], parse(row, offense_names, OFFENSE_DTYPES), defense[row["Name"]]))
+    if missing:
+        raise KeyError(f"No defense stats for {', '.join(missing)}")
+    return rows
+
+
+
+#team row readers accepted by load_team_rows and create_teams
+TEAM_READERS = {"csv": read_team_rows_csv, "pandas": read_team_rows}
+
+
+def load_team_rows(offense_file, defense_file, cache=True, engine="csv"):
+    """
+    Return the joined team rows, reading them from the on-disk cache when the CSV contents are unchanged
+
+    offense_file: Path to the Fantasy Offense Stats CSV file
+    defense_file: Path to the Fantasy Defense Stats CSV file
+    cache: use and refresh the cache in cache_utils.cache_dir()
+    engine: "csv" for the standard-library reader or "pandas" for the DataFrame join, used on a cache miss
+
+    return:
+    list of (team name, offense stats dictionary, defense stats dictionary)
+    """
+    read_rows = TEAM_READERS[engine]
+    if not cache:
+        return read_rows(offense_file, defense_file)
+
+    digest = file_digest(offense_file, defense_file)
+    try:
+        path = os.path.join(cache_dir(), f"teams-v{TEAM_CACHE_VERSION}-{digest}.json")
+    except OSError:
+        return read_rows(offense_file, defense_file) #no usable cache directory
+    try:
+        with open(path) as f:
+            return [tuple(row) for row in json.load(f)]
+    except (OSError, ValueError):
+        pass
+
+    rows = read_rows(offense_file, defense_file)
+    try:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass #cache directory not writable, the rows were still parsed
+    return rows
+
+
+
+def create_teams(offense_file, defense_file, cache=True, engine="csv"):
+    """
+    Create a dictionary of teams using offense and defense data from CSV files
+
+    offense_file: Path to the Fantasy Offense Stats CSV file
+    defense_file: Path to the Fantasy Defense Stats CSV file
+    cache: reuse the parsed teams cached for identical CSV contents
+    engine: "csv" (no pandas import) or "pandas", the reader used when the cache misses
+    
+    return A dictionary where the keys are team names and the values are Team instances
+    """
+    #create a dictionary of teams, all sharing one TeamTable
+    teams = {}
+    table = TeamTable()
+    for team_name, offense_stats, defense_stats in load_team_rows(offense_file, defense_file, cache, engine):
+        teams[team_name] = Team(team_name, offense_stats, defense_stats, table)
 
     return teams
 
 
 
-def get_weather(home_team):
+def get_weather(home_team, rng=random):
     """
     Get the weather conditions for a game, depending on the home team
 
     args:
     home_team: The name of the home team (Team2 in schedule file).
+    rng: random.Random instance to draw from, defaults to the global random module
 
     return:
     The weather condition as a string.
     """
-    
-    #weather probabilities for each home team, there are 10 teams with indoor closed statiums so they are always clear
-    stadium_weather = {
-    "Arizona Cardinals": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Atlanta Falcons": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Baltimore Ravens": {"Clear": 0.7, "Rain": 0.2, "Snow": 0.05, "Wind": 0.05},
-    "Buffalo Bills": {"Clear": 0.5, "Rain": 0.2, "Snow": 0.2, "Wind": 0.1},
-    "Carolina Panthers": {"Clear": 0.75, "Rain": 0.2, "Snow": 0.05, "Wind": 0.0},
-    "Chicago Bears": {"Clear": 0.6, "Rain": 0.2, "Snow": 0.15, "Wind": 0.05},
-    "Cincinnati Bengals": {"Clear": 0.65, "Rain": 0.25, "Snow": 0.05, "Wind": 0.05},
-    "Cleveland Browns": {"Clear": 0.55, "Rain": 0.25, "Snow": 0.15, "Wind": 0.05},
-    "Dallas Cowboys": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Denver Broncos": {"Clear": 0.8, "Rain": 0.1, "Snow": 0.05, "Wind": 0.05},
-    "Detroit Lions": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Green Bay Packers": {"Clear": 0.5, "Rain": 0.1, "Snow": 0.35, "Wind": 0.05},
-    "Houston Texans": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Indianapolis Colts": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Jacksonville Jaguars": {"Clear": 0.8, "Rain": 0.2, "Snow": 0.0, "Wind": 0.0},
-    "Kansas City Chiefs": {"Clear": 0.7, "Rain": 0.2, "Snow": 0.05, "Wind": 0.05},
-    "Las Vegas Raiders": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Los Angeles Chargers": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Los Angeles Rams": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "Miami Dolphins": {"Clear": 0.75, "Rain": 0.25, "Snow": 0.0, "Wind": 0.0},
-    "Minnesota Vikings": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "New England Patriots": {"Clear": 0.65, "Rain": 0.2, "Snow": 0.1, "Wind": 0.05},
-    "New Orleans Saints": {"Clear": 1.0, "Rain": 0.0, "Snow": 0.0, "Wind": 0.0},
-    "New York Giants": {"Clear": 0.65, "Rain": 0.2, "Snow": 0.1, "Wind": 0.05},
-    "New York Jets": {"Clear": 0.65, "Rain": 0.2, "Snow": 0.1, "Wind": 0.05},
-    "Philadelphia Eagles": {"Clear": 0.7, "Rain": 0.2, "Snow": 0.05, "Wind": 0.05},
-    "Pittsburgh Steelers": {"Clear": 0.6, "Rain": 0.2, "Snow": 0.15, "Wind": 0.05},
-    "San Francisco 49ers": {"Clear": 0.85, "Rain": 0.15, "Snow": 0.0, "Wind": 0.0},
-    "Seattle Seahawks": {"Clear": 0.6, "Rain": 0.3, "Snow": 0.05, "Wind": 0.05},
-    "Tampa Bay Buccaneers": {"Clear": 0.8, "Rain": 0.2, "Snow": 0.0, "Wind": 0.0},
-    "Tennessee Titans": {"Clear": 0.75, "Rain": 0.2, "Snow": 0.05, "Wind": 0.0},
-    "Washington Commanders": {"Clear": 0.7, "Rain": 0.2, "Snow": 0.05, "Wind": 0.05},
-    }
-    
-    
-    #get weather probabilities for the home team
-    weather_probs = stadium_weather.get(home_team, {"Clear": 1.0}) #default is clear weather
-    return random.choices(list(weather_probs.keys()), weights=list(weather_probs.values()))[0]
+    #draw from the home stadium's precomputed alias table, unknown stadiums are always clear
+    return default_sampler().draw(home_team, rng)
 
 
 
@@ -251,155 +569,287 @@ def apply_weather_effects(weather, team):
     return:
     team efficiency, net production as a tuple
     """
-    if weather == "Clear":
-        efficiency = team.team_efficiency
-        net_production = team.calculate_net_production()
-    elif weather == "Rain":
-        efficiency = team.team_efficiency * 0.9 #worse passing
-        net_production = team.calculate_net_production() * 1.1 #better rushing
-    elif weather == "Snow":
-        efficiency = team.team_efficiency * 0.8 #worse offense entirely
-        net_production = team.calculate_net_production() * 1.2 #boost defense entirely
-    elif weather == "Wind":
-        efficiency = team.team_efficiency * 0.85 #worse passing
-        net_production = team.calculate_net_production() * 1.15 #better defense
+    efficiency_multiplier, net_multiplier = WEATHER_EFFECTS[weather]
+    efficiency = team.team_efficiency * efficiency_multiplier
+    net_production = team.calculate_net_production() * net_multiplier
     
     return efficiency, net_production
 
 
 
-def simulate_game(team1, team2):
+def play_game(team1, team2, rng=random):
     """
-    Simulate a game between two teams and determine the winner
+    Play a game between two teams and return everything about it
+
+    team1: The first (away) team instance
+    team2: The second (home) team instance
+    rng: random.Random instance used for the weather, defaults to the global random module
 
-    team1: The first team instance
-    team2: The second team instance
-    
     returns
-    winner: Team object
-    loser: Team object
-    outcome: 'win1'/'win2'/'tie'
+    weather, team1 score, team2 score and outcome ('win1'/'win2'/'tie') as a tuple
     """
     
     #get weather for a game and apply weather effects
-    weather = get_weather(team2.name)
+    weather = get_weather(team2.name, rng)
     team1_efficiency, team1_net = apply_weather_effects(weather, team1)
     team2_efficiency, team2_net = apply_weather_effects(weather, team2)
     
     #use team efficiency and net production to determine the winner
-    team1_score = team1.team_efficiency + (team1.calculate_net_production() - team2.offensive_production_allowed)
-    team2_score = team2.team_efficiency + (team2.calculate_net_production() - team1.offensive_production_allowed)
-    
-    #home team advantage gets their score multiplied by 1.05
-    team2_score *= 1.05
+    matchups = team1.table.matchups() if team1.table is team2.table else None
+    if matchups is not None:
+        #precomputed base scores, home advantage included
+        team2_score, team1_score = matchups.base_scores(team2.index, team1.index)
+    else:
+        team1_score = team1.team_efficiency + (team1.calculate_net_production() - team2.offensive_production_allowed)
+        team2_score = team2.team_efficiency + (team2.calculate_net_production() - team1.offensive_production_allowed)
+
+        #home team advantage gets their score multiplied by 1.05
+        team2_score *= HOME_MULTIPLIER
     
     #win streak multiplier: 2% increate per game in the current win streak
-    team1_score *= 1 + (0.02 * team1.win_streak)
-    team2_score *= 1 + (0.02 * team2.win_streak)
+    team1_score *= 1 + (WIN_STREAK_BONUS * team1.win_streak)
+    team2_score *= 1 + (WIN_STREAK_BONUS * team2.win_streak)
 
     #determine winner
     if team1_score > team2_score:
-        return team1, team2, "win1"
+        outcome = "win1"
     elif team2_score > team1_score:
+        outcome = "win2"
+    else:
+        outcome = "tie"
+    return weather, team1_score, team2_score, outcome
+
+
+
+def simulate_game(team1, team2, rng=random):
+    """
+    Simulate a game between two teams and determine the winner
+
+    team1: The first team instance
+    team2: The second team instance
+    rng: random.Random instance used for the weather, defaults to the global random module
+    
+    returns
+    winner: Team object
+    loser: Team object
+    outcome: 'win1'/'win2'/'tie'
+    """
+    weather, team1_score, team2_score, outcome = play_game(team1, team2, rng)
+    if outcome == "win1":
+        return team1, team2, "win1"
+    elif outcome == "win2":
         return team2, team1, "win2"
     else:
         return None, None, "tie"
-   
-   
-    
-def simulate_season(schedule_file, teams):
+
+
+
+def format_result(result):
     """
-    Simulate an NFL season based on the schedule csv and update team records
+    Format a GameResult as the one-line game summary printed by the program
+
+    args:
+    result: GameResult
+
+    return:
+    string describing the game
+    """
+    if result.outcome == "win1":
+        return f"Week {result.week}: {result.away} defeat {result.home}."
+    elif result.outcome == "win2":
+        return f"Week {result.week}: {result.home} defeat {result.away}."
+    return f"Week {result.week}: {result.away} ties with {result.home}."
+
+
+
+def iter_season(schedule_file, teams, rng=random, season=0, start_week=1):
+    """
+    Simulate an NFL season game by game, updating team records and yielding a GameResult per game
 
     schedule_file: path to the schedule CSV file.
     teams: dictionary containing Team instances indexed by team names.
+    rng: random.Random instance used for the weather, defaults to the global random module
+    season: season number stored on every result
+    start_week: first week to simulate, earlier games are skipped and the teams keep their current records
     """
-    schedule = pd.read_csv(schedule_file)
+    from schedule_cache import load_schedule
 
-    results = []
-    for _, game in schedule.iterrows():
-        week = game["Week"]
-        team1_name = game["Team1"]
-        team2_name = game["Team2"]
+    #compiled schedule of team indices, the csv is only parsed when it changes
+    names = list(teams.keys())
+    team_list = list(teams.values())
+    weeks, away, home = load_schedule(schedule_file, names)
+    if start_week > 1:
+        remaining = weeks >= start_week
+        weeks, away, home = weeks[remaining], away[remaining], home[remaining]
 
+    for week, team1_index, team2_index in zip(weeks.tolist(), away.tolist(), home.tolist()):
         #get the team objects
-        team1 = teams[team1_name]
-        team2 = teams[team2_name]
+        team1 = team_list[team1_index]
+        team2 = team_list[team2_index]
 
         #simulate the game
-        winner, loser, outcome = simulate_game(team1, team2)
+        weather, team1_score, team2_score, outcome = play_game(team1, team2, rng)
 
-        #ppdate records based on the outcome
+        #update records based on the outcome
         if outcome == "win1":
             team1.update_record("win")
             team2.update_record("loss")
-            results.append(f"Week {week}: {team1_name} defeat {team2_name}.")
         elif outcome == "win2":
             team2.update_record("win")
             team1.update_record("loss")
-            results.append(f"Week {week}: {team2_name} defeat {team1_name}.")
         elif outcome == "tie":
             team1.update_record("tie")
             team2.update_record("tie")
-            results.append(f"Week {week}: {team1_name} ties with {team2_name}.")
 
-    return results
+        yield GameResult(week, names[team2_index], names[team1_index], weather, team2_score, team1_score, outcome, season)
 
 
 
-def print_team_records(teams):
+def simulate_season(schedule_file, teams, rng=random, structured=False, start_week=1):
+    """
+    Simulate an NFL season based on the schedule csv and update team records
+
+    schedule_file: path to the schedule CSV file.
+    teams: dictionary containing Team instances indexed by team names.
+    rng: random.Random instance used for the weather, defaults to the global random module
+    structured: return a generator of GameResult records instead of a list of strings
+    start_week: first week to simulate, the teams keep their records from the earlier weeks
+
+    return:
+    list of game summary strings, or a GameResult generator when structured is True
+    """
+    if structured:
+        return iter_season(schedule_file, teams, rng, start_week=start_week)
+    return [format_result(result) for result in iter_season(schedule_file, teams, rng, start_week=start_week)]
+
+
+
+def iter_seasons(n, schedule_file, teams, rng=random, checkpoint=None, seed=None, first_season=0):
+    """
+    Simulate n seasons back to back, yielding GameResult records without keeping them
+
+    Team records are reset before every season, so after the generator is
+    exhausted they hold the final season.
+
+    args:
+    n: number of seasons
+    schedule_file: path to the schedule CSV file
+    teams: dictionary containing Team instances indexed by team names
+    rng: random.Random instance used for the weather, defaults to the global random module
+    checkpoint: checkpoint.SeasonCheckpoint to restore before every season instead of resetting,
+                only the weeks after it are simulated
+    seed: master seed of a counter-based stream used instead of rng, every season then gets the weather
+          the bulk and parallel simulations draw for the same season and seed
+    first_season: number of the first season
+    """
+    if seed is not None:
+        from streams import CounterStream
+        stream = CounterStream(seed)
+    for season in range(first_season, first_season + n):
+        season_rng = stream.season(season) if seed is not None else rng
+        if checkpoint is None:
+            reset_all_teams(teams)
+            yield from iter_season(schedule_file, teams, season_rng, season)
+        else:
+            checkpoint.restore(teams)
+            yield from iter_season(schedule_file, teams, season_rng, season, checkpoint.week + 1)
+
+
+
+def replay_season(schedule_file, teams, seed, season, checkpoint=None):
+    """
+    Regenerate one season of a seeded bulk or parallel simulation game by game
+
+    Weather draws are keyed by seed, season and game, so only the asked-for
+    season is simulated. The team records hold the season's final records afterwards.
+
+    args:
+    schedule_file: path to the schedule CSV file
+    teams: dictionary containing Team instances indexed by team names
+    seed: master seed of the simulation
+    season: season number, counted from 0
+    checkpoint: checkpoint.SeasonCheckpoint the simulation started from
+
+    return:
+    list of GameResult
+    """
+    return list(iter_seasons(1, schedule_file, teams, checkpoint=checkpoint, seed=seed, first_season=season))
+
+
+
+def top_teams(teams, key, top=None):
+    """
+    Return teams in descending order of key, only the best top of them when top is given
+
+    A partial sort keeps large leagues fast, the order matches a full sort.
+
+    teams: iterable of teams, or of any items key accepts
+    key: function giving the value to rank by
+    top: number of teams to keep, None keeps them all
+    """
+    if top is None:
+        return sorted(teams, key=key, reverse=True)
+    return heapq.nlargest(top, teams, key=key)
+
+
+
+def print_team_records(teams, top=None, league_config=None):
     """
     Print the final records of all teams in descending order.
 
     teams: dict containing Team instances
+    top: only print the best top teams of each conference
+    league_config: league.League the conferences come from, defaults to league.DEFAULT_LEAGUE
     """
+    league_config = league_config or league.DEFAULT_LEAGUE
+    for conference in league_config.conferences:
+        #find the conference's teams and sort them by wins in descending order
+        members = set(league_config.conference_teams(conference))
+        records = [team for team in teams.values() if team.name in members]
+        records = top_teams(records, lambda team: team.current_wins, top)
 
-    #define the AFC teams in a set
-    afc_teams = {
-        "Baltimore Ravens", "Buffalo Bills", "Cincinnati Bengals", "Cleveland Browns", 
-        "Denver Broncos", "Houston Texans", "Indianapolis Colts", "Jacksonville Jaguars", 
-        "Kansas City Chiefs", "Las Vegas Raiders", "Los Angeles Chargers", "Miami Dolphins", 
-        "New England Patriots", "New York Jets", "Pittsburgh Steelers", "Tennessee Titans"
-    }
-
-    #define the NFC teams in a set
-    nfc_teams = {
-        "Arizona Cardinals", "Atlanta Falcons", "Carolina Panthers", "Chicago Bears",
-        "Dallas Cowboys", "Detroit Lions", "Green Bay Packers", "Los Angeles Rams",
-        "Minnesota Vikings", "New Orleans Saints", "New York Giants", "Philadelphia Eagles",
-        "San Francisco 49ers", "Seattle Seahawks", "Tampa Bay Buccaneers", "Washington Commanders"
-    }
-
-    #separate teams into AFC and NFC
-    afc_records = [team for team in teams.values() if team.name in afc_teams]
-    nfc_records = [team for team in teams.values() if team.name in nfc_teams]
-
-    #sort each group by wins in descending order
-    afc_records = sorted(afc_records, key=lambda team: team.current_wins, reverse=True)
-    nfc_records = sorted(nfc_records, key=lambda team: team.current_wins, reverse=True)
-    
-    #print AFC records
-    print("AFC Teams:")
-    for team in afc_records:
-        print(f"{team.name} - Wins: {team.current_wins}, Losses: {team.current_losses}, Ties: {team.current_ties}")
-    print("")
+        print(f"{conference} Teams:")
+        for team in records:
+            print(f"{team.name} - Wins: {team.current_wins}, Losses: {team.current_losses}, Ties: {team.current_ties}")
+        print("")
 
-    #print NFC records
-    print("NFC Teams:")
-    for team in nfc_records:
-        print(f"{team.name} - Wins: {team.current_wins}, Losses: {team.current_losses}, Ties: {team.current_ties}")
-    print("")
 
 
+def print_playoff_seeds(teams, results, league_config=None):
+    """
+    Print the playoff seeds of every conference, ties broken with the NFL tiebreakers
 
-def print_expected_records(teams):
+    teams: dict containing Team instances
+    results: GameResult list of the season
+    league_config: league.League the conferences come from, defaults to league.DEFAULT_LEAGUE
+    """
+    from standings import season_standings
+
+    league_config = league_config or league.DEFAULT_LEAGUE
+    seeds = season_standings(teams, results, league_config.divisions, league_config.division_conferences,
+                             league_config.playoff_teams)
+    for conference in league_config.conferences:
+        #find the conference's playoff teams in seed order
+        members = set(league_config.conference_teams(conference))
+        seeded = sorted((ranks["seed"], name) for name, ranks in seeds.items() if name in members and ranks["seed"])
+
+        print(f"{conference} Playoff Seeds:")
+        for seed, name in seeded:
+            team = teams[name]
+            print(f"{seed}. {team.name} - Wins: {team.current_wins}, Losses: {team.current_losses}, Ties: {team.current_ties}")
+        print("")
+
+
+
+def print_expected_records(teams, top=None):
     """
     Print the final records of all teams, using the LSRL expected wins formula. 
 
     teams: dict containing Team instances
+    top: only print the best top teams
     """
     #sort teams in descending order using the key value team.x_wins
-    sorted_teams = sorted(teams.values(), key=lambda team: team.x_wins, reverse=True)
+    sorted_teams = top_teams(teams.values(), lambda team: team.x_wins, top)
 
     #print out the expected wins and losses
     for team in sorted_teams:
@@ -407,15 +857,14 @@ def print_expected_records(teams):
 
 
 
-if __name__ == "__main__":
+def run_interactive(offense_file, defense_file, schedule_file):
     """
-    Reads the CSV files, creates a team object and gets user input to run different aspects of the code
+    Create the teams and get user input to run different aspects of the code
+
+    offense_file: Path to the Fantasy Offense Stats CSV file
+    defense_file: Path to the Fantasy Defense Stats CSV file
+    schedule_file: path to the schedule CSV file
     """
-    #files to be used
-    offense_file = "2023 Fantasy Offense Stats.csv"
-    defense_file = "2023 Fantasy Defense Stats.csv"
-    schedule_file = "2023 Schedule.csv"
-    
     #create the teams
     teams = create_teams(offense_file, defense_file)
 
@@ -430,13 +879,13 @@ if __name__ == "__main__":
             #reset results
             reset_all_teams(teams)
 
-            #simulate the season
-            season_results = simulate_season(schedule_file, teams)
+            #simulate the season, results are formatted as they are printed
+            season_results = list(simulate_season(schedule_file, teams, structured=True))
                 
             #print the results of each matchup
             print("\nGame Results:")
             for result in season_results:
-                print(result)
+                print(format_result(result))
 
             #print final team records
             print("----------------------------------------------------------")
@@ -463,3 +912,221 @@ if __name__ == "__main__":
             print("\nInvalid choice. Please type 'simulation' for the season simulation,\n'expect' for the expected wins, 'stats' for the team stats, or 'quit'.\n")
         
         choice = input("\nWhat would you like to do next? (simulation / expect / stats / quit): ")
+
+
+
+#default input files, relative to the working directory
+OFFENSE_FILE = "2023 Fantasy Offense Stats.csv"
+DEFENSE_FILE = "2023 Fantasy Defense Stats.csv"
+SCHEDULE_FILE = "2023 Schedule.csv"
+
+
+def write_rows(rows, fieldnames, output_format, output):
+    """
+    Write summary rows as JSON or CSV
+
+    rows: list of dictionaries, one per team
+    fieldnames: column order for CSV output
+    output_format: "json" or "csv"
+    output: open text file to write to
+    """
+    if output_format == "json":
+        json.dump(rows, output, indent=2)
+        output.write("\n")
+    else:
+        writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+
+def run_simulate(args, output):
+    """
+    Simulate many seasons across worker processes and write per-team odds
+
+    args: parsed command line arguments
+    output: open text file to write to
+    """
+    from aggregator import SeasonAggregator
+    from parallel import simulate_seasons_parallel
+    from result_cache import SimulationCache, simulate_cached
+
+    teams = create_teams(args.offense, args.defense)
+    start = None
+    if args.checkpoint:
+        from checkpoint import SeasonCheckpoint
+        start = SeasonCheckpoint.load(args.checkpoint)
+    elif args.results:
+        from checkpoint import checkpoint_from_results
+        start = checkpoint_from_results(teams, args.results, args.through_week)
+
+    if args.replay is not None:
+        #one season of a seeded run, every game with its weather and scores
+        results = replay_season(args.schedule, teams, args.seed, args.replay, start)
+        if args.format == "text":
+            for result in results:
+                print(format_result(result), file=output)
+        else:
+            write_rows([result._asdict() for result in results], list(GameResult._fields), args.format, output)
+        return
+
+    if args.format == "text" and args.seasons == 1 and not args.adaptive:
+        #a single season prints every game like the interactive simulation
+        for result in iter_seasons(1, args.schedule, teams, checkpoint=start, seed=args.seed):
+            print(format_result(result), file=output)
+        return
+
+    report = None
+    if args.adaptive:
+        from adaptive import simulate_adaptive
+        totals, report = simulate_adaptive(args.schedule, teams, args.wins_tolerance, args.playoff_tolerance,
+                                           args.max_seasons, args.max_seconds, args.seed, args.workers,
+                                           checkpoint=start)
+    elif args.no_cache:
+        totals = simulate_seasons_parallel(args.seasons, args.schedule, teams, seed=args.seed, workers=args.workers,
+                                           tally_class=SeasonAggregator, checkpoint=start)
+    else:
+        #seeded runs are stored by their inputs, so repeating one reads the stored odds
+        cache = SimulationCache(max_bytes=args.cache_mb << 20 if args.cache_mb else None)
+        totals, _ = simulate_cached(args.offense, args.defense, args.schedule, args.seasons, args.seed, teams,
+                                    args.workers, checkpoint=start, cache=cache)
+    summary = totals.summary()
+    if args.format == "text":
+        for name, stats in top_teams(summary.items(), lambda item: item[1]["mean_wins"], args.top):
+            print(f"{name} - Mean Wins: {stats['mean_wins']:.2f}, Division: {stats['division_title']:.1%}, "
+                  f"Playoffs: {stats['playoffs']:.1%}", file=output)
+        if report is not None:
+            print(f"Stopped after {report['seasons']} seasons ({report['stopped']}), largest standard errors: "
+                  f"{report['max_wins_error']:.3f} wins, {report['max_playoff_error']:.2%} playoffs", file=output)
+    elif args.format == "json":
+        document = {"seasons": totals.seasons, "seed": totals.seed, "start_week": start.week + 1 if start else 1,
+                    "teams": summary}
+        if report is not None:
+            document["precision"] = report
+        json.dump(document, output, indent=2)
+        output.write("\n")
+    else:
+        rows = [{"team": name, **stats, **(report["teams"][name] if report else {})} for name, stats in summary.items()]
+        for row in rows:
+            row["win_histogram"] = " ".join(str(count) for count in row["win_histogram"])
+            row["seeds"] = " ".join(str(chance) for chance in row["seeds"])
+        fieldnames = ["team", "mean_wins", "variance_wins", "division_title", "playoffs", "seeds", "win_histogram"]
+        write_rows(rows, fieldnames + (["wins_error", "playoff_error"] if report else []), "csv", output)
+
+
+
+def run_expect(args, output):
+    """
+    Write the LSRL expected records of every team
+
+    args: parsed command line arguments
+    output: open text file to write to
+    """
+    teams = create_teams(args.offense, args.defense)
+    if args.format == "text":
+        for team in top_teams(teams.values(), lambda team: team.x_wins, args.top):
+            print(f"{team.name} - Expected Wins: {round(team.x_wins, 2)}, Expected Losses: {round(team.x_losses, 2)}", file=output)
+        return
+    rows = [{"team": team.name, "x_wins": team.x_wins, "x_losses": team.x_losses} for team in teams.values()]
+    write_rows(rows, ["team", "x_wins", "x_losses"], args.format, output)
+
+
+
+def run_stats(args, output):
+    """
+    Write the stats of every team
+
+    args: parsed command line arguments
+    output: open text file to write to
+    """
+    teams = create_teams(args.offense, args.defense)
+    if args.format == "text":
+        for team in teams.values():
+            print(team, file=output)
+            print("", file=output)
+        return
+    rows = [team.to_dict() for team in teams.values()]
+    write_rows(rows, list(rows[0].keys()) if rows else ["name"], args.format, output)
+
+
+
+def main(argv=None):
+    """
+    Parse the command line and run the program
+
+    With no subcommand the interactive menu runs, the subcommands run once
+    without prompting so they can be scheduled and piped.
+
+    argv: command line arguments, defaults to sys.argv[1:]
+    """
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Predict NFL team records from fantasy football stats")
+    parser.add_argument("--profile", metavar="REPORT.json", help="write a JSON report of per-stage timings and call counts")
+    parser.add_argument("--pstats", metavar="FILE", help="with --profile, also write a cProfile dump")
+    parser.add_argument("--profile-memory", action="store_true", help="with --profile, also record allocation peaks (slow)")
+
+    #options shared by every subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--offense", default=OFFENSE_FILE, help="offense stats CSV")
+    common.add_argument("--defense", default=DEFENSE_FILE, help="defense stats CSV")
+    common.add_argument("--format", choices=["text", "json", "csv"], default="text", help="output format")
+    common.add_argument("--output", "-o", default="-", help="output file, - for standard output")
+    common.add_argument("--top", type=int, default=None, help="with text output, only list the best TOP teams")
+
+    commands = parser.add_subparsers(dest="command")
+    simulate = commands.add_parser("simulate", parents=[common], help="simulate seasons and report per-team odds")
+    simulate.add_argument("--schedule", default=SCHEDULE_FILE, help="schedule CSV")
+    simulate.add_argument("--seasons", "-n", type=int, default=1000, help="number of seasons to simulate")
+    simulate.add_argument("--workers", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    simulate.add_argument("--seed", type=int, default=None, help="master seed, reported in JSON output")
+    simulate.add_argument("--no-cache", action="store_true", help="always simulate, don't read or store cached results of seeded runs")
+    simulate.add_argument("--cache-mb", type=int, default=None, help="size cap of the result cache in MB (default: $FFHELPER_RESULT_CACHE_MB or 256)")
+    simulate.add_argument("--results", metavar="CSV", help="real results of the decided weeks, only later weeks are simulated")
+    simulate.add_argument("--through-week", type=int, default=None, help="with --results, last decided week (default: last week in the file)")
+    simulate.add_argument("--checkpoint", metavar="JSON", help="start from a saved checkpoint instead of --results")
+    simulate.add_argument("--replay", type=int, metavar="SEASON", help="with --seed, print every game of one season of the seeded run")
+    simulate.add_argument("--adaptive", action="store_true", help="simulate batches until the odds are as precise as the tolerances ask")
+    simulate.add_argument("--wins-tolerance", type=float, default=0.05, help="with --adaptive, largest standard error of expected wins")
+    simulate.add_argument("--playoff-tolerance", type=float, default=0.005, help="with --adaptive, largest standard error of playoff odds")
+    simulate.add_argument("--max-seasons", type=int, default=1000000, help="with --adaptive, season budget")
+    simulate.add_argument("--max-seconds", type=float, default=None, help="with --adaptive, time budget")
+    commands.add_parser("expect", parents=[common], help="report LSRL expected records")
+    commands.add_parser("stats", parents=[common], help="report team stats")
+    args = parser.parse_args(argv)
+    if args.command == "simulate" and args.seasons < 1:
+        parser.error("--seasons must be at least 1")
+    if args.command == "simulate" and args.adaptive and (args.max_seasons < 1 or args.wins_tolerance < 0 or args.playoff_tolerance < 0):
+        parser.error("--adaptive needs a --max-seasons of at least 1 and non-negative tolerances")
+    if args.command == "simulate" and args.replay is not None and (args.seed is None or args.replay < 0):
+        parser.error("--replay needs --seed and a season number of at least 0")
+    if getattr(args, "top", None) is not None and args.top < 0:
+        parser.error("--top can't be negative")
+
+    def run():
+        if args.command is None:
+            run_interactive(OFFENSE_FILE, DEFENSE_FILE, SCHEDULE_FILE)
+            return
+        command = {"simulate": run_simulate, "expect": run_expect, "stats": run_stats}[args.command]
+        if args.output == "-":
+            command(args, sys.stdout)
+        else:
+            with open(args.output, "w", newline="") as output:
+                command(args, output)
+
+    if args.profile:
+        from instrumentation import profiled
+        #instrument this module, which is __main__ rather than FFHelper when run as a script
+        with profiled(args.profile, args.pstats, args.profile_memory, sys.modules[__name__]):
+            run()
+    else:
+        run()
+
+
+
+if __name__ == "__main__":
+    """
+    Reads the CSV files, creates a team object and gets user input to run different aspects of the code
+    """
+    main()
@@ -0,0 +1,150 @@
+#import numpy for the standard errors, concurrent.futures to keep one process pool across batches
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import monte_carlo
+import parallel
+from aggregator import SeasonAggregator
+
+#default largest standard errors of expected wins and of playoff probability
+WINS_TOLERANCE = 0.05
+PLAYOFF_TOLERANCE = 0.005
+
+#default seasons before the first convergence check, and fewest seasons in a later batch
+MIN_SEASONS = 2000
+BATCH_SIZE = 1000
+
+#why a run stopped
+CONVERGED = "converged"
+SEASON_BUDGET = "season budget"
+TIME_BUDGET = "time budget"
+
+
+def standard_errors(tally):
+    """
+    Return the standard error of every team's expected wins and playoff probability
+
+    Playoff odds use the add-one estimate (k + 1) / (n + 2), so a team that
+    always or never made it so far still has a nonzero error that shrinks
+    with more seasons instead of looking settled after a handful of them.
+
+    args:
+    tally: aggregator.SeasonAggregator
+
+    return:
+    arrays of the wins and playoff standard errors in team_names order as a tuple
+    """
+    n = max(tally.seasons, 1)
+    wins_error = np.sqrt(np.maximum(tally.variance_wins(), 0) / n)
+    p = (tally.seed_counts[:, 1:].sum(axis=1) + 1) / (tally.seasons + 2)
+    return wins_error, np.sqrt(p * (1 - p) / n)
+
+
+
+def simulate_adaptive(schedule_file, teams, wins_tolerance=WINS_TOLERANCE, playoff_tolerance=PLAYOFF_TOLERANCE,
+                      max_seasons=1000000, max_seconds=None, seed=None, workers=1, batch_size=BATCH_SIZE,
+                      min_seasons=MIN_SEASONS, tracked=None, checkpoint=None):
+    """
+    Simulate batches of seasons until every tracked team's odds are as precise as asked, or a budget runs out
+
+    Season numbers continue from batch to batch in the seed's counter-based
+    stream, so the first n seasons are the same n seasons a fixed run of
+    parallel.simulate_seasons_parallel with the same seed simulates.
+
+    args:
+    schedule_file: path to the schedule CSV file
+    teams: dictionary containing Team instances indexed by team names
+    wins_tolerance: largest standard error of a team's expected wins
+    playoff_tolerance: largest standard error of a team's playoff probability
+    max_seasons: season budget
+    max_seconds: time budget in seconds, checked after every batch, no limit when None
+    seed: master seed, a fresh one is drawn (and stored on the tally) when None
+    workers: number of worker processes, 1 runs in this process
+    batch_size: fewest seasons simulated between checks, batches are sized from how far the errors are from
+                the tolerances and split into one shard per worker
+    min_seasons: seasons simulated before the first check
+    tracked: names of the teams whose precision decides when to stop, every team when None
+    checkpoint: checkpoint.SeasonCheckpoint of the decided weeks, only the remaining weeks are simulated
+
+    return:
+    aggregator.SeasonAggregator and a report of the seasons run, the reason for stopping and the standard
+    errors reached (largest over the tracked teams and per team) as a tuple
+    """
+    if max_seasons < 1:
+        raise ValueError("max_seasons must be at least 1")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if workers is None:
+        workers = os.cpu_count() or 1
+    started = time.perf_counter()
+
+    names = list(teams.keys())
+    schedule = monte_carlo.schedule_arrays(schedule_file, names)
+    max_games = parallel.most_games(schedule[1], schedule[2], len(names))
+    index = {name: t for t, name in enumerate(names)}
+    unknown = [name for name in tracked or () if name not in index]
+    if unknown:
+        raise KeyError(f"Unknown teams: {', '.join(unknown)}")
+    rows = np.arange(len(names)) if tracked is None else np.array([index[name] for name in tracked], dtype=np.intp)
+    tally = SeasonAggregator(names, max_games)
+    tally.seed = seed
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=parallel.init_worker,
+                                   initargs=(teams, schedule, checkpoint))
+    else:
+        parallel.init_worker(teams, schedule, checkpoint)
+    try:
+        seasons = min(min_seasons, max_seasons)
+        while True:
+            shard_size = -(-seasons // workers)
+            shards = [(start, min(shard_size, tally.seasons + seasons - start))
+                      for start in range(tally.seasons, tally.seasons + seasons, shard_size)]
+            if pool is None:
+                results = [parallel.run_shard(seed, start, count, max_games, SeasonAggregator) for start, count in shards]
+            else:
+                futures = [pool.submit(parallel.run_shard, seed, start, count, max_games, SeasonAggregator)
+                           for start, count in shards]
+                results = [future.result() for future in futures]
+            #merge in season order so the counts are the same for any worker count
+            for result in results:
+                tally.merge(result)
+
+            wins_error, playoff_error = standard_errors(tally)
+            elapsed = time.perf_counter() - started
+            if (wins_error[rows] <= wins_tolerance).all() and (playoff_error[rows] <= playoff_tolerance).all():
+                reason = CONVERGED
+            elif tally.seasons >= max_seasons:
+                reason = SEASON_BUDGET
+            elif max_seconds is not None and elapsed >= max_seconds:
+                reason = TIME_BUDGET
+            else:
+                #errors shrink with the square root of the seasons, so project how many are still needed,
+                #at most doubling the run so a noisy early estimate can't overshoot by much
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ratio = max(np.nanmax((wins_error[rows] / wins_tolerance) ** 2, initial=1),
+                                np.nanmax((playoff_error[rows] / playoff_tolerance) ** 2, initial=1))
+                needed = tally.seasons * min(ratio, 2.0) - tally.seasons
+                seasons = int(min(max(np.ceil(needed), batch_size), max_seasons - tally.seasons))
+                continue
+            break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    report = {
+        "seasons": tally.seasons,
+        "seconds": elapsed,
+        "stopped": reason,
+        "converged": reason == CONVERGED,
+        "wins_tolerance": wins_tolerance,
+        "playoff_tolerance": playoff_tolerance,
+        "max_wins_error": float(wins_error[rows].max(initial=0)),
+        "max_playoff_error": float(playoff_error[rows].max(initial=0)),
+        "teams": {names[t]: {"wins_error": float(wins_error[t]), "playoff_error": float(playoff_error[t])} for t in rows.tolist()},
+    }
+    return tally, report
@@ -0,0 +1,290 @@
+#import numpy for the fixed-size histograms, league for divisions and playoff spots, json to save them
+import json
+import os
+
+import numpy as np
+
+import league
+
+
+def win_percentage(wins, losses, ties):
+    """
+    Return the win percentage with ties counted as half a win
+
+    args:
+    wins, losses, ties: arrays of the same shape
+
+    return:
+    float array, 0 where no games were played
+    """
+    games = wins + losses + ties
+    return np.divide(wins + 0.5 * ties, games, out=np.zeros(np.shape(games), dtype=np.float64), where=games > 0)
+
+
+
+def rank_within(values, rows):
+    """
+    Rank a group of teams in every season, best value first, ties going to the earlier team
+
+    args:
+    values: array of shape (seasons, teams), higher is better
+    rows: team indices of the group
+
+    return:
+    int array of shape (seasons, len(rows)) with 0 for the top team
+    """
+    order = np.argsort(-values[:, rows], axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(len(rows))[None, :], axis=1)
+    return ranks
+
+
+
+def playoff_seeds(wins, losses, ties, division_groups, conference_groups, playoff_teams=league.PLAYOFF_TEAMS, games=None):
+    """
+    Seed every conference in every season: division winners first, then wild cards, each by win percentage
+
+    With the games of the seasons, ties are broken with the NFL tiebreakers
+    (see standings.rank_standings), otherwise they go to the earlier team.
+
+    args:
+    wins, losses, ties: arrays of shape (seasons, teams)
+    division_groups: division name -> team index array
+    conference_groups: conference name -> team index array
+    playoff_teams: playoff spots per conference
+    games: optional (away, home, outcomes) arrays, see standings.rank_standings
+
+    return:
+    division ranks, conference ranks and seeds as (seasons, teams) int arrays; seed 0 means no playoffs and -1 marks teams outside every division
+    """
+    if games is not None:
+        from standings import rank_standings
+        return rank_standings(wins, losses, ties, *games, division_groups, conference_groups, playoff_teams)
+
+    pct = win_percentage(wins, losses, ties)
+    division_rank = np.full(pct.shape, -1, dtype=np.int16)
+    conference_rank = np.full(pct.shape, -1, dtype=np.int16)
+    seeds = np.full(pct.shape, -1, dtype=np.int16)
+
+    for rows in division_groups.values():
+        division_rank[:, rows] = rank_within(pct, rows)
+    #division winners sort ahead of every other team, then by win percentage
+    seed_key = pct + 2.0 * (division_rank == 0)
+    for rows in conference_groups.values():
+        conference_rank[:, rows] = rank_within(pct, rows)
+        order = rank_within(seed_key, rows)
+        seeds[:, rows] = np.where(order < playoff_teams, order + 1, 0)
+    return division_rank, conference_rank, seeds
+
+
+
+class SeasonAggregator:
+    """
+    This class keeps running win, finish and playoff counts of simulated seasons in fixed memory
+    """
+
+    #ask the simulation to keep every game, so seeding can use the tiebreakers
+    uses_games = True
+
+    def __init__(self, team_names, max_games=league.SEASON_GAMES, divisions=league.DIVISIONS,
+                 playoff_teams=league.PLAYOFF_TEAMS, conferences=None):
+        """
+        Initialize an empty aggregator.
+
+        args:
+        team_names: list of team names in array order
+        max_games: most games a team plays in a season, the win histogram covers 0..max_games
+        divisions: dictionary of division name to team names
+        playoff_teams: playoff spots per conference
+        conferences: dictionary of division name -> conference name, see league.conference_of
+        """
+        self.team_names = list(team_names)
+        self.max_games = max_games
+        self.playoff_teams = playoff_teams
+        self.divisions = {name: list(members) for name, members in divisions.items()}
+        self.conferences = {division: league.conference_of(division, conferences) for division in self.divisions}
+        #master seed of the simulated seasons, set by the runner when known
+        self.seed = None
+        self.division_groups, self.conference_groups = league.group_indices(self.team_names, divisions, self.conferences)
+        division_size = max((len(rows) for rows in self.division_groups.values()), default=1)
+        conference_size = max((len(rows) for rows in self.conference_groups.values()), default=1)
+
+        num_teams = len(self.team_names)
+        self.seasons = 0
+        self.win_counts = np.zeros((num_teams, max_games + 1), dtype=np.int64)
+        self.division_rank_counts = np.zeros((num_teams, division_size), dtype=np.int64)
+        self.conference_rank_counts = np.zeros((num_teams, conference_size), dtype=np.int64)
+        #column 0 counts seasons without a playoff spot
+        self.seed_counts = np.zeros((num_teams, playoff_teams + 1), dtype=np.int64)
+
+
+    def add_records(self, wins, losses, ties, games=None):
+        """
+        Add the final records of one season (arrays of shape (teams,)) or many (shape (seasons, teams))
+
+        args:
+        wins, losses, ties: record arrays in team_names order
+        games: optional (away, home, outcomes) arrays of the seasons' games, breaks ties with the NFL tiebreakers
+        """
+        wins = np.atleast_2d(np.asarray(wins))
+        losses = np.atleast_2d(np.asarray(losses))
+        ties = np.atleast_2d(np.asarray(ties))
+        if games is not None:
+            away, home, outcomes = games
+            games = (away, home, np.atleast_2d(np.asarray(outcomes)))
+        division_rank, conference_rank, seeds = playoff_seeds(wins, losses, ties, self.division_groups,
+                                                              self.conference_groups, self.playoff_teams, games)
+        for t in range(len(self.team_names)):
+            self.win_counts[t] += np.bincount(wins[:, t], minlength=self.max_games + 1)[:self.max_games + 1]
+            if seeds[0, t] >= 0:
+                self.division_rank_counts[t] += np.bincount(division_rank[:, t], minlength=self.division_rank_counts.shape[1])
+                self.conference_rank_counts[t] += np.bincount(conference_rank[:, t], minlength=self.conference_rank_counts.shape[1])
+                self.seed_counts[t] += np.bincount(seeds[:, t], minlength=self.playoff_teams + 1)
+        self.seasons += wins.shape[0]
+
+
+    def add_batch(self, batch):
+        """
+        Add every season of a SeasonBatch
+
+        args:
+        batch: SeasonBatch from monte_carlo.simulate_seasons
+        """
+        games = None
+        if batch.outcomes is not None and batch.away is not None:
+            games = (batch.away, batch.home, batch.outcomes)
+        self.add_records(batch.wins, batch.losses, batch.ties, games)
+
+
+    def add_teams(self, teams):
+        """
+        Add the current records of Team objects as one season, e.g. right after simulate_season
+
+        args:
+        teams: dictionary containing Team instances indexed by team names
+        """
+        team_list = [teams[name] for name in self.team_names]
+        self.add_records([team.current_wins for team in team_list],
+                         [team.current_losses for team in team_list],
+                         [team.current_ties for team in team_list])
+
+
+    def merge(self, other):
+        """
+        Add the counts of another aggregator over the same teams into this one
+
+        args:
+        other: SeasonAggregator to merge
+        """
+        if other.team_names != self.team_names or other.win_counts.shape != self.win_counts.shape:
+            raise ValueError("Can only merge aggregators over the same teams and season length")
+        self.seasons += other.seasons
+        self.win_counts += other.win_counts
+        self.division_rank_counts += other.division_rank_counts
+        self.conference_rank_counts += other.conference_rank_counts
+        self.seed_counts += other.seed_counts
+
+
+    def mean_wins(self):
+        """
+        Return the mean wins of every team as an array in team_names order
+        """
+        return self.win_counts @ np.arange(self.max_games + 1) / max(self.seasons, 1)
+
+
+    def variance_wins(self):
+        """
+        Return the variance of every team's wins as an array in team_names order
+        """
+        w = np.arange(self.max_games + 1)
+        mean = self.mean_wins()
+        return self.win_counts @ (w * w) / max(self.seasons, 1) - mean * mean
+
+
+    def seed_probabilities(self):
+        """
+        Return an array of shape (teams, playoff_teams + 1) with the chance of each seed, column 0 is missing the playoffs
+        """
+        return self.seed_counts / max(self.seasons, 1)
+
+
+    def playoff_probability(self):
+        """
+        Return every team's chance of making the playoffs as an array in team_names order
+        """
+        return self.seed_counts[:, 1:].sum(axis=1) / max(self.seasons, 1)
+
+
+    def division_title_probability(self):
+        """
+        Return every team's chance of finishing first in its division as an array in team_names order
+        """
+        return self.division_rank_counts[:, 0] / max(self.seasons, 1)
+
+
+    def summary(self):
+        """
+        Summarize the aggregate per team
+
+        return:
+        dictionary keyed by team name with mean and variance of wins, division title and playoff chances, the chance of
+        each playoff seed from 1 up and the win histogram
+        """
+        mean = self.mean_wins()
+        variance = self.variance_wins()
+        division = self.division_title_probability()
+        playoffs = self.playoff_probability()
+        seeds = self.seed_probabilities()
+        return {
+            name: {
+                "mean_wins": float(mean[t]),
+                "variance_wins": float(variance[t]),
+                "division_title": float(division[t]),
+                "playoffs": float(playoffs[t]),
+                "seeds": seeds[t, 1:].tolist(),
+                "win_histogram": self.win_counts[t].tolist(),
+            }
+            for t, name in enumerate(self.team_names)
+        }
+
+
+    def save(self, path):
+        """
+        Write the counts to a compressed numpy file
+
+        args:
+        path: path of the .npz file, written atomically
+        """
+        meta = {"team_names": self.team_names, "max_games": self.max_games, "playoff_teams": self.playoff_teams,
+                "seasons": self.seasons, "seed": self.seed, "divisions": self.divisions,
+                "conferences": self.conferences}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), win_counts=self.win_counts,
+                                division_rank_counts=self.division_rank_counts,
+                                conference_rank_counts=self.conference_rank_counts, seed_counts=self.seed_counts)
+        os.replace(tmp_path, path)
+
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read counts written by save
+
+        args:
+        path: path of the .npz file
+
+        return:
+        SeasonAggregator
+        """
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            aggregator = cls(meta["team_names"], meta["max_games"], meta["divisions"], meta["playoff_teams"],
+                             meta.get("conferences"))
+            aggregator.seasons = meta["seasons"]
+            aggregator.seed = meta["seed"]
+            aggregator.win_counts[:] = data["win_counts"]
+            aggregator.division_rank_counts[:] = data["division_rank_counts"]
+            aggregator.conference_rank_counts[:] = data["conference_rank_counts"]
+            aggregator.seed_counts[:] = data["seed_counts"]
+        return aggregator
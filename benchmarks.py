@@ -0,0 +1,277 @@
+#import subprocess/time to time the program, tracemalloc for peak memory, json to keep the tracked numbers
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+#directory with FFHelper.py and the CSV files
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+OFFENSE_FILE = os.path.join(DATA_DIR, "2023 Fantasy Offense Stats.csv")
+DEFENSE_FILE = os.path.join(DATA_DIR, "2023 Fantasy Defense Stats.csv")
+SCHEDULE_FILE = os.path.join(DATA_DIR, "2023 Schedule.csv")
+
+#tracked benchmark numbers for the "full" and "quick" runs, committed so changes show up in review
+BASELINE_FILE = os.path.join(DATA_DIR, "benchmark_baselines.json")
+
+#allowed relative change against a baseline before a benchmark counts as a regression,
+#generous because the baselines are wall-clock numbers from one machine
+DEFAULT_TOLERANCE = 0.5
+
+
+def time_to_first_output(runs=5, script="FFHelper.py"):
+    """
+    Time how long `python FFHelper.py` takes to print its first line
+
+    args:
+    runs: number of fresh processes to time
+    script: script to run from DATA_DIR
+
+    return:
+    median seconds from process start to the first line of output
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, script], cwd=DATA_DIR, text=True,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        process.stdout.readline()
+        timings.append(time.perf_counter() - start)
+        process.communicate("quit\n")
+    return statistics.median(timings)
+
+
+
+def import_time(runs=5, module="FFHelper"):
+    """
+    Time `import FFHelper` in fresh processes
+
+    args:
+    runs: number of fresh processes to time
+    module: module to import
+
+    return:
+    median seconds to start python and import the module
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=DATA_DIR, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+
+def seconds_per_call(func, min_time=0.2, repeat=3):
+    """
+    Time a function, calling it enough times to run for at least min_time
+
+    args:
+    func: function without arguments
+    min_time: seconds each timing round should last
+    repeat: rounds to run, the fastest one is kept
+
+    return:
+    seconds per call
+    """
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        calls *= 2
+    best = elapsed / calls
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+
+def peak_memory(func):
+    """
+    Return the peak bytes traced by tracemalloc while func runs
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+
+def write_synthetic_league(directory, num_teams, weeks=17, seed=0):
+    """
+    Write offense, defense and schedule CSVs for a league of made-up teams, see synthetic.write_league
+
+    args:
+    directory: where to write the files
+    num_teams: number of teams (even)
+    weeks: number of weeks in the schedule
+    seed: seed for the made-up stats and pairings
+
+    return:
+    offense, defense and schedule file paths as a tuple
+    """
+    import synthetic
+    return tuple(synthetic.write_league(directory, num_teams, weeks, seed)[:3])
+
+
+
+def run_benchmarks(quick=False):
+    """
+    Run every benchmark
+
+    args:
+    quick: use smaller runs, for a fast check
+
+    return:
+    dictionary of benchmark name to value; names ending in _per_sec are higher-is-better, the rest lower-is-better
+    """
+    import FFHelper
+    import monte_carlo
+    import parallel
+
+    min_time = 0.05 if quick else 0.2
+    bulk_seasons = 1000 if quick else 10000
+    results = {}
+
+    #process start up
+    results["import_seconds"] = import_time(runs=3 if quick else 5)
+    results["startup_seconds"] = time_to_first_output(runs=3 if quick else 5)
+
+    #loading teams
+    results["create_teams_csv_seconds"] = seconds_per_call(lambda: FFHelper.create_teams(OFFENSE_FILE, DEFENSE_FILE, cache=False), min_time)
+    results["create_teams_pandas_seconds"] = seconds_per_call(lambda: FFHelper.create_teams(OFFENSE_FILE, DEFENSE_FILE, cache=False, engine="pandas"), min_time)
+    results["create_teams_cached_seconds"] = seconds_per_call(lambda: FFHelper.create_teams(OFFENSE_FILE, DEFENSE_FILE), min_time)
+
+    #per-game pieces
+    teams = FFHelper.create_teams(OFFENSE_FILE, DEFENSE_FILE)
+    home, away = teams["Buffalo Bills"], teams["Miami Dolphins"]
+    results["get_weather_per_sec"] = 1 / seconds_per_call(lambda: FFHelper.get_weather("Buffalo Bills"), min_time)
+    results["apply_weather_effects_per_sec"] = 1 / seconds_per_call(lambda: FFHelper.apply_weather_effects("Snow", home), min_time)
+    results["simulate_game_per_sec"] = 1 / seconds_per_call(lambda: FFHelper.simulate_game(away, home), min_time)
+
+    #one season, game by game
+    def one_season():
+        FFHelper.reset_all_teams(teams)
+        FFHelper.simulate_season(SCHEDULE_FILE, teams)
+    results["simulate_season_games_per_sec"] = 272 / seconds_per_call(one_season, min_time)
+
+    #many seasons with the vectorized engine and the process pool
+    bulk = lambda: monte_carlo.simulate_seasons(bulk_seasons, SCHEDULE_FILE, teams, seed=0, keep_games=False)
+    results["bulk_seasons_per_sec"] = bulk_seasons / seconds_per_call(bulk, min_time, repeat=2)
+    results["bulk_peak_bytes"] = peak_memory(bulk)
+    pooled = lambda: parallel.simulate_seasons_parallel(bulk_seasons * 4, SCHEDULE_FILE, teams, seed=0, shard_size=bulk_seasons)
+    results["parallel_seasons_per_sec"] = bulk_seasons * 4 / seconds_per_call(pooled, min_time, repeat=1)
+
+    #scaled-up made-up league
+    with tempfile.TemporaryDirectory() as directory:
+        num_teams = 320 if quick else 2000
+        offense_file, defense_file, schedule_file = write_synthetic_league(directory, num_teams)
+        start = time.perf_counter()
+        big_teams = FFHelper.create_teams(offense_file, defense_file, cache=False)
+        results["synthetic_load_seconds"] = time.perf_counter() - start
+        seasons = 100
+        synthetic = lambda: monte_carlo.simulate_seasons(seasons, schedule_file, big_teams, seed=0, keep_games=False)
+        results["synthetic_games_per_sec"] = seasons * (num_teams // 2) * 17 / seconds_per_call(synthetic, min_time, repeat=2)
+        results["synthetic_peak_bytes"] = peak_memory(synthetic)
+
+    return results
+
+
+
+def compare_to_baselines(results, baselines, tolerance=DEFAULT_TOLERANCE):
+    """
+    Find the benchmarks that got worse than their baseline by more than the tolerance
+
+    args:
+    results: dictionary from run_benchmarks
+    baselines: dictionary of recorded values
+    tolerance: allowed relative change, 0.5 allows 50% slower or bigger
+
+    return:
+    list of (name, baseline, result) for every regression
+    """
+    regressions = []
+    for name, value in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        if name.endswith("_per_sec"):
+            worse = value < baseline * (1 - tolerance)
+        else:
+            worse = value > baseline * (1 + tolerance)
+        if worse:
+            regressions.append((name, baseline, value))
+    return regressions
+
+
+
+def load_baselines(path=BASELINE_FILE):
+    """
+    Read the tracked benchmark numbers
+
+    return:
+    dictionary of run mode ("full"/"quick") to a dictionary of benchmark name to value
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+
+def save_baselines(baselines, path=BASELINE_FILE):
+    """
+    Write the tracked benchmark numbers
+
+    args:
+    baselines: dictionary of run mode to a dictionary of benchmark name to value
+    """
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+
+if __name__ == "__main__":
+    """
+    Run the benchmarks, compare them to the baselines and exit with status 1 on a regression
+    """
+    parser = argparse.ArgumentParser(description="Benchmark FFHelper and compare against benchmark_baselines.json")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative regression (default 0.5)")
+    parser.add_argument("--quick", action="store_true", help="smaller runs for a fast check")
+    parser.add_argument("--save", action="store_true", help="record these results as the new baselines")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    mode = "quick" if args.quick else "full"
+    results = run_benchmarks(quick=args.quick)
+    all_baselines = load_baselines()
+    baselines = all_baselines.get(mode, {})
+    for name, value in results.items():
+        print(f"{name:34} {value:>16.6g}   (baseline: {baselines.get(name, 'none')})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save:
+        all_baselines[mode] = {name: float(f"{value:.6g}") for name, value in results.items()}
+        save_baselines(all_baselines)
+    else:
+        regressions = compare_to_baselines(results, baselines, args.tolerance)
+        for name, baseline, value in regressions:
+            print(f"REGRESSION {name}: {value:.4f} vs baseline {baseline}")
+        sys.exit(1 if regressions else 0)
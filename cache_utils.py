@@ -0,0 +1,39 @@
+#import hashlib to hash input files, os to locate the cache directory
+import hashlib
+import os
+
+#environment variable that overrides where cached files are kept
+CACHE_DIR_ENV = "FFHELPER_CACHE_DIR"
+
+
+def file_digest(*paths):
+    """
+    Hash the contents of one or more files together
+
+    args:
+    paths: paths to the files, in a fixed order
+
+    return:
+    sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        #separate files so moving bytes between them changes the digest
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+
+def cache_dir():
+    """
+    Return the directory for cached files, creating it if needed
+
+    return:
+    path from FFHELPER_CACHE_DIR, or ~/.cache/ffhelper by default
+    """
+    path = os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.expanduser("~"), ".cache", "ffhelper")
+    os.makedirs(path, exist_ok=True)
+    return path
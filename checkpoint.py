@@ -0,0 +1,226 @@
+#import csv to read real results, json to save checkpoints, numpy to hold the records as arrays
+import csv
+import json
+
+import numpy as np
+
+#results csv header, the schedule columns plus each team's final score
+RESULT_COLUMNS = ["Week", "Team1", "Team2", "Team1 Score", "Team2 Score"]
+
+
+class SeasonCheckpoint:
+    """
+    This class holds every team's record and win streak after a given week
+
+    A checkpoint is a few small arrays, so taking one and restoring it between
+    resimulations of the rest of the season is cheap.
+    """
+
+    def __init__(self, team_names, week, wins, losses, ties, streak):
+        """
+        Initialize the checkpoint.
+
+        args:
+        team_names: list of team names in array order
+        week: last week included in the records, simulations resume at week + 1
+        wins, losses, ties, streak: integer arrays in team_names order
+        """
+        self.team_names = list(team_names)
+        self.week = week
+        self.wins = np.asarray(wins, dtype=np.int16)
+        self.losses = np.asarray(losses, dtype=np.int16)
+        self.ties = np.asarray(ties, dtype=np.int16)
+        self.streak = np.asarray(streak, dtype=np.int16)
+
+
+    @classmethod
+    def from_teams(cls, teams, week):
+        """
+        Snapshot the current records of Team objects
+
+        args:
+        teams: dictionary containing Team instances indexed by team names
+        week: last week the records include
+
+        return:
+        SeasonCheckpoint
+        """
+        team_list = list(teams.values())
+        return cls(teams.keys(), week,
+                   [team.current_wins for team in team_list],
+                   [team.current_losses for team in team_list],
+                   [team.current_ties for team in team_list],
+                   [team.win_streak for team in team_list])
+
+
+    def restore(self, teams):
+        """
+        Put the checkpoint records back on Team objects, e.g. before resimulating the remaining weeks
+
+        args:
+        teams: dictionary containing Team instances indexed by team names
+        """
+        for t, name in enumerate(self.team_names):
+            team = teams[name]
+            team.current_wins = int(self.wins[t])
+            team.current_losses = int(self.losses[t])
+            team.current_ties = int(self.ties[t])
+            team.win_streak = int(self.streak[t])
+
+
+    def arrays(self, team_names):
+        """
+        Return the records reordered to another team order
+
+        args:
+        team_names: list of team names in the caller's array order
+
+        return:
+        wins, losses, ties and streak arrays as a tuple
+        """
+        team_names = list(team_names)
+        if team_names == self.team_names:
+            return self.wins, self.losses, self.ties, self.streak
+        index = {name: t for t, name in enumerate(self.team_names)}
+        try:
+            rows = np.array([index[name] for name in team_names], dtype=np.intp)
+        except KeyError as e:
+            raise KeyError(f"Team {e.args[0]} is not in the checkpoint") from None
+        return self.wins[rows], self.losses[rows], self.ties[rows], self.streak[rows]
+
+
+    def to_dict(self):
+        """
+        Return the checkpoint as a dictionary of plain values keyed by team name
+        """
+        return {
+            "week": self.week,
+            "teams": {
+                name: {"wins": int(self.wins[t]), "losses": int(self.losses[t]),
+                       "ties": int(self.ties[t]), "win_streak": int(self.streak[t])}
+                for t, name in enumerate(self.team_names)
+            },
+        }
+
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a checkpoint from to_dict output
+
+        args:
+        data: dictionary from to_dict
+
+        return:
+        SeasonCheckpoint
+        """
+        teams = data["teams"]
+        return cls(teams.keys(), data["week"],
+                   [record["wins"] for record in teams.values()],
+                   [record["losses"] for record in teams.values()],
+                   [record["ties"] for record in teams.values()],
+                   [record["win_streak"] for record in teams.values()])
+
+
+    def save(self, path):
+        """
+        Write the checkpoint as JSON
+
+        args:
+        path: path of the checkpoint file
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a checkpoint written by save
+
+        args:
+        path: path of the checkpoint file
+
+        return:
+        SeasonCheckpoint
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+
+def read_results(results_file):
+    """
+    Read the real results of played games
+
+    The file has the schedule's Week, Team1 (away) and Team2 (home) columns
+    plus "Team1 Score" and "Team2 Score".
+
+    args:
+    results_file: path to the results CSV file
+
+    return:
+    list of (week, away team, home team, away score, home score) tuples in week order
+    """
+    games = []
+    with open(results_file, newline="") as f:
+        for row in csv.DictReader(f):
+            games.append((int(row["Week"]), row["Team1"], row["Team2"],
+                          float(row["Team1 Score"]), float(row["Team2 Score"])))
+    #streaks depend on game order, the file may list weeks in any order
+    games.sort(key=lambda game: game[0])
+    return games
+
+
+
+def apply_results(teams, games, through_week=None):
+    """
+    Update team records with real results
+
+    args:
+    teams: dictionary containing Team instances indexed by team names
+    games: (week, away team, home team, away score, home score) tuples in week order, e.g. from read_results
+    through_week: ignore games after this week, defaults to every game given
+
+    return:
+    last week applied, 0 if no games were applied
+    """
+    last_week = 0
+    for week, away, home, away_score, home_score in games:
+        if through_week is not None and week > through_week:
+            break
+        try:
+            team1, team2 = teams[away], teams[home]
+        except KeyError as e:
+            raise KeyError(f"Result team {e.args[0]} is not one of the loaded teams") from None
+        if away_score > home_score:
+            team1.update_record("win")
+            team2.update_record("loss")
+        elif home_score > away_score:
+            team2.update_record("win")
+            team1.update_record("loss")
+        else:
+            team1.update_record("tie")
+            team2.update_record("tie")
+        last_week = max(last_week, week)
+    return last_week
+
+
+
+def checkpoint_from_results(teams, results_file, through_week=None):
+    """
+    Reset the teams, apply the real results through a week and snapshot the records
+
+    args:
+    teams: dictionary containing Team instances indexed by team names
+    results_file: path to the results CSV file
+    through_week: last decided week, defaults to the last week in the file
+
+    return:
+    SeasonCheckpoint, the teams are left holding its records
+    """
+    for team in teams.values():
+        team.reset_record()
+    last_week = apply_results(teams, read_results(results_file), through_week)
+    return SeasonCheckpoint.from_teams(teams, through_week if through_week is not None else last_week)
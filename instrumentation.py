@@ -0,0 +1,347 @@
+#import time for wall clock timing, tracemalloc for allocation peaks, cProfile for an optional full profile
+import cProfile
+import functools
+import importlib
+import inspect
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import FFHelper
+
+#FFHelper functions timed when instrumentation is enabled
+STAGES = ("create_teams", "simulate_season", "iter_season", "simulate_game", "play_game", "get_weather",
+          "apply_weather_effects", "format_result", "print_team_records", "print_expected_records")
+
+
+def scheduled_games(schedule_file, teams, checkpoint=None):
+    """
+    Return the games one season simulates, the ones after the checkpoint's week when there is one
+    """
+    import monte_carlo
+    week, _, _ = monte_carlo.schedule_arrays(schedule_file, list(teams.keys()))
+    return int((week > checkpoint.week).sum()) if checkpoint is not None else len(week)
+
+
+
+def batch_games(arguments, batch):
+    """
+    Return the games in a monte_carlo.SeasonBatch
+    """
+    return len(batch) * len(batch.away)
+
+
+
+def tally_games(arguments, tally):
+    """
+    Return the games behind the tally of a sharded run, from its season count and schedule
+    """
+    return tally.seasons * scheduled_games(arguments["schedule_file"], arguments["teams"], arguments["checkpoint"])
+
+
+
+def adaptive_games(arguments, result):
+    """
+    Return the games behind an adaptive run, see tally_games
+    """
+    return tally_games(arguments, result[0])
+
+
+
+#vectorized and sharded stages timed as "module.function", with the function counting the games behind a result;
+#games are only counted by the outermost of them, e.g. a parallel run counts its shards' batches once
+BULK_STAGES = {
+    "monte_carlo.simulate_seasons": batch_games,
+    "parallel.simulate_shard": batch_games,
+    "parallel.run_shard": None,
+    "parallel.simulate_seasons_parallel": tally_games,
+    "adaptive.simulate_adaptive": adaptive_games,
+    "standings.rank_standings": None,
+}
+
+
+class StageStats:
+    """
+    This class holds the call count, wall time and allocation peak of one instrumented function
+    """
+
+    __slots__ = ("calls", "seconds", "peak_bytes")
+
+    def __init__(self):
+        """
+        Initialize empty stats.
+        """
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_bytes = 0
+
+
+    def as_dict(self):
+        """
+        Return the stats and the mean seconds per call as a dictionary
+        """
+        return {"calls": self.calls, "seconds": self.seconds,
+                "mean_seconds": self.seconds / self.calls if self.calls else 0.0,
+                "peak_bytes": self.peak_bytes}
+
+
+
+class Instrumentation:
+    """
+    This class swaps FFHelper's hot-path functions and the bulk simulation stages for timed wrappers while it is enabled
+
+    Wrappers are only installed by enable(), FFHelper looks its functions up
+    as module globals and the bulk stages are called through their modules,
+    so disabled instrumentation leaves the original functions in place and
+    costs nothing. Stages that run in worker processes are timed there and
+    not reported, the run that started them is.
+    """
+
+    def __init__(self, module=FFHelper, stages=STAGES, bulk_stages=BULK_STAGES):
+        """
+        Initialize the instrumentation.
+
+        args:
+        module: module whose functions are wrapped
+        stages: names of the functions to wrap
+        bulk_stages: dictionary of "module.function" -> games counter (or None) of the bulk stages to wrap
+        """
+        self.module = module
+        self.stages = stages
+        self.bulk_stages = bulk_stages
+        self.stats = {stage: StageStats() for stage in (*stages, *bulk_stages)}
+        self.originals = {}
+        #bulk stages currently running, and the games and seconds of the outermost ones
+        self.bulk_depth = 0
+        self.bulk_games = 0
+        self.bulk_seconds = 0.0
+        self.track_memory = False
+        self.started = None
+        self.elapsed = 0.0
+        #allocation frames of the stages currently running, [current bytes at start, running peak]
+        self.memory_stack = []
+
+
+    def enable(self, track_memory=False):
+        """
+        Install the timed wrappers
+
+        args:
+        track_memory: also record allocation peaks with tracemalloc (slow)
+        """
+        if self.originals:
+            return
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        for stage in self.stages:
+            original = getattr(self.module, stage)
+            self.originals[stage] = (self.module, stage, original)
+            wrap = self._wrap_generator if inspect.isgeneratorfunction(original) else self._wrap
+            setattr(self.module, stage, wrap(original, self.stats[stage]))
+        for stage, games in self.bulk_stages.items():
+            module_name, name = stage.rsplit(".", 1)
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError:
+                continue #numpy is missing, only the game-by-game path can run
+            original = getattr(module, name)
+            self.originals[stage] = (module, name, original)
+            setattr(module, name, self._wrap_bulk(original, self.stats[stage], games))
+        self.started = time.perf_counter()
+
+
+    def disable(self):
+        """
+        Put the original functions back
+        """
+        for module, name, original in self.originals.values():
+            setattr(module, name, original)
+        self.originals = {}
+        if self.started is not None:
+            self.elapsed += time.perf_counter() - self.started
+            self.started = None
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+    def _memory_start(self):
+        """
+        Open an allocation frame for a stage that is starting, folding the peak so far into the enclosing frame
+        """
+        if self.memory_stack:
+            self.memory_stack[-1][1] = max(self.memory_stack[-1][1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        self.memory_stack.append([current, current])
+
+
+    def _memory_end(self, stats):
+        """
+        Close the frame of a finished stage and record its allocation peak above where it started
+
+        args:
+        stats: StageStats of the stage
+        """
+        start, peak = self.memory_stack.pop()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        stats.peak_bytes = max(stats.peak_bytes, peak - start)
+        if self.memory_stack:
+            self.memory_stack[-1][1] = max(self.memory_stack[-1][1], peak)
+
+
+    def _wrap(self, func, stats):
+        """
+        Return a wrapper that counts the calls of a function and times them
+
+        args:
+        func: function to wrap
+        stats: StageStats of the stage
+
+        return:
+        wrapper with the function's name and docstring
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if self.track_memory:
+                self._memory_start()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.seconds += time.perf_counter() - start
+                stats.calls += 1
+                if self.track_memory:
+                    self._memory_end(stats)
+        return wrapper
+
+
+    def _wrap_generator(self, func, stats):
+        """
+        Return a wrapper that counts the calls of a generator function and times the steps of its generators
+
+        Only the time spent inside the generator counts, not the caller's time between items.
+
+        args:
+        func: generator function to wrap
+        stats: StageStats of the stage
+
+        return:
+        wrapper with the function's name and docstring
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stats.calls += 1
+            generator = func(*args, **kwargs)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    stats.seconds += time.perf_counter() - start
+                yield item
+        return wrapper
+
+
+    def _wrap_bulk(self, func, stats, games):
+        """
+        Return a timed wrapper of a bulk stage that also counts the games behind an outermost call
+
+        args:
+        func: function to wrap
+        stats: StageStats of the stage
+        games: function of the bound arguments and the result returning the games simulated, None for stages
+               that don't simulate on their own
+
+        return:
+        wrapper with the function's name and docstring
+        """
+        timed = self._wrap(func, stats)
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            outermost = self.bulk_depth == 0
+            self.bulk_depth += 1
+            start = time.perf_counter()
+            try:
+                result = timed(*args, **kwargs)
+            finally:
+                self.bulk_depth -= 1
+            if outermost:
+                self.bulk_seconds += time.perf_counter() - start
+                if games is not None:
+                    arguments = signature.bind(*args, **kwargs)
+                    arguments.apply_defaults()
+                    self.bulk_games += games(arguments.arguments, result)
+            return result
+        return wrapper
+
+
+    def report(self):
+        """
+        Build the metrics report
+
+        return:
+        dictionary with total seconds, games simulated, games per second and per-stage stats
+        """
+        elapsed = self.elapsed + (time.perf_counter() - self.started if self.started is not None else 0.0)
+        stages = {stage: stats.as_dict() for stage, stats in self.stats.items()}
+        #games played one by one and games simulated in bulk, over the time spent simulating them
+        games = (self.stats["play_game"].calls if "play_game" in self.stats else 0) + self.bulk_games
+        season_seconds = (self.stats["iter_season"].seconds if "iter_season" in self.stats else 0.0) + self.bulk_seconds
+        report = {
+            "elapsed_seconds": elapsed,
+            "games": games,
+            "games_per_sec": games / season_seconds if season_seconds else 0.0,
+            "stages": stages,
+        }
+        if self.track_memory:
+            report["peak_bytes"] = max((stats.peak_bytes for stats in self.stats.values()), default=0)
+        return report
+
+
+    def write_report(self, path):
+        """
+        Write the metrics report as JSON
+
+        args:
+        path: path of the report file
+        """
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
+
+
+
+@contextmanager
+def profiled(report_path=None, pstats_path=None, track_memory=False, module=FFHelper):
+    """
+    Instrument FFHelper for the duration of a with block
+
+    args:
+    report_path: write the JSON metrics report here when the block ends
+    pstats_path: also run cProfile and dump its stats here (read them with pstats)
+    track_memory: record allocation peaks with tracemalloc
+    module: module to instrument, the running script's module when FFHelper.py is run directly
+
+    yields:
+    the Instrumentation, report() can be read inside or after the block
+    """
+    instrumentation = Instrumentation(module)
+    profiler = cProfile.Profile() if pstats_path else None
+    instrumentation.enable(track_memory)
+    if profiler:
+        profiler.enable()
+    try:
+        yield instrumentation
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(pstats_path)
+        instrumentation.disable()
+        if report_path:
+            instrumentation.write_report(report_path)
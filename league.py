@@ -0,0 +1,151 @@
+#league structure used for standings, playoff seeding, stadium climates and season length
+#numpy is only imported for the index arrays, so FFHelper can read the league without it
+import json
+import os
+
+#league definition shipped next to this script
+LEAGUE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "League.json")
+
+#environment variable naming another league config to use as the default, e.g. one from synthetic.write_league
+LEAGUE_ENV = "FFHELPER_LEAGUE"
+
+
+class League:
+    """
+    This class holds a league's conferences, divisions, stadium climate file and season length
+    """
+
+    def __init__(self, name, conferences, season_games=17, playoff_teams=7, stadium_weather=None):
+        """
+        Initialize a league.
+
+        args:
+        name: name of the league
+        conferences: dictionary of conference name -> dictionary of division name -> team names
+        season_games: games every team plays in a season
+        playoff_teams: playoff spots per conference
+        stadium_weather: path to the stadium climate csv, see weather.load_stadium_weather
+        """
+        self.name = name
+        self.conferences = {conference: {division: tuple(members) for division, members in divisions.items()}
+                            for conference, divisions in conferences.items()}
+        self.season_games = season_games
+        self.playoff_teams = playoff_teams
+        self.stadium_weather = stadium_weather
+        self.divisions = {}
+        self.division_conferences = {}
+        for conference, divisions in self.conferences.items():
+            for division, members in divisions.items():
+                self.divisions[division] = members
+                self.division_conferences[division] = conference
+
+
+    def conference_teams(self, conference):
+        """
+        Return the names of every team in a conference, division by division
+        """
+        return [name for members in self.conferences[conference].values() for name in members]
+
+
+    def to_dict(self, base_dir=None):
+        """
+        Return the league as a dictionary in the config file layout
+
+        args:
+        base_dir: write the stadium climate path relative to this directory
+        """
+        stadium_weather = self.stadium_weather
+        if stadium_weather and base_dir:
+            stadium_weather = os.path.relpath(stadium_weather, base_dir)
+        return {"name": self.name, "season_games": self.season_games, "playoff_teams": self.playoff_teams,
+                "stadium_weather": stadium_weather,
+                "conferences": {conference: {division: list(members) for division, members in divisions.items()}
+                                for conference, divisions in self.conferences.items()}}
+
+
+    def save(self, path):
+        """
+        Write the league to a JSON config file
+
+        args:
+        path: path of the config file
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(os.path.dirname(os.path.abspath(path))), f, indent=2)
+            f.write("\n")
+
+
+
+def load_league(path=LEAGUE_FILE):
+    """
+    Read a league from a JSON config file
+
+    The file has "name", "season_games", "playoff_teams", "stadium_weather"
+    (a path relative to the config file) and "conferences", which maps each
+    conference to its divisions and each division to its team names.
+
+    args:
+    path: path of the config file
+
+    return:
+    League
+    """
+    with open(path) as f:
+        config = json.load(f)
+    stadium_weather = config.get("stadium_weather")
+    if stadium_weather:
+        stadium_weather = os.path.join(os.path.dirname(os.path.abspath(path)), stadium_weather)
+    return League(config.get("name", ""), config["conferences"], config.get("season_games", 17),
+                  config.get("playoff_teams", 7), stadium_weather)
+
+
+
+#the league used as the default across the package, and its divisions, playoff spots and season length
+DEFAULT_LEAGUE = load_league(os.environ.get(LEAGUE_ENV) or LEAGUE_FILE)
+DIVISIONS = DEFAULT_LEAGUE.divisions
+PLAYOFF_TEAMS = DEFAULT_LEAGUE.playoff_teams
+SEASON_GAMES = DEFAULT_LEAGUE.season_games
+
+
+def conference_of(division, conferences=None):
+    """
+    Return the conference a division belongs to
+
+    args:
+    division: division name such as "AFC East"
+    conferences: dictionary of division name -> conference name, defaults to the shipped league's;
+                 divisions missing from it use the first word of their name
+    """
+    if conferences is None:
+        conferences = DEFAULT_LEAGUE.division_conferences
+    return conferences.get(division) or division.split(" ", 1)[0]
+
+
+
+def group_indices(team_names, divisions=DIVISIONS, conferences=None):
+    """
+    Find the array positions of every division's and conference's teams
+
+    Teams that are not in any division are left out of every group.
+
+    args:
+    team_names: list of team names in array order
+    divisions: dictionary of division name to team names
+    conferences: dictionary of division name -> conference name, see conference_of
+
+    return:
+    dictionaries of division name -> index array and conference name -> index array as a tuple
+    """
+    import numpy as np
+
+    index = {name: i for i, name in enumerate(team_names)}
+    division_groups = {}
+    conference_groups = {}
+    for division, members in divisions.items():
+        rows = [index[name] for name in members if name in index]
+        if not rows:
+            continue
+        division_groups[division] = np.array(rows, dtype=np.intp)
+        conference_groups.setdefault(conference_of(division, conferences), []).extend(rows)
+    conference_groups = {name: np.array(sorted(rows), dtype=np.intp) for name, rows in conference_groups.items()}
+    return division_groups, conference_groups
@@ -0,0 +1,152 @@
+#import numpy to build the pairwise score tensor
+import numpy as np
+
+from FFHelper import HOME_MULTIPLIER, WEATHER_EFFECTS, WIN_STREAK_BONUS
+from weather import WEATHER_TYPES
+
+#largest league given a pairwise index, (teams x teams) float tables grow quickly past this
+MAX_INDEX_TEAMS = 512
+
+#weather name -> position on the weather axis
+WEATHER_CODES = {weather: code for code, weather in enumerate(WEATHER_TYPES)}
+
+
+class MatchupIndex:
+    """
+    This class holds the base score of both teams in every (home, away, weather) matchup
+
+    Base scores include the home multiplier but not the win streak multiplier,
+    which depends on the season so far. play_game draws the weather but scores
+    with the unadjusted stats, so unless weather_in_score is set every weather
+    slice is a view of the same (home, away) matrix.
+    """
+
+    def __init__(self, source, weather_in_score=False):
+        """
+        Build the index.
+
+        args:
+        source: TeamTable, indexed by row, or dictionary of Team instances, indexed in dictionary order
+        weather_in_score: score with the weather-adjusted efficiency and net production from WEATHER_EFFECTS
+        """
+        if isinstance(source, dict):
+            team_list = list(source.values())
+            self.names = list(source.keys())
+            self.version = None
+            efficiency = np.array([team.team_efficiency for team in team_list], dtype=np.float64)
+            net_production = np.array([team.calculate_net_production() for team in team_list], dtype=np.float64)
+            production_allowed = np.array([team.offensive_production_allowed for team in team_list], dtype=np.float64)
+        else:
+            self.names = list(source.names)
+            self.version = source.version
+            efficiency = np.frombuffer(source.column("team_efficiency"), dtype=np.float64)
+            net_production = np.frombuffer(source.column("net_production"), dtype=np.int64).astype(np.float64)
+            production_allowed = np.frombuffer(source.column("offensive_production_allowed"), dtype=np.float64)
+        self.team_index = {name: i for i, name in enumerate(self.names)}
+        self.weather_in_score = weather_in_score
+
+        num_teams = len(self.names)
+        num_weather = len(WEATHER_TYPES)
+        if weather_in_score:
+            efficiency_multiplier = np.array([WEATHER_EFFECTS[weather][0] for weather in WEATHER_TYPES], dtype=np.float64)
+            net_multiplier = np.array([WEATHER_EFFECTS[weather][1] for weather in WEATHER_TYPES], dtype=np.float64)
+            #offense of the row team against the defense of the column team, per weather
+            pairs = (efficiency[:, None, None] * efficiency_multiplier
+                     + (net_production[:, None, None] * net_multiplier - production_allowed[None, :, None]))
+            self.home_scores = pairs * HOME_MULTIPLIER
+            self.away_scores = pairs.transpose(1, 0, 2)
+        else:
+            #same sums as play_game: efficiency + (net production - opponent's production allowed)
+            pairs = efficiency[:, None] + (net_production[:, None] - production_allowed[None, :])
+            self.home_scores = np.broadcast_to((pairs * HOME_MULTIPLIER)[:, :, None], (num_teams, num_teams, num_weather))
+            self.away_scores = np.broadcast_to(pairs.T[:, :, None], (num_teams, num_teams, num_weather))
+        #flat python lists for single-game lookups, built on first use
+        self._home_list = None
+        self._away_list = None
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    def base_scores(self, home, away, weather_code=0):
+        """
+        Look up the base scores of one game by team row, the per-game path of play_game
+
+        args:
+        home: row of the home team
+        away: row of the away team
+        weather_code: index into WEATHER_TYPES, only used when weather_in_score is set
+
+        return:
+        home and away base scores as a tuple of floats
+        """
+        if self._home_list is None:
+            if self.weather_in_score:
+                self._home_list = self.home_scores.ravel().tolist()
+                self._away_list = self.away_scores.ravel().tolist()
+            else:
+                self._home_list = self.home_scores[:, :, 0].ravel().tolist()
+                self._away_list = self.away_scores[:, :, 0].ravel().tolist()
+        key = home * len(self.names) + away
+        if self.weather_in_score:
+            key = key * len(WEATHER_TYPES) + weather_code
+        return self._home_list[key], self._away_list[key]
+
+
+    def game_scores(self, home, away, weather=None):
+        """
+        Look up the base scores of many games at once
+
+        args:
+        home: array of home team rows
+        away: array of away team rows, same shape as home
+        weather: array of weather codes broadcast against home, clear when None
+
+        return:
+        home and away base score arrays as a tuple
+        """
+        code = 0 if weather is None else weather
+        return self.home_scores[home, away, code], self.away_scores[home, away, code]
+
+
+    def scores(self, home, away, weather="Clear"):
+        """
+        Return the base scores of a matchup by team names
+
+        args:
+        home: name of the home team
+        away: name of the away team
+        weather: weather name from WEATHER_TYPES
+
+        return:
+        home and away base scores as a tuple of floats
+        """
+        h, a, w = self.team_index[home], self.team_index[away], WEATHER_CODES[weather]
+        return float(self.home_scores[h, a, w]), float(self.away_scores[h, a, w])
+
+
+    def predict(self, home, away, weather="Clear", home_streak=0, away_streak=0, streak_bonus=WIN_STREAK_BONUS):
+        """
+        Answer "who wins away at home in this weather" with the model's scoring
+
+        args:
+        home: name of the home team
+        away: name of the away team
+        weather: weather name from WEATHER_TYPES
+        home_streak, away_streak: current win streaks
+        streak_bonus: win streak multiplier per game
+
+        return:
+        home score, away score and the winner's name (None for a tie) as a tuple
+        """
+        home_score, away_score = self.scores(home, away, weather)
+        home_score *= 1 + (streak_bonus * home_streak)
+        away_score *= 1 + (streak_bonus * away_streak)
+        if home_score > away_score:
+            winner = home
+        elif away_score > home_score:
+            winner = away
+        else:
+            winner = None
+        return home_score, away_score, winner
@@ -0,0 +1,304 @@
+#import numpy to simulate many seasons at once with array math
+import numpy as np
+
+from FFHelper import HOME_MULTIPLIER, WIN_STREAK_BONUS
+import schedule_cache
+from weather import WEATHER_TYPES, default_sampler
+
+#encoded game outcomes, 0 is kept for games that have not been played
+NOT_PLAYED = 0
+WIN1 = 1
+WIN2 = 2
+TIE = 3
+
+
+class SeasonBatch:
+    """
+    This class holds the records of many simulated seasons as arrays
+    """
+
+    def __init__(self, team_names, wins, losses, ties, outcomes=None, weather=None, away=None, home=None):
+        """
+        Initialize a batch of simulated seasons.
+
+        args:
+        team_names: list of team names, giving the column order of every array
+        wins: array of shape (seasons, teams) with the wins of each team
+        losses: array of shape (seasons, teams) with the losses of each team
+        ties: array of shape (seasons, teams) with the ties of each team
+        outcomes: optional array of shape (seasons, games) with the encoded outcome of every game
+        weather: optional array of shape (seasons, games) with the index into WEATHER_TYPES of every game
+        away, home: optional team index arrays of the games in outcomes, the away (Team1) and home (Team2) columns
+        """
+        self.team_names = list(team_names)
+        self.wins = wins
+        self.losses = losses
+        self.ties = ties
+        self.outcomes = outcomes
+        self.weather = weather
+        self.away = away
+        self.home = home
+
+
+    def __len__(self):
+        """
+        Return the number of seasons in the batch
+        """
+        return self.wins.shape[0]
+
+
+    def team_index(self, team_name):
+        """
+        Return the column of a team in the record arrays
+
+        args:
+        team_name: name of the team
+        """
+        return self.team_names.index(team_name)
+
+
+    def win_distribution(self, max_games=None):
+        """
+        Count how often each team finished with each number of wins
+
+        args:
+        max_games: highest win total to count, defaults to the most games any team played
+
+        return:
+        array of shape (teams, max_games + 1) where [t, w] is the number of seasons team t won w games
+        """
+        if max_games is None:
+            max_games = int((self.wins + self.losses + self.ties).max(initial=0))
+        counts = np.zeros((len(self.team_names), max_games + 1), dtype=np.int64)
+        for t in range(len(self.team_names)):
+            counts[t] = np.bincount(self.wins[:, t], minlength=max_games + 1)[:max_games + 1]
+        return counts
+
+
+    def record_distribution(self, team_name):
+        """
+        Count how often a team finished with each win/loss/tie record
+
+        args:
+        team_name: name of the team
+
+        return:
+        dictionary mapping (wins, losses, ties) tuples to the number of seasons with that record
+        """
+        t = self.team_index(team_name)
+        records = np.stack([self.wins[:, t], self.losses[:, t], self.ties[:, t]], axis=1)
+        unique, counts = np.unique(records, axis=0, return_counts=True)
+        return {tuple(int(x) for x in record): int(count) for record, count in zip(unique, counts)}
+
+
+    def summary(self):
+        """
+        Summarize the batch with the mean record of every team
+
+        return:
+        dictionary keyed by team name with mean wins, losses and ties
+        """
+        return {
+            name: {
+                "wins": float(self.wins[:, t].mean()),
+                "losses": float(self.losses[:, t].mean()),
+                "ties": float(self.ties[:, t].mean()),
+            }
+            for t, name in enumerate(self.team_names)
+        }
+
+
+
+def team_arrays(teams):
+    """
+    Gather the stats used by simulate_game into arrays, one entry per team
+
+    args:
+    teams: dictionary containing Team instances indexed by team names
+
+    return:
+    team names, efficiency, net production and offensive production allowed as a tuple
+    """
+    names = list(teams.keys())
+    team_list = list(teams.values())
+    tables = {id(team.table) for team in team_list}
+
+    #teams from create_teams share one TeamTable, so read whole columns at once
+    if len(tables) == 1 and team_list:
+        table = team_list[0].table
+        rows = np.array([team.index for team in team_list], dtype=np.intp)
+        efficiency = np.frombuffer(table.column("team_efficiency"), dtype=np.float64)[rows]
+        net_production = np.frombuffer(table.column("net_production"), dtype=np.int64)[rows].astype(np.float64)
+        production_allowed = np.frombuffer(table.column("offensive_production_allowed"), dtype=np.float64)[rows]
+        return names, efficiency, net_production, production_allowed
+
+    efficiency = np.array([team.team_efficiency for team in team_list], dtype=np.float64)
+    net_production = np.array([team.calculate_net_production() for team in team_list], dtype=np.float64)
+    production_allowed = np.array([team.offensive_production_allowed for team in team_list], dtype=np.float64)
+    return names, efficiency, net_production, production_allowed
+
+
+
+def matchup_index(teams):
+    """
+    Return the matchup index of the teams and each team's row in it
+
+    args:
+    teams: dictionary containing Team instances indexed by team names
+
+    return:
+    matchups.MatchupIndex (None when the league is too big for one) and an array of rows in teams order as a tuple
+    """
+    from matchups import MAX_INDEX_TEAMS, MatchupIndex
+    team_list = list(teams.values())
+    #teams from create_teams share one TeamTable, which caches its index until a stat changes
+    if team_list and len({id(team.table) for team in team_list}) == 1:
+        return team_list[0].table.matchups(), np.array([team.index for team in team_list], dtype=np.intp)
+    index = MatchupIndex(teams) if len(team_list) <= MAX_INDEX_TEAMS else None
+    return index, np.arange(len(team_list), dtype=np.intp)
+
+
+
+def schedule_arrays(schedule_file, team_names):
+    """
+    Load the schedule as integer arrays of team indices
+
+    args:
+    schedule_file: path to the schedule CSV file
+    team_names: list of team names in array order
+
+    return:
+    week, away team index (Team1) and home team index (Team2) arrays as a tuple
+    """
+    return schedule_cache.load_schedule(schedule_file, team_names)
+
+
+
+def schedule_rounds(away, home):
+    """
+    Split the schedule into consecutive blocks of games where no team plays twice
+
+    Games inside a block don't depend on each other's win streaks, so a whole
+    block can be simulated with one set of array operations.
+
+    args:
+    away: away team index of every game
+    home: home team index of every game
+
+    return:
+    list of (start, stop) game slices
+    """
+    rounds = []
+    start = 0
+    seen = set()
+    for g in range(len(away)):
+        a, h = int(away[g]), int(home[g])
+        if a in seen or h in seen:
+            rounds.append((start, g))
+            start = g
+            seen = set()
+        seen.add(a)
+        seen.add(h)
+    if start < len(away):
+        rounds.append((start, len(away)))
+    return rounds
+
+
+
+def simulate_seasons(n, schedule_file, teams, seed=None, rng=None, keep_games=True, schedule=None, sampler=None, checkpoint=None,
+                     stream=None, first_season=0):
+    """
+    Simulate n seasons at once, following the same per-game logic as simulate_game
+
+    args:
+    n: number of seasons to simulate
+    schedule_file: path to the schedule CSV file
+    teams: dictionary containing Team instances indexed by team names
+    seed: seed for a new numpy generator, ignored when rng is given
+    rng: numpy Generator used for the weather draws
+    keep_games: keep the outcome and weather of every game in the returned batch
+    schedule: optional (week, away, home) arrays, skips reading schedule_file
+    sampler: WeatherSampler for the home stadiums, defaults to the shipped stadium profiles
+    checkpoint: checkpoint.SeasonCheckpoint to start every season from, only the weeks after it are simulated
+                and the kept outcomes and weather cover those weeks alone
+    stream: streams.CounterStream keying every weather draw by (season, game) instead of drawing from rng,
+            so the seasons match the same seasons of any other run or replay with the stream's seed
+    first_season: number of the batch's first season in the stream
+
+    return:
+    SeasonBatch with the records of every team in every season
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+
+    names = list(teams.keys())
+    matchups, rows = matchup_index(teams)
+    if schedule is None:
+        schedule = schedule_arrays(schedule_file, names)
+    week, away, home = schedule
+    if checkpoint is not None:
+        remaining = week > checkpoint.week
+        week, away, home = week[remaining], away[remaining], home[remaining]
+    if sampler is None:
+        sampler = default_sampler()
+    weather_rows = sampler.rows_for(names)[home]
+
+    num_teams = len(names)
+    num_games = len(away)
+    wins = np.zeros((n, num_teams), dtype=np.int16)
+    losses = np.zeros((n, num_teams), dtype=np.int16)
+    ties = np.zeros((n, num_teams), dtype=np.int16)
+    streak = np.zeros((n, num_teams), dtype=np.int16)
+    if checkpoint is not None:
+        #every season starts from the decided weeks' records
+        start_wins, start_losses, start_ties, start_streak = checkpoint.arrays(names)
+        wins[:] = start_wins
+        losses[:] = start_losses
+        ties[:] = start_ties
+        streak[:] = start_streak
+    outcomes = np.zeros((n, num_games), dtype=np.int8) if keep_games else None
+    weather = np.zeros((n, num_games), dtype=np.int8) if keep_games else None
+
+    #base scores only depend on the two teams, so look them up once per game
+    if matchups is not None:
+        team2_base, team1_base = matchups.game_scores(rows[home], rows[away])
+    else:
+        #leagues too big for a pairwise table score only the scheduled games
+        _, efficiency, net_production, production_allowed = team_arrays(teams)
+        team1_base = efficiency[away] + (net_production[away] - production_allowed[home])
+        team2_base = (efficiency[home] + (net_production[home] - production_allowed[away])) * HOME_MULTIPLIER
+
+    for start, stop in schedule_rounds(away, home):
+        a = away[start:stop]
+        h = home[start:stop]
+
+        #draw the weather of every game in the block for every season
+        if stream is not None:
+            u = stream.uniforms(np.arange(first_season, first_season + n), np.arange(start, stop))
+            game_weather = sampler.codes_from_uniforms(weather_rows[start:stop], u * len(WEATHER_TYPES))
+        else:
+            game_weather = sampler.draw_codes(weather_rows[start:stop], (n,), rng)
+
+        #win streak multiplier: 2% increase per game in the current win streak
+        team1_score = team1_base[start:stop] * (1 + (WIN_STREAK_BONUS * streak[:, a]))
+        team2_score = team2_base[start:stop] * (1 + (WIN_STREAK_BONUS * streak[:, h]))
+
+        win1 = team1_score > team2_score
+        win2 = team2_score > team1_score
+        tie = ~(win1 | win2)
+
+        #update records, every team appears at most once in a block
+        wins[:, a] += win1
+        wins[:, h] += win2
+        losses[:, a] += win2
+        losses[:, h] += win1
+        ties[:, a] += tie
+        ties[:, h] += tie
+        streak[:, a] = np.where(win1, streak[:, a] + 1, 0)
+        streak[:, h] = np.where(win2, streak[:, h] + 1, 0)
+
+        if keep_games:
+            outcomes[:, start:stop] = np.where(win1, WIN1, np.where(win2, WIN2, TIE))
+            weather[:, start:stop] = game_weather
+
+    return SeasonBatch(names, wins, losses, ties, outcomes, weather, away, home)
@@ -0,0 +1,417 @@
+#import numpy to pack outcomes into memory-mapped arrays, json for the store's description
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import league
+import monte_carlo
+import parallel
+from weather import WEATHER_TYPES
+
+#bump when the layout of the files changes
+STORE_VERSION = 1
+
+#description of the store, next to the column files
+META_FILE = "store.json"
+
+#seasons packed into one byte of the outcome and weather columns, 2 bits each
+SEASONS_PER_BYTE = 4
+
+#per-team columns, one byte per team and season; division_rank and seed are 255 for teams outside every division
+TEAM_COLUMNS = ("wins", "losses", "ties", "division_rank", "seed")
+
+#condition results, from the named team's side
+RESULTS = ("win", "loss", "tie")
+
+
+def pack(codes):
+    """
+    Pack 2-bit codes of many seasons, four seasons to a byte
+
+    args:
+    codes: int array of shape (seasons, games) with values 0..3, seasons a multiple of SEASONS_PER_BYTE
+           except for the last shard of a store
+
+    return:
+    uint8 array of shape (games, ceil(seasons / SEASONS_PER_BYTE)), game-major so one game's seasons are contiguous
+    """
+    seasons, games = codes.shape
+    padded = np.zeros((games, -(-seasons // SEASONS_PER_BYTE) * SEASONS_PER_BYTE), dtype=np.uint8)
+    padded[:, :seasons] = codes.T
+    shifts = np.arange(0, 2 * SEASONS_PER_BYTE, 2, dtype=np.uint8)
+    return np.bitwise_or.reduce(padded.reshape(games, -1, SEASONS_PER_BYTE) << shifts, axis=2)
+
+
+
+def unpack(packed, seasons):
+    """
+    Unpack the 2-bit codes of one game written by pack
+
+    args:
+    packed: uint8 array of one game's packed seasons
+    seasons: number of seasons to return
+
+    return:
+    uint8 array of shape (seasons,)
+    """
+    shifts = np.arange(0, 2 * SEASONS_PER_BYTE, 2, dtype=np.uint8)
+    return ((np.asarray(packed)[:, None] >> shifts) & 3).ravel()[:seasons]
+
+
+
+class OutcomeStore:
+    """
+    This class reads a memory-mapped store of every game outcome and team finish of many simulated seasons
+
+    Outcomes and weather take 2 bits per game and season, stored game by game,
+    and each team's wins, losses, ties, division rank and seed take a byte per
+    season, stored team by team. A query only reads the columns it names, as
+    whole-column array scans.
+    """
+
+    def __init__(self, directory):
+        """
+        Open a store written by build_store.
+
+        args:
+        directory: directory of the store
+        """
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        if meta["version"] != STORE_VERSION:
+            raise ValueError(f"Outcome store version {meta['version']} can't be read, expected {STORE_VERSION}")
+        self.directory = directory
+        self.meta = meta
+        self.team_names = meta["team_names"]
+        self.team_index = {name: i for i, name in enumerate(self.team_names)}
+        self.seasons = meta["seasons"]
+        self.seed = meta["seed"]
+        self.week = np.array(meta["week"], dtype=np.int16)
+        self.away = np.array(meta["away"], dtype=np.intp)
+        self.home = np.array(meta["home"], dtype=np.intp)
+        self.outcome_columns = np.load(os.path.join(directory, "outcomes.npy"), mmap_mode="r")
+        self.weather_columns = np.load(os.path.join(directory, "weather.npy"), mmap_mode="r")
+        self.team_columns = {column: np.load(os.path.join(directory, column + ".npy"), mmap_mode="r")
+                             for column in TEAM_COLUMNS}
+
+
+    def __len__(self):
+        return self.seasons
+
+
+    def team(self, name):
+        """
+        Return the column of a team, raising KeyError for unknown names
+        """
+        try:
+            return self.team_index[name]
+        except KeyError:
+            raise KeyError(f"Unknown team: {name}") from None
+
+
+    def game(self, team, week):
+        """
+        Find a team's game in a week
+
+        args:
+        team: team name
+        week: week number
+
+        return:
+        index of the game in the store
+        """
+        t = self.team(team)
+        games = np.flatnonzero((self.week == week) & ((self.away == t) | (self.home == t)))
+        if len(games) == 0:
+            raise ValueError(f"{team} has no stored game in week {week}")
+        return int(games[0])
+
+
+    def outcomes(self, game):
+        """
+        Return the monte_carlo outcome code of one game in every season
+        """
+        return unpack(self.outcome_columns[game], self.seasons)
+
+
+    def weather(self, game):
+        """
+        Return the index into WEATHER_TYPES of one game's weather in every season
+        """
+        return unpack(self.weather_columns[game], self.seasons)
+
+
+    def column(self, column, team):
+        """
+        Return one team's value of a per-team column in every season
+
+        args:
+        column: name from TEAM_COLUMNS
+        team: team name
+        """
+        return self.team_columns[column][self.team(team), :self.seasons]
+
+
+    def condition(self, team, week, result):
+        """
+        Find the seasons where a game went a given way
+
+        args:
+        team: team name
+        week: week number
+        result: "win", "loss" or "tie" from the team's side, or a weather name from WEATHER_TYPES
+
+        return:
+        bool array of shape (seasons,)
+        """
+        game = self.game(team, week)
+        if result in WEATHER_TYPES:
+            return self.weather(game) == WEATHER_TYPES.index(result)
+        if result not in RESULTS:
+            raise ValueError(f"Unknown result: {result}, use one of {RESULTS + WEATHER_TYPES}")
+        outcomes = self.outcomes(game)
+        if result == "tie":
+            return outcomes == monte_carlo.TIE
+        away_side = self.away[game] == self.team(team)
+        won = monte_carlo.WIN1 if away_side else monte_carlo.WIN2
+        return outcomes == won if result == "win" else outcomes == (monte_carlo.WIN1 + monte_carlo.WIN2 - won)
+
+
+    def where(self, conditions=()):
+        """
+        Find the seasons meeting every condition
+
+        args:
+        conditions: iterable of (team, week, result) tuples, see condition
+
+        return:
+        bool array of shape (seasons,)
+        """
+        mask = np.ones(self.seasons, dtype=bool)
+        for team, week, result in conditions:
+            mask &= self.condition(team, week, result)
+        return mask
+
+
+    def stats(self, team, mask=None):
+        """
+        Summarize one team's finishes over the seasons selected by a mask
+
+        args:
+        team: team name
+        mask: bool array from where, every season when None
+
+        return:
+        dictionary with the matching season count and share, mean wins, win histogram,
+        division title, playoff and per-seed probabilities
+        """
+        wins = self.column("wins", team)
+        seeds = self.column("seed", team)
+        division_rank = self.column("division_rank", team)
+        if mask is not None:
+            wins, seeds, division_rank = wins[mask], seeds[mask], division_rank[mask]
+        matched = len(wins)
+        seed_counts = np.bincount(seeds[seeds != 255], minlength=self.meta["playoff_teams"] + 1)
+        share = (lambda count: count / matched) if matched else (lambda count: 0.0)
+        return {
+            "seasons": matched,
+            "share": matched / self.seasons if self.seasons else 0.0,
+            "mean_wins": float(wins.mean()) if matched else None,
+            "win_histogram": np.bincount(wins).tolist(),
+            "division_title": share(int(np.count_nonzero(division_rank == 0))),
+            "playoffs": share(int(seed_counts[1:].sum())),
+            "seed_probabilities": [share(int(count)) for count in seed_counts[1:]],
+        }
+
+
+    def query(self, team, conditions=()):
+        """
+        Answer "how does this team finish when these games go this way"
+
+        args:
+        team: team name
+        conditions: iterable of (team, week, result) tuples, see condition
+
+        return:
+        dictionary from stats
+        """
+        return self.stats(team, self.where(conditions))
+
+
+
+def create_files(directory, meta, capacity):
+    """
+    Write the description and empty column files of a store
+
+    args:
+    directory: directory of the store, created when missing
+    meta: description written to META_FILE
+    capacity: number of seasons the columns hold
+    """
+    os.makedirs(directory, exist_ok=True)
+    num_games = len(meta["away"])
+    num_teams = len(meta["team_names"])
+    packed_shape = (num_games, -(-capacity // SEASONS_PER_BYTE))
+    for name, shape in [("outcomes", packed_shape), ("weather", packed_shape)] + [(column, (num_teams, capacity)) for column in TEAM_COLUMNS]:
+        np.lib.format.open_memmap(os.path.join(directory, name + ".npy"), mode="w+", dtype=np.uint8, shape=shape).flush()
+    with open(os.path.join(directory, META_FILE), "w") as f:
+        json.dump(meta, f)
+
+
+
+def write_seasons(directory, start, batch, division_rank, seeds):
+    """
+    Write a batch of seasons into a store's columns
+
+    args:
+    directory: directory of the store
+    start: number of the batch's first season, a multiple of SEASONS_PER_BYTE
+    batch: monte_carlo.SeasonBatch with outcomes and weather kept
+    division_rank, seeds: (seasons, teams) arrays from aggregator.playoff_seeds
+    """
+    seasons = len(batch)
+    first = start // SEASONS_PER_BYTE
+    for name, codes in (("outcomes", batch.outcomes), ("weather", batch.weather)):
+        packed = pack(np.asarray(codes, dtype=np.uint8))
+        columns = np.load(os.path.join(directory, name + ".npy"), mmap_mode="r+")
+        columns[:, first:first + packed.shape[1]] = packed
+        columns.flush()
+    values = {"wins": batch.wins, "losses": batch.losses, "ties": batch.ties,
+              "division_rank": division_rank, "seed": seeds}
+    for column in TEAM_COLUMNS:
+        columns = np.load(os.path.join(directory, column + ".npy"), mmap_mode="r+")
+        #-1 (outside every division) wraps to 255
+        columns[:, start:start + seasons] = np.asarray(values[column]).T.astype(np.uint8)
+        columns.flush()
+
+
+
+def _write_shard(directory, seed, start, seasons, division_groups, conference_groups, playoff_teams):
+    """
+    Simulate one shard inside a worker and write it into the store
+    """
+    from aggregator import playoff_seeds
+    batch = parallel.simulate_shard(seed, start, seasons, keep_games=True)
+    division_rank, _, seeds = playoff_seeds(batch.wins, batch.losses, batch.ties, division_groups, conference_groups,
+                                            playoff_teams, (batch.away, batch.home, batch.outcomes))
+    write_seasons(directory, start, batch, division_rank, seeds)
+    return seasons
+
+
+
+def build_store(directory, n, schedule_file, teams, seed=None, workers=None, shard_size=parallel.DEFAULT_SHARD_SIZE,
+                checkpoint=None, divisions=league.DIVISIONS, conferences=None, playoff_teams=league.PLAYOFF_TEAMS):
+    """
+    Simulate n seasons across a process pool and store every game outcome and team finish
+
+    Seasons are drawn like parallel.simulate_seasons_parallel draws them, so
+    FFHelper.replay_season with the store's seed regenerates any stored season
+    game by game, and each worker writes its own seasons straight into the
+    memory-mapped files.
+
+    args:
+    directory: directory of the store, existing store files are overwritten
+    n: number of seasons
+    schedule_file: path to the schedule CSV file
+    teams: dictionary containing Team instances indexed by team names
+    seed: master seed, a fresh one is drawn and stored when None
+    workers: number of worker processes, defaults to the CPU count, 1 runs in this process
+    shard_size: seasons per shard, a multiple of SEASONS_PER_BYTE
+    checkpoint: checkpoint.SeasonCheckpoint of the decided weeks, only the remaining weeks are simulated and stored
+    divisions: dictionary of division name to team names
+    conferences: dictionary of division name -> conference name, see league.conference_of
+    playoff_teams: playoff spots per conference
+
+    return:
+    OutcomeStore
+    """
+    if shard_size % SEASONS_PER_BYTE:
+        raise ValueError(f"shard_size must be a multiple of {SEASONS_PER_BYTE}")
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    names = list(teams.keys())
+    schedule = monte_carlo.schedule_arrays(schedule_file, names)
+    week, away, home = schedule
+    start_week = 1
+    if checkpoint is not None:
+        remaining = week > checkpoint.week
+        week, away, home = week[remaining], away[remaining], home[remaining]
+        start_week = checkpoint.week + 1
+    division_groups, conference_groups = league.group_indices(names, divisions, conferences)
+    meta = {"version": STORE_VERSION, "team_names": names, "seasons": n, "seed": seed, "shard_size": shard_size,
+            "start_week": start_week, "playoff_teams": playoff_teams, "week": week.tolist(),
+            "away": away.tolist(), "home": home.tolist()}
+    create_files(directory, meta, n)
+
+    shards = [(start, min(shard_size, n - start)) for start in range(0, n, shard_size)]
+    args = (division_groups, conference_groups, playoff_teams)
+    if workers == 1 or len(shards) <= 1:
+        parallel.init_worker(teams, schedule, checkpoint)
+        for start, seasons in shards:
+            _write_shard(directory, seed, start, seasons, *args)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=parallel.init_worker,
+                                 initargs=(teams, schedule, checkpoint)) as pool:
+            futures = [pool.submit(_write_shard, directory, seed, start, seasons, *args) for start, seasons in shards]
+            for future in futures:
+                future.result()
+    return OutcomeStore(directory)
+
+
+
+def parse_condition(text):
+    """
+    Parse a TEAM:WEEK:RESULT command line condition into a (team, week, result) tuple
+    """
+    team, week, result = text.rsplit(":", 2)
+    return team, int(week), result
+
+
+
+def main(argv=None):
+    """
+    Parse the command line and build or query a store
+    """
+    import FFHelper
+
+    parser = argparse.ArgumentParser(description="Store every simulated game outcome and ask conditional questions about them")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="simulate seasons into a store")
+    build.add_argument("directory", help="directory of the store")
+    build.add_argument("--offense", default=FFHelper.OFFENSE_FILE, help="offense stats CSV")
+    build.add_argument("--defense", default=FFHelper.DEFENSE_FILE, help="defense stats CSV")
+    build.add_argument("--schedule", default=FFHelper.SCHEDULE_FILE, help="schedule CSV")
+    build.add_argument("--seasons", "-n", type=int, default=100000, help="number of seasons to simulate")
+    build.add_argument("--seed", type=int, default=None, help="master seed")
+    build.add_argument("--workers", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    query = commands.add_parser("query", help="summarize a team's finishes in the seasons meeting every condition")
+    query.add_argument("directory", help="directory of the store")
+    query.add_argument("team", help="team to summarize")
+    query.add_argument("--when", action="append", default=[], metavar="TEAM:WEEK:RESULT",
+                       help="condition, RESULT is win, loss, tie or a weather type; repeat for several")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if args.seasons < 1:
+            parser.error("--seasons must be at least 1")
+        teams = FFHelper.create_teams(args.offense, args.defense)
+        store = build_store(args.directory, args.seasons, args.schedule, teams, args.seed, args.workers)
+        print(f"Stored {len(store)} seasons with seed {store.seed} in {args.directory}")
+    else:
+        store = OutcomeStore(args.directory)
+        try:
+            conditions = [parse_condition(text) for text in args.when]
+        except ValueError:
+            parser.error("conditions look like \"Buffalo Bills:14:loss\"")
+        print(json.dumps(store.query(args.team, conditions), indent=2))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#import numpy for the tallies, concurrent.futures to spread shards across cores
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+
+import monte_carlo
+from streams import CounterStream
+
+#number of seasons in one shard, shards are the unit of work
+DEFAULT_SHARD_SIZE = 10000
+
+#shared inputs of a worker process, set once by init_worker instead of pickled with every shard
+_worker_teams = None
+_worker_schedule = None
+_worker_checkpoint = None
+
+
+class RecordTally:
+    """
+    This class counts how often each team finished with each win, loss and tie total
+    """
+
+    def __init__(self, team_names, max_games, seed=None):
+        """
+        Initialize an empty tally.
+
+        args:
+        team_names: list of team names in array order
+        max_games: most games any team plays in a season
+        seed: master seed the seasons were drawn from
+        """
+        self.team_names = list(team_names)
+        self.max_games = max_games
+        self.seed = seed
+        self.seasons = 0
+        self.wins = np.zeros((len(self.team_names), max_games + 1), dtype=np.int64)
+        self.losses = np.zeros((len(self.team_names), max_games + 1), dtype=np.int64)
+        self.ties = np.zeros((len(self.team_names), max_games + 1), dtype=np.int64)
+
+
+    def add_batch(self, batch):
+        """
+        Count the records of a SeasonBatch
+
+        args:
+        batch: SeasonBatch from monte_carlo.simulate_seasons
+        """
+        for t in range(len(self.team_names)):
+            self.wins[t] += np.bincount(batch.wins[:, t], minlength=self.max_games + 1)
+            self.losses[t] += np.bincount(batch.losses[:, t], minlength=self.max_games + 1)
+            self.ties[t] += np.bincount(batch.ties[:, t], minlength=self.max_games + 1)
+        self.seasons += len(batch)
+
+
+    def merge(self, other):
+        """
+        Add the counts of another tally over the same teams into this one
+
+        args:
+        other: RecordTally to merge
+        """
+        if other.team_names != self.team_names or other.max_games != self.max_games:
+            raise ValueError("Can only merge tallies over the same teams and season length")
+        self.wins += other.wins
+        self.losses += other.losses
+        self.ties += other.ties
+        self.seasons += other.seasons
+
+
+    def mean_wins(self):
+        """
+        Return the average wins of every team
+
+        return:
+        dictionary of mean wins keyed by team name
+        """
+        totals = self.wins @ np.arange(self.max_games + 1)
+        return {name: totals[t] / max(self.seasons, 1) for t, name in enumerate(self.team_names)}
+
+
+
+def init_worker(teams, schedule, checkpoint=None):
+    """
+    Store the teams, compiled schedule and starting checkpoint once per worker process
+    """
+    global _worker_teams, _worker_schedule, _worker_checkpoint
+    _worker_teams = teams
+    _worker_schedule = schedule
+    _worker_checkpoint = checkpoint
+
+
+
+def simulate_shard(seed, start, seasons, keep_games=False):
+    """
+    Simulate one shard with the inputs stored by init_worker
+
+    Weather is drawn from the counter-based stream of the master seed, so the
+    shard's seasons are the same whatever the shard size or worker count, and
+    FFHelper.replay_season regenerates any one of them.
+
+    args:
+    seed: master seed
+    start: number of the shard's first season
+    seasons: number of seasons in the shard
+    keep_games: keep the outcome and weather of every game
+
+    return:
+    monte_carlo.SeasonBatch
+    """
+    return monte_carlo.simulate_seasons(seasons, None, _worker_teams, keep_games=keep_games, schedule=_worker_schedule,
+                                        checkpoint=_worker_checkpoint, stream=CounterStream(seed), first_season=start)
+
+
+
+def run_shard(seed, start, seasons, max_games, tally_class):
+    """
+    Simulate one shard with the inputs stored by init_worker and return its tally
+    """
+    batch = simulate_shard(seed, start, seasons, getattr(tally_class, "uses_games", False))
+    tally = tally_class(batch.team_names, max_games)
+    tally.add_batch(batch)
+    return tally
+
+
+
+def most_games(away, home, num_teams):
+    """
+    Return the most games any team plays in a schedule, the length of the tallies' win histograms
+
+    args:
+    away, home: team index arrays of every game
+    num_teams: number of teams
+    """
+    return int(np.bincount(np.concatenate([away, home]), minlength=num_teams).max(initial=0))
+
+
+
+def simulate_seasons_parallel(n, schedule_file, teams, seed=None, workers=None, shard_size=DEFAULT_SHARD_SIZE, tally_class=RecordTally,
+                              checkpoint=None):
+    """
+    Simulate n seasons split into shards across a process pool and merge their record tallies
+
+    args:
+    n: number of seasons to simulate
+    schedule_file: path to the schedule CSV file
+    teams: dictionary containing Team instances indexed by team names
+    seed: master seed, a fresh one is drawn (and stored on the tally) when None
+    workers: number of worker processes, defaults to the CPU count, 1 runs in this process
+    shard_size: seasons per shard
+    tally_class: class counting the seasons, built as tally_class(team_names, max_games) with add_batch and merge,
+                 e.g. aggregator.SeasonAggregator for finish ranks and playoff odds
+    checkpoint: checkpoint.SeasonCheckpoint of the decided weeks, only the remaining weeks are simulated
+
+    return:
+    tally_class instance with the merged counts of all shards
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    names = list(teams.keys())
+    schedule = monte_carlo.schedule_arrays(schedule_file, names)
+    week, away, home = schedule
+    max_games = most_games(away, home, len(names))
+
+    shards = [(start, min(shard_size, n - start)) for start in range(0, n, shard_size)]
+
+    tally = tally_class(names, max_games)
+    tally.seed = seed
+    if workers == 1 or len(shards) <= 1:
+        init_worker(teams, schedule, checkpoint)
+        for start, seasons in shards:
+            tally.merge(run_shard(seed, start, seasons, max_games, tally_class))
+        return tally
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(teams, schedule, checkpoint)) as pool:
+        futures = [pool.submit(run_shard, seed, start, seasons, max_games, tally_class) for start, seasons in shards]
+        #merge in shard order so the sums are the same for any worker count
+        for future in futures:
+            tally.merge(future.result())
+    return tally
@@ -0,0 +1,268 @@
+#import numpy to precompute every week's positional matchups as arrays
+import argparse
+
+import numpy as np
+
+import monte_carlo
+from cache_utils import file_digest
+from FFHelper import WEATHER_EFFECTS
+from weather import WEATHER_TYPES, default_stadium_weather_file, load_stadium_weather
+
+#fantasy positions, in the order of the last axis of every index array
+POSITIONS = ("QB", "RB", "WR", "TE")
+
+#weather -> output multiplier of each position, every position takes the efficiency multiplier the game model
+#applies to a team's offense in that weather, the net production multiplier moves both teams and isn't an output effect
+POSITION_WEATHER_EFFECTS = {weather: (efficiency,) * len(POSITIONS) for weather, (efficiency, _) in WEATHER_EFFECTS.items()}
+
+#indexes already built in this process, keyed by schedule and stadium climate contents
+_indexes = {}
+
+
+def position_code(position):
+    """
+    Return the index of a position on the last axis, raising ValueError for unknown positions
+    """
+    try:
+        return POSITIONS.index(position.upper())
+    except ValueError:
+        raise ValueError(f"Unknown position: {position}, use one of {', '.join(POSITIONS)}") from None
+
+
+
+def weather_multipliers(team_names, stadium_weather):
+    """
+    Return each home stadium's expected output multiplier for every position
+
+    args:
+    team_names: list of team names in row order
+    stadium_weather: dictionary keyed by team name of {weather: probability} dictionaries, unknown stadiums are always clear
+
+    return:
+    array of shape (teams, positions)
+    """
+    effects = np.array([POSITION_WEATHER_EFFECTS[weather] for weather in WEATHER_TYPES], dtype=np.float64)
+    clear = {weather: float(weather == "Clear") for weather in WEATHER_TYPES}
+    probabilities = np.array([[stadium_weather.get(name, clear)[weather] for weather in WEATHER_TYPES]
+                              for name in team_names], dtype=np.float64).reshape(-1, len(WEATHER_TYPES))
+    totals = probabilities.sum(axis=1, keepdims=True)
+    return (probabilities / np.where(totals > 0, totals, 1)) @ effects
+
+
+
+class PositionalMatchupIndex:
+    """
+    This class holds every team's expected positional output against its opponent in every week of a schedule
+
+    A team's expected output at a position is its production there, scaled by
+    how much the opponent allows at that position relative to the league
+    average and by the expected weather of the game's home stadium. Byes
+    are -1 in opponent and NaN in factor and expected.
+    """
+
+    def __init__(self, teams, schedule, stadium_weather):
+        """
+        Build the index.
+
+        args:
+        teams: dictionary of Team instances, indexed in dictionary order
+        schedule: (week, away, home) team index arrays, see monte_carlo.schedule_arrays
+        stadium_weather: dictionary keyed by team name of {weather: probability} dictionaries
+        """
+        self.names = list(teams.keys())
+        self.team_index = {name: i for i, name in enumerate(self.names)}
+        team_list = list(teams.values())
+        self.table = team_list[0].table if team_list else None
+        self.version = self.table.version if self.table is not None else None
+        self.production = np.array([[getattr(team, position.lower() + "_production") for position in POSITIONS]
+                                    for team in team_list], dtype=np.float64).reshape(-1, len(POSITIONS))
+        self.allowed = np.array([[getattr(team, position.lower() + "_allowed") for position in POSITIONS]
+                                 for team in team_list], dtype=np.float64).reshape(-1, len(POSITIONS))
+        average = self.allowed.mean(axis=0) if len(team_list) else np.ones(len(POSITIONS))
+        self.weather = weather_multipliers(self.names, stadium_weather)
+
+        week, away, home = (np.asarray(array, dtype=np.intp) for array in schedule)
+        num_weeks = int(week.max(initial=0))
+        num_teams = len(self.names)
+        self.weeks = np.arange(1, num_weeks + 1)
+        self.opponent = np.full((num_weeks, num_teams), -1, dtype=np.intp)
+        self.at_home = np.zeros((num_weeks, num_teams), dtype=bool)
+        #every team's side of every game: the team, its opponent and the stadium
+        teams_side = np.concatenate([away, home])
+        opponents = np.concatenate([home, away])
+        stadiums = np.concatenate([home, home])
+        weeks = np.concatenate([week, week]) - 1
+        if len(np.unique(weeks * num_teams + teams_side)) != len(teams_side):
+            raise ValueError("A team plays more than once in a week")
+        self.opponent[weeks, teams_side] = opponents
+        self.at_home[weeks, teams_side] = teams_side == stadiums
+
+        self.factor = np.full((num_weeks, num_teams, len(POSITIONS)), np.nan)
+        self.factor[weeks, teams_side] = (self.allowed[opponents] / np.where(average > 0, average, 1)) * self.weather[stadiums]
+        self.expected = self.production[None, :, :] * self.factor
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    def week_row(self, week):
+        """
+        Return the row of a week, raising ValueError for weeks outside the schedule
+        """
+        if not 1 <= week <= len(self.weeks):
+            raise ValueError(f"Week {week} is not in the schedule (1-{len(self.weeks)})")
+        return week - 1
+
+
+    def matchup(self, team, week):
+        """
+        Return a team's game and expected output at every position in a week
+
+        args:
+        team: team name
+        week: week number
+
+        return:
+        dictionary with the opponent (None on a bye), whether the team is at home and the expected output by position
+        """
+        t = self.team_index[team]
+        w = self.week_row(week)
+        opponent = int(self.opponent[w, t])
+        return {
+            "team": team,
+            "week": week,
+            "opponent": self.names[opponent] if opponent >= 0 else None,
+            "home": bool(self.at_home[w, t]),
+            "expected": {position: float(self.expected[w, t, p]) for p, position in enumerate(POSITIONS)},
+        }
+
+
+    def best_matchups(self, position, week, top=None):
+        """
+        Rank the teams playing in a week by their expected output at a position, "best RB matchups for week 9"
+
+        args:
+        position: one of POSITIONS
+        week: week number
+        top: only return the best top teams
+
+        return:
+        list of dictionaries with the team, opponent, home flag, expected output and opponent/weather factor, best first
+        """
+        p = position_code(position)
+        w = self.week_row(week)
+        expected = self.expected[w, :, p]
+        playing = np.flatnonzero(self.opponent[w] >= 0)
+        order = playing[np.argsort(-expected[playing], kind="stable")][:top]
+        return [{"team": self.names[t], "opponent": self.names[self.opponent[w, t]], "home": bool(self.at_home[w, t]),
+                 "expected": float(expected[t]), "factor": float(self.factor[w, t, p])} for t in order.tolist()]
+
+
+    def strength_of_schedule(self, position, first_week, last_week, top=None):
+        """
+        Rank teams by how favorable their positional matchups are over a span of weeks, "QB strength of schedule for weeks 14-17"
+
+        The factor is the mean over the team's games of the opponent's allowed
+        production relative to the league average times the expected weather,
+        above 1 is easier than average.
+
+        args:
+        position: one of POSITIONS
+        first_week, last_week: first and last week of the span
+        top: only return the best top teams
+
+        return:
+        list of dictionaries with the team, games played in the span, mean factor and total expected output, easiest first
+        """
+        p = position_code(position)
+        rows = slice(self.week_row(first_week), self.week_row(last_week) + 1)
+        factor = self.factor[rows, :, p]
+        games = np.count_nonzero(~np.isnan(factor), axis=0)
+        with np.errstate(invalid="ignore"):
+            mean = np.nansum(factor, axis=0) / games
+        total = np.nansum(self.expected[rows, :, p], axis=0)
+        playing = np.flatnonzero(games > 0)
+        order = playing[np.argsort(-mean[playing], kind="stable")][:top]
+        return [{"team": self.names[t], "games": int(games[t]), "factor": float(mean[t]), "expected": float(total[t])}
+                for t in order.tolist()]
+
+
+
+def positional_index(teams, schedule_file, stadium_weather_file=None):
+    """
+    Return the positional matchup index of a schedule, building it only when the schedule, climates or stats changed
+
+    args:
+    teams: dictionary of Team instances
+    schedule_file: path to the schedule CSV file
+    stadium_weather_file: stadium climate csv, defaults to the default league's
+
+    return:
+    PositionalMatchupIndex
+    """
+    stadium_weather_file = stadium_weather_file or default_stadium_weather_file()
+    key = file_digest(schedule_file, stadium_weather_file)
+    index = _indexes.get(key)
+    team_list = list(teams.values())
+    table = team_list[0].table if team_list else None
+    if (index is None or index.names != list(teams.keys()) or index.table is not table
+            or (table is not None and index.version != table.version)):
+        schedule = monte_carlo.schedule_arrays(schedule_file, list(teams.keys()))
+        index = PositionalMatchupIndex(teams, schedule, load_stadium_weather(stadium_weather_file))
+        _indexes[key] = index
+    return index
+
+
+
+def parse_weeks(text):
+    """
+    Parse a "14-17" or "9" command line week span into (first, last)
+    """
+    first, _, last = text.partition("-")
+    return int(first), int(last or first)
+
+
+
+def main(argv=None):
+    """
+    Parse the command line and print positional matchups
+    """
+    import FFHelper
+
+    parser = argparse.ArgumentParser(description="Rank weekly positional matchups for fantasy start/sit decisions")
+    #options shared by every subcommand
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("position", help="QB, RB, WR or TE")
+    common.add_argument("--offense", default=FFHelper.OFFENSE_FILE, help="offense stats CSV")
+    common.add_argument("--defense", default=FFHelper.DEFENSE_FILE, help="defense stats CSV")
+    common.add_argument("--schedule", default=FFHelper.SCHEDULE_FILE, help="schedule CSV")
+    common.add_argument("--top", type=int, default=10, help="number of teams to list")
+    commands = parser.add_subparsers(dest="command", required=True)
+    best = commands.add_parser("best", parents=[common], help="best matchups at a position in one week")
+    best.add_argument("--week", type=int, required=True, help="week number")
+    sos = commands.add_parser("sos", parents=[common], help="positional strength of schedule over a span of weeks")
+    sos.add_argument("--weeks", required=True, help="week span such as 14-17")
+    args = parser.parse_args(argv)
+    if args.top < 0:
+        parser.error("--top can't be negative")
+
+    index = positional_index(FFHelper.create_teams(args.offense, args.defense), args.schedule)
+    try:
+        if args.command == "best":
+            for rank, row in enumerate(index.best_matchups(args.position, args.week, args.top), start=1):
+                where = "vs" if row["home"] else "at"
+                print(f"{rank}. {row['team']} {where} {row['opponent']} - Expected {args.position.upper()}: "
+                      f"{row['expected']:.1f} (x{row['factor']:.2f})")
+        else:
+            first, last = parse_weeks(args.weeks)
+            for rank, row in enumerate(index.strength_of_schedule(args.position, first, last, args.top), start=1):
+                print(f"{rank}. {row['team']} - {row['games']} games, Matchup Factor: {row['factor']:.2f}, "
+                      f"Expected {args.position.upper()}: {row['expected']:.1f}")
+    except ValueError as e:
+        parser.error(str(e))
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#import csv to read records, numpy to fit and bootstrap the LSRL lines as array operations
+import csv
+
+import numpy as np
+
+import FFHelper
+
+#records csv header, T is optional
+RECORD_COLUMNS = ["Name", "W", "L", "T"]
+
+#bootstrap resamples computed at once, bounds the memory of the (resamples, teams) arrays
+BOOTSTRAP_CHUNK = 2000
+
+#names of the fitted lines, in the order fit_lines returns them
+LINES = ("x_off_line", "x_def_line", "x_wins_line")
+
+
+def read_records(records_file):
+    """
+    Read the actual records of a season
+
+    args:
+    records_file: path to a CSV file with Name, W, L and optionally T columns
+
+    return:
+    dictionary of team name -> (wins, losses, ties)
+    """
+    records = {}
+    with open(records_file, newline="") as f:
+        for row in csv.DictReader(f):
+            records[row["Name"]] = (int(row["W"]), int(row["L"]), int(row.get("T") or 0))
+    return records
+
+
+
+def load_seasons(seasons):
+    """
+    Load the stats and actual records of one or more seasons into flat arrays
+
+    Teams without a record in their season's records file are left out.
+
+    args:
+    seasons: list of (offense file, defense file, records file) tuples
+
+    return:
+    dictionary of arrays with one entry per team and season: "name", "season" (position in seasons),
+    "off", "de", "points_per_game", "points_allowed_per_game" and "wins" (ties count half)
+    """
+    columns = {"name": [], "season": [], "off": [], "de": [], "points_per_game": [],
+               "points_allowed_per_game": [], "wins": []}
+    for season, (offense_file, defense_file, records_file) in enumerate(seasons):
+        records = read_records(records_file)
+        for name, offense_stats, defense_stats in FFHelper.load_team_rows(offense_file, defense_file):
+            if name not in records:
+                continue
+            wins, losses, ties = records[name]
+            columns["name"].append(name)
+            columns["season"].append(season)
+            columns["off"].append(offense_stats["All"])
+            columns["de"].append(defense_stats["DEF"])
+            columns["points_per_game"].append(offense_stats["PTS"])
+            columns["points_allowed_per_game"].append(defense_stats["PA"])
+            columns["wins"].append(wins + 0.5 * ties)
+    data = {key: np.array(values, dtype=np.float64) for key, values in columns.items() if key != "name"}
+    data["name"] = np.array(columns["name"], dtype=object)
+    data["season"] = data["season"].astype(np.int32)
+    return data
+
+
+
+def line_fit(x, y):
+    """
+    Fit y = slope * x + intercept by least squares along the last axis
+
+    args:
+    x, y: arrays of the same shape, leading axes are independent fits
+
+    return:
+    slope and intercept arrays with the leading shape as a tuple
+    """
+    x_mean = x.mean(axis=-1, keepdims=True)
+    y_mean = y.mean(axis=-1, keepdims=True)
+    dx = x - x_mean
+    slope = (dx * (y - y_mean)).sum(axis=-1) / (dx * dx).sum(axis=-1)
+    intercept = y_mean[..., 0] - slope * x_mean[..., 0]
+    return slope, intercept
+
+
+
+def fit_lines(off, de, points, allowed, wins):
+    """
+    Fit the three expected-wins lines the same way Team.calculate_expected_wins uses them
+
+    Points scored are fit on off, points allowed on de, and wins on the net
+    rating the first two fitted lines give.
+
+    args:
+    off, de, points, allowed, wins: arrays of the same shape, leading axes are independent fits
+
+    return:
+    array of shape leading shape + (3, 2) with (slope, intercept) of x_off, x_def and x_wins
+    """
+    off_slope, off_intercept = line_fit(off, points)
+    def_slope, def_intercept = line_fit(de, allowed)
+    net = (off_slope[..., None] * off + off_intercept[..., None]) - (def_slope[..., None] * de + def_intercept[..., None])
+    wins_slope, wins_intercept = line_fit(net, wins)
+    return np.stack([np.stack([off_slope, off_intercept], axis=-1),
+                     np.stack([def_slope, def_intercept], axis=-1),
+                     np.stack([wins_slope, wins_intercept], axis=-1)], axis=-2)
+
+
+
+def r_squared(x, y, line):
+    """
+    Return the share of y's variance explained by a fitted line
+    """
+    residual = y - (line[0] * x + line[1])
+    total = y - y.mean()
+    return 1 - float((residual * residual).sum() / (total * total).sum())
+
+
+
+class LsrlFit:
+    """
+    This class holds refit LSRL lines, their bootstrap resamples and how well they fit
+    """
+
+    def __init__(self, lines, samples=None, r2=None, teams=0):
+        """
+        Initialize the fit.
+
+        args:
+        lines: array of shape (3, 2) with (slope, intercept) of x_off, x_def and x_wins
+        samples: bootstrap array of shape (resamples, 3, 2), None without a bootstrap
+        r2: dictionary of line name -> r squared
+        teams: number of team seasons fit
+        """
+        self.lines = np.asarray(lines, dtype=np.float64)
+        self.samples = samples
+        self.r2 = r2 or {}
+        self.teams = teams
+
+
+    @property
+    def x_off_line(self):
+        return tuple(float(value) for value in self.lines[0])
+
+
+    @property
+    def x_def_line(self):
+        return tuple(float(value) for value in self.lines[1])
+
+
+    @property
+    def x_wins_line(self):
+        return tuple(float(value) for value in self.lines[2])
+
+
+    def confidence_intervals(self, level=0.95):
+        """
+        Return percentile bootstrap intervals of every coefficient
+
+        args:
+        level: coverage of the intervals
+
+        return:
+        dictionary of line name -> ((slope low, slope high), (intercept low, intercept high))
+        """
+        if self.samples is None:
+            raise ValueError("Fit without a bootstrap has no confidence intervals")
+        tail = (1 - level) / 2 * 100
+        low, high = np.nanpercentile(self.samples, [tail, 100 - tail], axis=0)
+        return {name: ((float(low[i, 0]), float(high[i, 0])), (float(low[i, 1]), float(high[i, 1])))
+                for i, name in enumerate(LINES)}
+
+
+    def standard_errors(self):
+        """
+        Return the bootstrap standard error of every coefficient
+
+        return:
+        dictionary of line name -> (slope error, intercept error)
+        """
+        if self.samples is None:
+            raise ValueError("Fit without a bootstrap has no standard errors")
+        errors = np.nanstd(self.samples, axis=0, ddof=1)
+        return {name: (float(errors[i, 0]), float(errors[i, 1])) for i, name in enumerate(LINES)}
+
+
+    def apply(self, teams):
+        """
+        Recalculate the expected records of teams with the fitted lines
+
+        args:
+        teams: dictionary containing Team instances indexed by team names
+        """
+        for team in teams.values():
+            team.calculate_expected_wins(self.x_off_line, self.x_def_line, self.x_wins_line)
+
+
+    def install(self):
+        """
+        Make the fitted lines FFHelper's defaults, so teams created afterwards use them
+        """
+        FFHelper.X_OFF_LINE = self.x_off_line
+        FFHelper.X_DEF_LINE = self.x_def_line
+        FFHelper.X_WINS_LINE = self.x_wins_line
+
+
+    def summary(self):
+        """
+        Summarize the fit
+
+        return:
+        dictionary keyed by line name with slope, intercept, r squared and, after a bootstrap,
+        standard errors and 95% intervals
+        """
+        summary = {}
+        for i, name in enumerate(LINES):
+            summary[name] = {"slope": float(self.lines[i, 0]), "intercept": float(self.lines[i, 1]),
+                             "r_squared": self.r2.get(name)}
+        if self.samples is not None:
+            for name, (slope, intercept) in self.standard_errors().items():
+                summary[name]["standard_error"] = {"slope": slope, "intercept": intercept}
+            for name, (slope, intercept) in self.confidence_intervals().items():
+                summary[name]["interval_95"] = {"slope": list(slope), "intercept": list(intercept)}
+        return summary
+
+
+
+def fit_lsrl(data, bootstrap=1000, seed=None):
+    """
+    Refit the expected-wins lines and bootstrap their uncertainty
+
+    Every bootstrap resample draws team seasons with replacement and refits all
+    three lines; the resamples are fit together as one batch of array operations.
+
+    args:
+    data: dictionary of arrays from load_seasons
+    bootstrap: number of resamples, 0 skips the bootstrap
+    seed: seed of the resampling
+
+    return:
+    LsrlFit
+    """
+    off, de = data["off"], data["de"]
+    points, allowed, wins = data["points_per_game"], data["points_allowed_per_game"], data["wins"]
+    if len(off) < 3:
+        raise ValueError("Need at least 3 team seasons to fit the lines")
+
+    lines = fit_lines(off, de, points, allowed, wins)
+    net = (lines[0, 0] * off + lines[0, 1]) - (lines[1, 0] * de + lines[1, 1])
+    r2 = {"x_off_line": r_squared(off, points, lines[0]),
+          "x_def_line": r_squared(de, allowed, lines[1]),
+          "x_wins_line": r_squared(net, wins, lines[2])}
+
+    samples = None
+    if bootstrap:
+        rng = np.random.default_rng(seed)
+        samples = np.empty((bootstrap, 3, 2), dtype=np.float64)
+        #a resample of identical x values has no slope, leave it as nan instead of warning
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for start in range(0, bootstrap, BOOTSTRAP_CHUNK):
+                stop = min(start + BOOTSTRAP_CHUNK, bootstrap)
+                rows = rng.integers(0, len(off), size=(stop - start, len(off)))
+                samples[start:stop] = fit_lines(off[rows], de[rows], points[rows], allowed[rows], wins[rows])
+    return LsrlFit(lines, samples, r2, len(off))
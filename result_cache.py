@@ -0,0 +1,281 @@
+#import hashlib/json to address results by their inputs, os to keep them in the cache directory
+import hashlib
+import json
+import os
+
+import FFHelper
+import league
+from cache_utils import cache_dir, file_digest
+
+#bump when a change to the simulation would change stored results
+RESULT_CACHE_VERSION = 3
+
+#environment variable with the size cap in megabytes
+MAX_MB_ENV = "FFHELPER_RESULT_CACHE_MB"
+DEFAULT_MAX_BYTES = 256 << 20
+
+#digests of files already hashed in this process, keyed by path, modification time and size
+_digests = {}
+
+
+def cached_digest(path):
+    """
+    Hash a file's contents, reusing the hash while its modification time and size are unchanged
+
+    args:
+    path: path of the file
+
+    return:
+    sha256 hex digest
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _digests:
+        _digests[key] = file_digest(path)
+    return _digests[key]
+
+
+
+def teams_digest(teams):
+    """
+    Hash the team names and the stats the simulation reads from them, so edited or in-memory teams get their own address
+
+    args:
+    teams: dictionary containing Team instances indexed by team names
+
+    return:
+    sha256 hex digest
+    """
+    from monte_carlo import team_arrays
+    names, *stats = team_arrays(teams)
+    digest = hashlib.sha256(json.dumps(names).encode())
+    for values in stats:
+        digest.update(values.astype("<f8").tobytes())
+    return digest.hexdigest()
+
+
+
+def model_parameters():
+    """
+    Return every model constant and league setting that changes simulated results
+    """
+    from weather import default_stadium_weather_file
+    return {
+        "home_multiplier": FFHelper.HOME_MULTIPLIER,
+        "win_streak_bonus": FFHelper.WIN_STREAK_BONUS,
+        "weather_effects": FFHelper.WEATHER_EFFECTS,
+        "stadium_weather": cached_digest(default_stadium_weather_file()),
+        "divisions": league.DIVISIONS,
+        "conferences": league.DEFAULT_LEAGUE.division_conferences,
+        "playoff_teams": league.PLAYOFF_TEAMS,
+        "season_games": league.SEASON_GAMES,
+    }
+
+
+
+class SimulationCache:
+    """
+    This class stores aggregated simulation results on disk under a hash of everything that produced them
+
+    Entries are named by the hash of the simulated team stats, schedule
+    contents, model parameters, seed and run size, so changed inputs simply miss. The
+    directory is kept under a size cap by deleting the least recently used
+    entries, a hit refreshes the entry's modification time.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        """
+        Initialize the cache.
+
+        args:
+        directory: where entries are kept, defaults to a "results" folder in cache_utils.cache_dir()
+        max_bytes: size cap, defaults to FFHELPER_RESULT_CACHE_MB megabytes or 256 MB
+        """
+        if directory is None:
+            directory = os.path.join(cache_dir(), "results")
+        if max_bytes is None:
+            megabytes = os.environ.get(MAX_MB_ENV)
+            max_bytes = int(float(megabytes) * (1 << 20)) if megabytes else DEFAULT_MAX_BYTES
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+
+    def key(self, teams, schedule_file, seasons, seed, checkpoint=None):
+        """
+        Build the address of a simulation
+
+        Shard size and worker count are left out, every season's draws only
+        depend on the seed and the season number.
+
+        args:
+        teams: Team dictionary that is simulated, hashed by the stats the simulation reads
+        schedule_file: schedule CSV path, hashed by content
+        seasons: number of seasons
+        seed: master seed
+        checkpoint: checkpoint.SeasonCheckpoint the seasons start from
+
+        return:
+        hex string
+        """
+        description = {
+            "version": RESULT_CACHE_VERSION,
+            "teams": teams_digest(teams),
+            "schedule": cached_digest(schedule_file),
+            "model": model_parameters(),
+            "seasons": seasons,
+            "seed": seed,
+            "checkpoint": checkpoint.to_dict() if checkpoint is not None else None,
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+    def path(self, key):
+        """
+        Return the file of an entry
+        """
+        return os.path.join(self.directory, key + ".npz")
+
+
+    def get(self, key):
+        """
+        Load a cached result
+
+        args:
+        key: address from key()
+
+        return:
+        aggregator.SeasonAggregator, or None on a miss
+        """
+        from aggregator import SeasonAggregator
+        path = self.path(key)
+        try:
+            result = SeasonAggregator.load(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+
+    def put(self, key, result):
+        """
+        Store a result and evict old entries past the size cap
+
+        args:
+        key: address from key()
+        result: aggregator.SeasonAggregator
+        """
+        try:
+            result.save(self.path(key))
+        except OSError:
+            return #read-only or full disk, the result is still returned to the caller
+        self.evict()
+
+
+    def entries(self):
+        """
+        Return (modification time, size, path) of every entry, oldest first
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        entries.sort()
+        return entries
+
+
+    def size(self):
+        """
+        Return the bytes used by all entries
+        """
+        return sum(size for _, size, _ in self.entries())
+
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits the size cap
+
+        return:
+        number of entries deleted
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+        return deleted
+
+
+    def clear(self):
+        """
+        Delete every entry
+        """
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+
+def simulate_cached(offense_file, defense_file, schedule_file, seasons, seed, teams=None, workers=None,
+                    shard_size=None, checkpoint=None, cache=None):
+    """
+    Return the aggregated odds of a simulation, from the cache when the same run was done before
+
+    A run without a seed draws fresh random numbers, so it is simulated and not cached.
+
+    args:
+    offense_file, defense_file, schedule_file: input CSV paths
+    seasons: number of seasons
+    seed: master seed, None skips the cache
+    teams: Team dictionary to simulate, loaded from offense_file and defense_file when None
+    workers: worker processes for a miss
+    shard_size: seasons per shard, defaults to parallel.DEFAULT_SHARD_SIZE
+    checkpoint: checkpoint.SeasonCheckpoint the seasons start from
+    cache: SimulationCache, a default one when None
+
+    return:
+    aggregator.SeasonAggregator and whether it came from the cache as a tuple
+    """
+    from aggregator import SeasonAggregator
+    import parallel
+
+    if shard_size is None:
+        shard_size = parallel.DEFAULT_SHARD_SIZE
+    if teams is None:
+        teams = FFHelper.create_teams(offense_file, defense_file)
+    key = None
+    if seed is not None:
+        if cache is None:
+            cache = SimulationCache()
+        key = cache.key(teams, schedule_file, seasons, seed, checkpoint)
+        result = cache.get(key)
+        if result is not None:
+            return result, True
+    result = parallel.simulate_seasons_parallel(seasons, schedule_file, teams, seed=seed, workers=workers,
+                                                shard_size=shard_size, tally_class=SeasonAggregator,
+                                                checkpoint=checkpoint)
+    if key is not None:
+        cache.put(key, result)
+    return result, False
@@ -0,0 +1,143 @@
+#import csv to read the schedule once, json/struct for the sidecar header, numpy to memory-map the compiled games
+import csv
+import json
+import os
+import struct
+
+import numpy as np
+
+from cache_utils import file_digest
+
+#first bytes of every compiled schedule file, bump the number when the layout changes
+MAGIC = b"FFSCHED3"
+
+#compiled schedules already opened in this process, keyed by path, modification time and size
+_loaded = {}
+
+
+def sidecar_path(schedule_file):
+    """
+    Return the path of the compiled schedule stored next to the schedule csv
+
+    args:
+    schedule_file: path to the schedule CSV file
+    """
+    return os.path.splitext(schedule_file)[0] + ".sched"
+
+
+
+def compile_schedule(schedule_file):
+    """
+    Turn the schedule csv into an integer array of (week, away team, home team) rows
+
+    Teams are numbered by the schedule itself, in the order they first
+    appear, so the compiled file doesn't depend on which teams a caller loads.
+
+    args:
+    schedule_file: path to the schedule CSV file
+
+    return:
+    array of shape (games, 3) with int32 week, away index (Team1) and home index (Team2), and the
+    scheduled team names in index order as a tuple
+    """
+    index = {}
+    rows = []
+    with open(schedule_file, newline="") as f:
+        for game in csv.DictReader(f):
+            away = index.setdefault(game["Team1"], len(index))
+            home = index.setdefault(game["Team2"], len(index))
+            rows.append((int(game["Week"]), away, home))
+    return np.array(rows, dtype=np.int32).reshape(-1, 3), list(index)
+
+
+
+def write_schedule(path, games, team_names, digest):
+    """
+    Save a compiled schedule to a binary sidecar file
+
+    The file is the magic bytes, a length-prefixed JSON header with the csv
+    hash and team order, padding to 16 bytes, then the raw int32 games.
+
+    args:
+    path: path of the sidecar file
+    games: array from compile_schedule
+    team_names: scheduled team names in the order the indices refer to
+    digest: sha256 of the schedule csv
+    """
+    header = json.dumps({"sha256": digest, "teams": list(team_names), "games": len(games)}).encode()
+    offset = len(MAGIC) + 4 + len(header)
+    padding = -offset % 16
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header) + padding))
+        f.write(header + b" " * padding)
+        f.write(np.ascontiguousarray(games, dtype="<i4").tobytes())
+    os.replace(tmp_path, path)
+
+
+
+def read_schedule(path):
+    """
+    Memory-map a compiled schedule file
+
+    args:
+    path: path of the sidecar file
+
+    return:
+    header dictionary and the read-only (games, 3) array as a tuple, or (None, None) if the file is missing or unreadable
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None, None
+            (header_length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_length))
+    except (OSError, ValueError, struct.error):
+        return None, None
+    offset = len(MAGIC) + 4 + header_length
+    if header["games"] == 0:
+        return header, np.zeros((0, 3), dtype=np.int32)
+    games = np.memmap(path, dtype="<i4", mode="r", offset=offset, shape=(header["games"], 3))
+    return header, games
+
+
+
+def load_schedule(schedule_file, team_names):
+    """
+    Load the compiled schedule, rebuilding the sidecar only when the csv contents change
+
+    args:
+    schedule_file: path to the schedule CSV file
+    team_names: list of team names in the order used by the caller, e.g. the keys from create_teams
+
+    return:
+    week, away team index (Team1) and home team index (Team2) arrays as a tuple
+    """
+    team_names = list(team_names)
+    stat = os.stat(schedule_file)
+    key = (os.path.abspath(schedule_file), stat.st_mtime_ns, stat.st_size)
+
+    header, games = _loaded.get(key, (None, None))
+    if header is None:
+        digest = file_digest(schedule_file)
+        path = sidecar_path(schedule_file)
+        header, games = read_schedule(path)
+        if header is None or header["sha256"] != digest:
+            games, schedule_teams = compile_schedule(schedule_file)
+            header = {"sha256": digest, "teams": schedule_teams, "games": len(games)}
+            try:
+                write_schedule(path, games, schedule_teams, digest)
+            except OSError:
+                pass #read-only directory, keep the compiled schedule in memory only
+        _loaded[key] = (header, games)
+
+    #translate the schedule's own team numbers to the caller's order, only a scheduled team the caller lacks is an error
+    if header["teams"] != team_names:
+        index = {name: i for i, name in enumerate(team_names)}
+        try:
+            remap = np.array([index[name] for name in header["teams"]], dtype=np.int32)
+        except KeyError as e:
+            raise KeyError(f"Schedule team {e.args[0]} is not one of the loaded teams") from None
+        return games[:, 0], remap[games[:, 1]], remap[games[:, 2]]
+    return games[:, 0], games[:, 1], games[:, 2]
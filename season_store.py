@@ -0,0 +1,303 @@
+#import csv to parse the season files, concurrent.futures to parse them side by side, numpy for the compact columns
+import argparse
+import csv
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from FFHelper import Team, TeamTable
+
+#season files are named like the shipped 2023 files, "<year> Fantasy Offense Stats.csv" and so on
+SEASON_FILE_PATTERN = re.compile(r"^(\d{4}) (Fantasy Offense Stats|Fantasy Defense Stats|Schedule)\.csv$")
+FILE_KINDS = {"Fantasy Offense Stats": "offense_file", "Fantasy Defense Stats": "defense_file", "Schedule": "schedule_file"}
+
+#input files of one season, schedule_file is None when the season has no schedule
+SeasonFiles = namedtuple("SeasonFiles", ["offense_file", "defense_file", "schedule_file"])
+
+#store column name and dtype of every offense column after Name, by position so the two "All" columns stay apart
+OFFENSE_FIELDS = [("GP", np.uint8), ("PTS", np.float32), ("All", np.float32), ("QB", np.float32), ("RB", np.float32),
+                  ("WR", np.float32), ("TE", np.float32), ("Plays", np.float32), ("Run", np.float32),
+                  ("Run%", np.float32), ("Pass", np.float32), ("Pass%", np.float32)]
+
+#defense columns by header name, renamed where they would clash with the offense columns
+DEFENSE_FIELDS = {"PA": ("PA", np.float32), "DEF": ("DEF", np.float32), "QB": ("QB Allowed", np.float32),
+                  "RB": ("RB Allowed", np.float32), "WR": ("WR Allowed", np.float32), "TE": ("TE Allowed", np.float32)}
+
+#stat names Team expects, and the store columns they come from
+TEAM_OFFENSE_STATS = {"GP": "GP", "PTS": "PTS", "All": "All", "QB": "QB", "RB": "RB", "WR": "WR", "TE": "TE",
+                      "Run": "Run", "Pass": "Pass"}
+TEAM_DEFENSE_STATS = {"PA": "PA", "DEF": "DEF", "QB": "QB Allowed", "RB": "RB Allowed", "WR": "WR Allowed", "TE": "TE Allowed"}
+
+#stats are written with one or two decimals, rounding float32 values to this many digits gives the written value back
+STAT_DECIMALS = 4
+
+
+def discover_seasons(directory):
+    """
+    Find the offense, defense and schedule files of every season in a directory
+
+    args:
+    directory: directory with files named like "2023 Fantasy Offense Stats.csv"
+
+    return:
+    dictionary of year -> SeasonFiles in year order, seasons missing their offense or defense file are left out
+    """
+    found = {}
+    for name in os.listdir(directory):
+        match = SEASON_FILE_PATTERN.match(name)
+        if match:
+            found.setdefault(int(match.group(1)), {})[FILE_KINDS[match.group(2)]] = os.path.join(directory, name)
+    return {year: SeasonFiles(files["offense_file"], files["defense_file"], files.get("schedule_file"))
+            for year, files in sorted(found.items()) if "offense_file" in files and "defense_file" in files}
+
+
+
+def parse_number(text):
+    """
+    Parse a stat cell, "48.7%" reads as 48.7 and an empty cell as NaN
+    """
+    text = text.strip().rstrip("%")
+    return float(text) if text else float("nan")
+
+
+
+def stat_value(value):
+    """
+    Turn a stored stat back into the Python number written in the file
+    """
+    if isinstance(value, np.floating):
+        return round(float(value), STAT_DECIMALS)
+    return int(value)
+
+
+
+def parse_season(files):
+    """
+    Parse one season's files into numeric columns
+
+    args:
+    files: SeasonFiles
+
+    return:
+    team names in offense file order, dictionary of store column -> array, and the schedule as
+    (week, away name, home name) lists (None without a schedule file) as a tuple
+    """
+    with open(files.offense_file, newline="") as f:
+        reader = csv.reader(f)
+        next(reader)
+        offense = [row for row in reader if row]
+    names = [row[0] for row in offense]
+    columns = {}
+    for position, (column, dtype) in enumerate(OFFENSE_FIELDS, start=1):
+        columns[column] = np.array([parse_number(row[position]) for row in offense], dtype=np.float64).astype(dtype)
+
+    with open(files.defense_file, newline="") as f:
+        defense = {row["Name"]: row for row in csv.DictReader(f)}
+    missing = [name for name in names if name not in defense]
+    if missing:
+        raise KeyError(f"No defense stats for {', '.join(missing)} in {files.defense_file}")
+    for header, (column, dtype) in DEFENSE_FIELDS.items():
+        columns[column] = np.array([parse_number(defense[name][header]) for name in names], dtype=np.float64).astype(dtype)
+
+    schedule = None
+    if files.schedule_file is not None:
+        with open(files.schedule_file, newline="") as f:
+            games = list(csv.DictReader(f))
+        schedule = ([int(game["Week"]) for game in games], [game["Team1"] for game in games], [game["Team2"] for game in games])
+    return names, columns, schedule
+
+
+
+class TeamSeasonStore:
+    """
+    This class holds the stats of every team in every season as one compact column per stat, indexed by (season, team)
+
+    Rows are sorted by season, so a season's teams are one contiguous slice of
+    every column. Team names are stored once and referenced by int16 codes.
+    """
+
+    def __init__(self, team_names, season, team, columns, schedules=None):
+        """
+        Initialize a store.
+
+        args:
+        team_names: list of every team name, a team code is a position in it
+        season: int16 array with the season of every row, sorted
+        team: int16 array with the team code of every row
+        columns: dictionary of column name -> array with a value per row
+        schedules: dictionary of season -> (week, away code, home code) arrays
+        """
+        self.team_names = team_names
+        self.team_codes = {name: code for code, name in enumerate(team_names)}
+        self.season = season
+        self.team = team
+        self.columns = columns
+        self.schedules = schedules or {}
+        self.seasons = np.unique(season).tolist()
+        self.index = {(s, t): row for row, (s, t) in enumerate(zip(season.tolist(), team.tolist()))}
+
+
+    def __len__(self):
+        return len(self.season)
+
+
+    @property
+    def nbytes(self):
+        """
+        Bytes used by the columns, keys and schedules
+        """
+        arrays = [self.season, self.team, *self.columns.values()]
+        arrays += [array for schedule in self.schedules.values() for array in schedule]
+        return sum(array.nbytes for array in arrays)
+
+
+    def row(self, season, team_name):
+        """
+        Return the row of a team's season, raising KeyError when the team has no stats that season
+        """
+        try:
+            return self.index[(season, self.team_codes[team_name])]
+        except KeyError:
+            raise KeyError(f"No stats for {team_name} in {season}") from None
+
+
+    def rows(self, season):
+        """
+        Return the slice of a season's rows in every column
+        """
+        return slice(*np.searchsorted(self.season, [season, season + 1]).tolist())
+
+
+    def column(self, column, season=None):
+        """
+        Return one column, only a season's values when season is given
+        """
+        values = self.columns[column]
+        return values if season is None else values[self.rows(season)]
+
+
+    def stats(self, season, team_name):
+        """
+        Return every column of one team's season as a dictionary
+        """
+        row = self.row(season, team_name)
+        return {column: stat_value(values[row]) for column, values in self.columns.items()}
+
+
+    def team_names_in(self, season):
+        """
+        Return the names of a season's teams in file order
+        """
+        return [self.team_names[code] for code in self.team[self.rows(season)].tolist()]
+
+
+    def schedule(self, season):
+        """
+        Return a season's schedule as (week, away, home) arrays of team positions within the season, see team_names_in
+
+        The arrays are in the layout monte_carlo.simulate_seasons takes as its schedule.
+        """
+        week, away, home = self.schedules[season]
+        codes = self.team[self.rows(season)]
+        position = np.full(len(self.team_names), -1, dtype=np.intp)
+        position[codes] = np.arange(len(codes))
+        return week.astype(np.intp), position[away], position[home]
+
+
+    def teams(self, season):
+        """
+        Create a season's Team instances, like FFHelper.create_teams does from that season's files
+
+        return:
+        dictionary of team name -> Team sharing one TeamTable
+        """
+        rows = self.rows(season)
+
+        def values(names):
+            return {stat: [stat_value(value) for value in self.columns[column][rows]] for stat, column in names.items()}
+
+        offense = values(TEAM_OFFENSE_STATS)
+        defense = values(TEAM_DEFENSE_STATS)
+        table = TeamTable()
+        teams = {}
+        for i, name in enumerate(self.team_names_in(season)):
+            teams[name] = Team(name, {stat: column[i] for stat, column in offense.items()},
+                               {stat: column[i] for stat, column in defense.items()}, table)
+        return teams
+
+
+
+def load_seasons(directory, workers=None):
+    """
+    Parse every season in a directory on a thread pool and build one TeamSeasonStore
+
+    args:
+    directory: directory of season files, see discover_seasons
+    workers: threads parsing files, defaults to one per season up to the CPU count
+
+    return:
+    TeamSeasonStore
+    """
+    seasons = discover_seasons(directory)
+    if not seasons:
+        return TeamSeasonStore([], np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.int16),
+                               {column: np.zeros(0, dtype=dtype) for column, dtype in OFFENSE_FIELDS + list(DEFENSE_FIELDS.values())})
+    if workers is None:
+        workers = min(len(seasons), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parsed = list(pool.map(parse_season, seasons.values()))
+
+    team_names = []
+    team_codes = {}
+
+    def codes(names):
+        for name in names:
+            if name not in team_codes:
+                team_codes[name] = len(team_names)
+                team_names.append(name)
+        return np.array([team_codes[name] for name in names], dtype=np.int16)
+
+    season_keys = []
+    team_keys = []
+    columns = {}
+    schedules = {}
+    for year, (names, season_columns, schedule) in zip(seasons, parsed):
+        season_keys.append(np.full(len(names), year, dtype=np.int16))
+        team_keys.append(codes(names))
+        for column, values in season_columns.items():
+            columns.setdefault(column, []).append(values)
+        if schedule is not None:
+            week, away, home = schedule
+            unknown = sorted(set(away + home) - set(names))
+            if unknown:
+                raise KeyError(f"Schedule teams {', '.join(unknown)} have no {year} stats")
+            schedules[year] = (np.array(week, dtype=np.uint8), codes(away), codes(home))
+
+    return TeamSeasonStore(team_names, np.concatenate(season_keys), np.concatenate(team_keys),
+                           {column: np.concatenate(values) for column, values in columns.items()}, schedules)
+
+
+
+def main(argv=None):
+    """
+    Parse the command line, load a directory of seasons and print what was loaded
+    """
+    parser = argparse.ArgumentParser(description="Load every season's offense, defense and schedule files into one store")
+    parser.add_argument("directory", help="directory of files named like \"2023 Fantasy Offense Stats.csv\"")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="parsing threads (default: one per season up to the CPU count)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    store = load_seasons(args.directory, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {len(store.seasons)} seasons, {len(store)} team seasons and {len(store.schedules)} schedules "
+          f"in {elapsed:.3f}s, {store.nbytes / 1024:.1f} KiB")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+#import asyncio for the long-running server, concurrent.futures to keep simulations off the event loop
+import argparse
+import asyncio
+import inspect
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import FFHelper
+from cache_utils import file_digest
+from result_cache import SimulationCache, simulate_cached
+
+#results kept by default, oldest used first out
+DEFAULT_CACHE_SIZE = 256
+
+#largest request body accepted, queries are small JSON objects
+MAX_BODY_BYTES = 1 << 16
+
+#parameters that are numbers, query strings give them as text and JSON bodies as numbers
+INTEGER_PARAMS = ("seasons", "seed", "through_week", "home_streak", "away_streak")
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ResultCache:
+    """
+    This class keeps the most recently used results up to a fixed count
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        """
+        Initialize an empty cache.
+
+        args:
+        max_size: most results kept, 0 turns caching off
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def get(self, key):
+        """
+        Return the cached result for a key, or None
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+
+    def put(self, key, value):
+        """
+        Store a result, dropping the least recently used one when full
+        """
+        if self.max_size <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+
+class BadRequest(Exception):
+    """
+    Raised for a query the service cannot answer, reported to the client with status 400
+    """
+
+
+
+class SimulationService:
+    """
+    This class loads the teams and schedule once and answers queries about them
+
+    Results are cached by (inputs hash, operation, parameters), identical
+    queries that arrive while one is being computed wait for that computation
+    instead of starting their own, and simulations run on a worker thread so
+    the event loop keeps answering.
+    """
+
+    def __init__(self, offense_file, defense_file, schedule_file, cache_size=DEFAULT_CACHE_SIZE, workers=None,
+                 results_dir=None):
+        """
+        Load the inputs.
+
+        args:
+        offense_file: Path to the Fantasy Offense Stats CSV file
+        defense_file: Path to the Fantasy Defense Stats CSV file
+        schedule_file: path to the schedule CSV file
+        cache_size: results kept in the LRU cache
+        workers: processes per simulation, passed to parallel.simulate_seasons_parallel
+        results_dir: directory of the results CSV files simulate queries may name, None turns results off
+        """
+        import schedule_cache
+
+        self.offense_file = offense_file
+        self.defense_file = defense_file
+        self.schedule_file = schedule_file
+        self.workers = workers
+        self.results_dir = os.path.realpath(results_dir) if results_dir is not None else None
+        self.teams = FFHelper.create_teams(offense_file, defense_file)
+        #compile the schedule now so the first simulation does not pay for it
+        schedule_cache.load_schedule(schedule_file, list(self.teams.keys()))
+        self.digest = file_digest(offense_file, defense_file, schedule_file)
+        self.cache = ResultCache(cache_size)
+        self.disk_cache = SimulationCache()
+        self.in_flight = {}
+        self.coalesced = 0
+        #one simulation at a time, each one already spreads over worker processes
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.operations = {
+            "stats": (self.team_stats, False),
+            "expect": (self.expected_records, False),
+            "matchup": (self.matchup, False),
+            "simulate": (self.simulate, True),
+        }
+
+
+    def close(self):
+        """
+        Stop the simulation thread
+        """
+        self.executor.shutdown(wait=True)
+
+
+    def team(self, name):
+        """
+        Return a Team by name, or raise BadRequest
+        """
+        try:
+            return self.teams[name]
+        except KeyError:
+            raise BadRequest(f"Unknown team: {name}") from None
+
+
+    def team_stats(self, team=None):
+        """
+        Return the stats of one team, or of every team when team is None
+        """
+        if team is not None:
+            return self.team(team).to_dict()
+        return [team.to_dict() for team in self.teams.values()]
+
+
+    def expected_records(self):
+        """
+        Return the LSRL expected record of every team
+        """
+        return {name: {"x_wins": team.x_wins, "x_losses": team.x_losses} for name, team in self.teams.items()}
+
+
+    def matchup(self, home, away, weather="Clear", home_streak=0, away_streak=0):
+        """
+        Return the model's scores and winner of one game
+        """
+        index = self.team(home).table.matchups()
+        self.team(away)
+        if index is None:
+            from matchups import MatchupIndex
+            index = MatchupIndex(self.teams)
+        try:
+            home_score, away_score, winner = index.predict(home, away, weather, int(home_streak), int(away_streak))
+        except KeyError:
+            raise BadRequest(f"Unknown weather: {weather}") from None
+        return {"home": home, "away": away, "weather": weather, "home_score": home_score,
+                "away_score": away_score, "winner": winner}
+
+
+    def results_path(self, name):
+        """
+        Return the path of a results file in the results directory, or raise BadRequest
+
+        Only plain names inside the directory are accepted, and every failure
+        gets the same reply, so a client can't probe for other files.
+        """
+        if self.results_dir is None:
+            raise BadRequest("Results files are turned off, start the service with --results-dir")
+        name = str(name)
+        path = os.path.realpath(os.path.join(self.results_dir, name))
+        if (os.path.isabs(name) or ".." in name.replace("\\", "/").split("/")
+                or os.path.dirname(path) != self.results_dir or not os.path.isfile(path)):
+            raise BadRequest(f"Unknown results file: {name}")
+        return path
+
+
+    def simulate(self, seasons=1000, seed=None, results=None, through_week=None):
+        """
+        Simulate seasons and return per-team win, division and playoff odds
+
+        args:
+        seasons: number of seasons
+        seed: master seed, a fresh one is drawn and reported when None
+        results: name of a results CSV in the results directory, only the weeks after it are simulated
+        through_week: with results, the last decided week
+        """
+        seasons = int(seasons)
+        if seasons < 1:
+            raise BadRequest("seasons must be at least 1")
+        start = None
+        if results is not None:
+            from checkpoint import checkpoint_from_results
+            #apply the results to a private copy, the shared teams keep their records
+            start = checkpoint_from_results(FFHelper.create_teams(self.offense_file, self.defense_file), self.results_path(results),
+                                            None if through_week is None else int(through_week))
+        #seeded runs also come from and go to the on-disk result cache
+        totals, _ = simulate_cached(self.offense_file, self.defense_file, self.schedule_file, seasons,
+                                    None if seed is None else int(seed), self.teams, self.workers, checkpoint=start,
+                                    cache=self.disk_cache)
+        return {"seasons": totals.seasons, "seed": totals.seed, "start_week": start.week + 1 if start else 1,
+                "teams": totals.summary()}
+
+
+    def typed_params(self, params):
+        """
+        Return the parameters with numbers converted from text, so GET and POST queries share one cache key
+        """
+        params = dict(params)
+        for name in INTEGER_PARAMS:
+            if params.get(name) is not None:
+                try:
+                    params[name] = int(params[name])
+                except (TypeError, ValueError):
+                    raise BadRequest(f"{name} must be an integer") from None
+        return params
+
+
+    def cache_key(self, operation, params):
+        """
+        Return the cache key of a query, results files are hashed by content
+        """
+        params = dict(params)
+        if params.get("results") is not None:
+            path = self.results_path(params["results"])
+            try:
+                params["results"] = file_digest(path)
+            except OSError:
+                raise BadRequest(f"Unknown results file: {params['results']}") from None
+        return (self.digest, operation, json.dumps(params, sort_keys=True, default=str))
+
+
+    async def query(self, operation, params=None):
+        """
+        Answer one query
+
+        args:
+        operation: "stats", "expect", "matchup" or "simulate"
+        params: dictionary of keyword arguments for the operation
+
+        return:
+        JSON-serializable result
+        """
+        params = self.typed_params(params or {})
+        try:
+            function, heavy = self.operations[operation]
+        except KeyError:
+            raise BadRequest(f"Unknown operation: {operation}") from None
+        try:
+            inspect.signature(function).bind(**params)
+        except TypeError as e:
+            raise BadRequest(f"{operation}: {e}") from None
+        #an unseeded simulation draws a fresh seed every time, so its result is never reused
+        if operation == "simulate" and params.get("seed") is None:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: function(**params))
+
+        key = self.cache_key(operation, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if key in self.in_flight:
+            self.coalesced += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.in_flight[key] = future
+        try:
+            if heavy:
+                result = await loop.run_in_executor(self.executor, lambda: function(**params))
+            else:
+                result = function(**params)
+            self.cache.put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            #the waiting queries see the error, mark it retrieved for when nobody was waiting
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+
+
+    def status(self):
+        """
+        Return the cache and coalescing counters
+        """
+        return {"teams": len(self.teams), "cached": len(self.cache), "hits": self.cache.hits,
+                "misses": self.cache.misses, "coalesced": self.coalesced, "in_flight": len(self.in_flight)}
+
+
+    async def handle_http(self, reader, writer):
+        """
+        Answer one HTTP request: GET or POST /<operation>, parameters from the query string and a JSON body
+        """
+        try:
+            try:
+                status, body = await self.read_http(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            except Exception as e:
+                status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+            payload = json.dumps(body).encode()
+            writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+
+    async def read_http(self, reader):
+        """
+        Read and answer one HTTP request
+
+        return:
+        status code and JSON-serializable body as a tuple
+        """
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            return 400, {"error": "Malformed request line"}
+        method, target, _ = request_line
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            return 400, {"error": "Content-Length must be a number"}
+        if length < 0:
+            return 400, {"error": "Content-Length can't be negative"}
+        if length > MAX_BODY_BYTES:
+            return 413, {"error": "Request body too large"}
+        body = await reader.readexactly(length) if length else b""
+        if method not in ("GET", "POST"):
+            return 405, {"error": "Use GET or POST"}
+
+        url = urlsplit(target)
+        operation = url.path.strip("/")
+        params = dict(parse_qsl(url.query))
+        if body:
+            try:
+                params.update(json.loads(body))
+            except (ValueError, TypeError, AttributeError):
+                return 400, {"error": "Body must be a JSON object"}
+        if operation in ("", "health"):
+            return 200, self.status()
+        if operation not in self.operations:
+            return 404, {"error": f"Unknown operation: {operation}"}
+        try:
+            return 200, await self.query(operation, params)
+        except BadRequest as e:
+            return 400, {"error": str(e)}
+        except (KeyError, ValueError, OSError) as e:
+            return 400, {"error": f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+
+
+async def serve(service, host="127.0.0.1", port=8765, unix_path=None, started=None):
+    """
+    Run the HTTP server until cancelled
+
+    args:
+    service: SimulationService
+    host, port: TCP address to listen on, ignored when unix_path is given
+    unix_path: listen on this unix socket instead of TCP
+    started: optional callback given the asyncio server once it listens
+    """
+    if unix_path:
+        server = await asyncio.start_unix_server(service.handle_http, path=unix_path)
+    else:
+        server = await asyncio.start_server(service.handle_http, host, port)
+    if started is not None:
+        started(server)
+    async with server:
+        await server.serve_forever()
+
+
+
+def main(argv=None):
+    """
+    Parse the command line and run the service
+    """
+    parser = argparse.ArgumentParser(description="Answer FFHelper queries over HTTP from one long-running process")
+    parser.add_argument("--offense", default=FFHelper.OFFENSE_FILE, help="offense stats CSV")
+    parser.add_argument("--defense", default=FFHelper.DEFENSE_FILE, help="defense stats CSV")
+    parser.add_argument("--schedule", default=FFHelper.SCHEDULE_FILE, help="schedule CSV")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a unix socket instead of TCP")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="results kept in memory")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="worker processes per simulation")
+    parser.add_argument("--results-dir", metavar="DIR", help="directory of the results CSVs simulate queries may name (default: none)")
+    args = parser.parse_args(argv)
+    if args.results_dir is not None and not os.path.isdir(args.results_dir):
+        parser.error(f"--results-dir {args.results_dir} is not a directory")
+
+    service = SimulationService(args.offense, args.defense, args.schedule, args.cache_size, args.workers, args.results_dir)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix,
+                          lambda server: print(f"Serving {len(service.teams)} teams on {where}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+
+if __name__ == "__main__":
+    main()
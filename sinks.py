@@ -0,0 +1,242 @@
+#import csv and json to write results, pyarrow is only imported when a parquet sink is used
+import csv
+import json
+from abc import ABC, abstractmethod
+
+from FFHelper import GameResult
+
+#number of results buffered before a sink writes them out
+DEFAULT_BATCH_SIZE = 10000
+
+
+class ResultSink(ABC):
+    """
+    This class buffers GameResult records and writes them out in batches
+
+    Subclasses implement write_batch. Sinks are context managers, leaving the
+    with block flushes the last partial batch and closes the file.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Initialize a sink.
+
+        args:
+        path: path of the output file
+        batch_size: number of results to buffer before writing
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer = []
+        self.count = 0
+
+
+    def write(self, result):
+        """
+        Add one result, writing the buffer once it is full
+
+        args:
+        result: GameResult
+        """
+        self.buffer.append(result)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+
+    def write_all(self, results):
+        """
+        Add every result from an iterable, e.g. a simulate_season generator
+
+        args:
+        results: iterable of GameResult
+        """
+        for result in results:
+            self.write(result)
+
+
+    def flush(self):
+        """
+        Write out the buffered results
+        """
+        if self.buffer:
+            self.write_batch(self.buffer)
+            self.count += len(self.buffer)
+            self.buffer = []
+
+
+    @abstractmethod
+    def write_batch(self, batch):
+        """
+        Write a full batch of results to the output, every sink format implements this
+
+        args:
+        batch: list of GameResult
+        """
+
+
+    def close(self):
+        """
+        Flush the remaining results and close the output
+        """
+        self.flush()
+
+
+    def __enter__(self):
+        """
+        Return the sink for a with block
+        """
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Flush and close the sink when the with block ends, errors included
+        """
+        self.close()
+
+
+
+class CsvSink(ResultSink):
+    """
+    This class streams results to a csv file with one column per GameResult field
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Open the csv file and write the header row.
+
+        args:
+        path: path of the output file
+        batch_size: number of results to buffer before writing
+        """
+        super().__init__(path, batch_size)
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(GameResult._fields)
+
+
+    def write_batch(self, batch):
+        """
+        Write one csv row per result
+
+        args:
+        batch: list of GameResult
+        """
+        self.writer.writerows(batch)
+
+
+    def close(self):
+        """
+        Flush the remaining results and close the file
+        """
+        super().close()
+        self.file.close()
+
+
+
+class JsonLinesSink(ResultSink):
+    """
+    This class streams results to a JSON Lines file, one object per game
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Open the JSON Lines file.
+
+        args:
+        path: path of the output file
+        batch_size: number of results to buffer before writing
+        """
+        super().__init__(path, batch_size)
+        self.file = open(path, "w")
+
+
+    def write_batch(self, batch):
+        """
+        Write one JSON object per result, keyed by the GameResult fields
+
+        args:
+        batch: list of GameResult
+        """
+        self.file.write("".join(json.dumps(result._asdict()) + "\n" for result in batch))
+
+
+    def close(self):
+        """
+        Flush the remaining results and close the file
+        """
+        super().close()
+        self.file.close()
+
+
+
+class ParquetSink(ResultSink):
+    """
+    This class streams results to a parquet file, one row group per batch (needs pyarrow)
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Open a parquet writer with the GameResult schema, raising ImportError without pyarrow.
+
+        args:
+        path: path of the output file
+        batch_size: number of results to buffer before writing
+        """
+        super().__init__(path, batch_size)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing parquet results requires pyarrow, install it with: pip install pyarrow") from None
+        self.pa = pa
+        self.schema = pa.schema([
+            ("week", pa.int16()), ("home", pa.string()), ("away", pa.string()), ("weather", pa.string()),
+            ("home_score", pa.float64()), ("away_score", pa.float64()), ("outcome", pa.string()), ("season", pa.int64()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+
+    def write_batch(self, batch):
+        """
+        Write the results as one parquet row group
+
+        args:
+        batch: list of GameResult
+        """
+        columns = list(zip(*batch))
+        self.writer.write_table(self.pa.Table.from_arrays([self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)], schema=self.schema))
+
+
+    def close(self):
+        """
+        Flush the remaining results and write the parquet footer
+        """
+        super().close()
+        self.writer.close()
+
+
+
+#output formats accepted by open_sink
+SINKS = {"csv": CsvSink, "jsonl": JsonLinesSink, "parquet": ParquetSink}
+
+
+def open_sink(path, output_format=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Open the sink for an output format, guessing the format from the file extension when not given
+
+    args:
+    path: path of the output file
+    output_format: 'csv', 'jsonl' or 'parquet'
+    batch_size: number of results to buffer before writing
+
+    return:
+    ResultSink
+    """
+    if output_format is None:
+        output_format = path.rsplit(".", 1)[-1].lower()
+        if output_format == "json":
+            output_format = "jsonl"
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(SINKS)}")
+    return SINKS[output_format](path, batch_size)
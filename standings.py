@@ -0,0 +1,528 @@
+#import numpy to rank the standings of every simulated season at once
+import numpy as np
+
+import league
+from monte_carlo import NOT_PLAYED, TIE, WIN1, WIN2
+
+#largest league given the common games tiebreaker, it keeps a bitset of common opponents per team and season
+MAX_COMMON_TEAMS = 4096
+
+#fewest common games for the common games tiebreaker between teams of different divisions
+MIN_COMMON_GAMES = 4
+
+#bitset words built at once by the common games tiebreaker, bounds its memory
+COMMON_CHUNK_WORDS = 1 << 20
+
+#value of a tiebreaker record with too few games to count
+NEUTRAL = 0.5
+
+#largest (games x teams) table used to add up records with a matrix product, bigger leagues use bincount
+MAX_INCIDENCE_CELLS = 1 << 22
+
+
+def team_sums(away_values, home_values, away, home, num_teams):
+    """
+    Add up per-game values for the team on each side of every game
+
+    args:
+    away_values, home_values: arrays broadcast to (seasons, games), the value credited to the away and home team
+    away, home: team index of every game
+    num_teams: number of teams
+
+    return:
+    float array of shape (seasons, teams)
+    """
+    away_values, home_values = np.broadcast_arrays(away_values, home_values)
+    seasons = away_values.shape[0]
+    offsets = (np.arange(seasons, dtype=np.intp) * num_teams)[:, None]
+    index = np.concatenate([offsets + away, offsets + home], axis=1).ravel()
+    values = np.concatenate([away_values, home_values], axis=1).ravel()
+    return np.bincount(index, weights=values, minlength=seasons * num_teams).reshape(seasons, num_teams)
+
+
+
+class GameRecords:
+    """
+    This class holds the per-game results of many seasons and computes records over subsets of the games
+    """
+
+    def __init__(self, away, home, outcomes, pct):
+        """
+        Initialize the records.
+
+        args:
+        away, home: team index of every game
+        outcomes: array of shape (seasons, games) with monte_carlo outcome codes
+        pct: array of shape (seasons, teams) with every team's overall win percentage
+        """
+        self.away = np.asarray(away, dtype=np.intp)
+        self.home = np.asarray(home, dtype=np.intp)
+        self.pct = pct
+        self.num_teams = num_teams = pct.shape[1]
+        #games between teams with the same win percentage, the only games tiebreakers look at together
+        self.same_pct = pct[:, self.away] == pct[:, self.home]
+        outcomes = np.asarray(outcomes)
+        #wins credited to each side, ties count half; halves and game counts are exact in float32
+        half = np.float32(0.5) * (outcomes == TIE)
+        self.away_credit = (outcomes == WIN1) + half
+        self.home_credit = (outcomes == WIN2) + half
+        self.played = (outcomes != NOT_PLAYED).astype(np.float32)
+        #distinct pairs of teams that meet, teams that meet twice share a pair
+        low, high = np.minimum(self.away, self.home), np.maximum(self.away, self.home)
+        pairs, self.pair = np.unique(low * num_teams + high, return_inverse=True)
+        self.pair = self.pair.ravel()
+        self.pair_low, self.pair_high = pairs // num_teams, pairs % num_teams
+        self.low_is_away = self.away == low
+        #one-hot (games, teams) tables of the away and home teams, so sums are one matrix product each
+        self.incidence = None
+        if len(self.away) * num_teams <= MAX_INCIDENCE_CELLS:
+            self.incidence = tuple(np.eye(num_teams, dtype=np.float32)[side] for side in (self.away, self.home))
+        #the same one-hot tables from games to pairs and from pairs to their two teams
+        self.pair_incidence = None
+        if len(self.away) * len(pairs) <= MAX_INCIDENCE_CELLS and len(pairs) * num_teams <= MAX_INCIDENCE_CELLS:
+            self.pair_incidence = (np.eye(len(pairs), dtype=np.float32)[self.pair],
+                                   *(np.eye(num_teams, dtype=np.float32)[side] for side in (self.pair_low, self.pair_high)))
+
+
+    def sums(self, away_values, home_values):
+        """
+        Add up per-game values for both teams of every game, see team_sums
+        """
+        if self.incidence is None:
+            return team_sums(away_values, home_values, self.away, self.home, self.num_teams)
+        away_values, home_values = np.broadcast_arrays(away_values, home_values)
+        dtype = np.result_type(away_values, np.float32)
+        return (away_values @ self.incidence[0].astype(dtype, copy=False)
+                + home_values @ self.incidence[1].astype(dtype, copy=False)).astype(np.float64, copy=False)
+
+
+    def percentage(self, away_mask, home_mask=None, minimum=1):
+        """
+        Return every team's win percentage in a subset of its games
+
+        args:
+        away_mask: array broadcast to (seasons, games), games that count for the away team
+        home_mask: same for the home team, defaults to away_mask
+        minimum: fewest games for a percentage, teams with fewer get NEUTRAL
+
+        return:
+        float array of shape (seasons, teams)
+        """
+        if home_mask is None:
+            home_mask = away_mask
+        if self.incidence is not None and np.ndim(away_mask) == 1 and np.ndim(home_mask) == 1:
+            #a mask shared by every season folds into the one-hot tables
+            away_table = self.incidence[0] * away_mask[:, None]
+            home_table = self.incidence[1] * home_mask[:, None]
+            credit = (self.away_credit @ away_table + self.home_credit @ home_table).astype(np.float64)
+            games = (self.played @ away_table + self.played @ home_table).astype(np.float64)
+        else:
+            credit = self.sums(self.away_credit * away_mask, self.home_credit * home_mask)
+            games = self.sums(self.played * away_mask, self.played * home_mask)
+        return np.divide(credit, games, out=np.full(games.shape, NEUTRAL), where=(games >= minimum) & (games > 0))
+
+
+    def opponent_percentage(self, wins_only):
+        """
+        Return the combined win percentage of every team's opponents
+
+        args:
+        wins_only: only count the opponents a team beat (strength of victory), ties count half;
+                   otherwise every opponent played (strength of schedule)
+
+        return:
+        float array of shape (seasons, teams), 0 without qualifying games
+        """
+        away_weight = self.away_credit if wins_only else self.played
+        home_weight = self.home_credit if wins_only else self.played
+        #weighted in float64, so teams with the same opponents get exactly the same value
+        total = self.sums(away_weight * self.pct[:, self.home], home_weight * self.pct[:, self.away])
+        weight = self.sums(away_weight, home_weight)
+        return np.divide(total, weight, out=np.zeros(weight.shape), where=weight > 0)
+
+
+    def head_to_head(self, group):
+        """
+        Return every team's win percentage in games against the teams tied with it
+
+        Teams are tied when they are in the same group and have the same win percentage.
+        Between two teams the record counts as it is. Among three or more it only
+        counts when every tied team played every other one; otherwise a team that
+        beat each of the others gets 1, a team that lost to each of them 0, and
+        the rest NEUTRAL, so the tie falls through to the next tiebreaker.
+
+        args:
+        group: int array of shape (teams,) or (seasons, teams), -1 for teams outside every group
+
+        return:
+        float array of shape (seasons, teams), NEUTRAL without such games
+        """
+        away_group, home_group = group[..., self.away], group[..., self.home]
+        tied = self.same_pct & (away_group == home_group) & (away_group >= 0)
+        record = self.percentage(tied)
+
+        #size of every team's tie class
+        group = np.broadcast_to(group, self.pct.shape)
+        seasons, num_teams = group.shape
+        order, classes = tie_classes(group, self.pct)
+        class_size = np.bincount(classes)
+        size = np.empty(seasons * num_teams, dtype=np.intp)
+        size[order] = class_size[classes]
+        size = size.reshape(seasons, num_teams)
+        if not (size >= 3).any():
+            return record
+
+        #record of the lower numbered team of every pair in games between tied teams
+        low_credit = np.where(self.low_is_away, self.away_credit, self.home_credit) * tied
+        played = self.played * tied
+        credit, games = self.pair_sums(low_credit), self.pair_sums(played)
+        met = (games > 0).astype(np.float32)
+        low_won = met * (credit * 2 > games)
+        high_won = met * (credit * 2 < games)
+
+        #tied teams each team met, beat and lost to
+        opponents = self.pair_team_sums(met, met)
+        beat = self.pair_team_sums(low_won, high_won)
+        lost = self.pair_team_sums(high_won, low_won)
+        #a class played every pairing when its members met size - 1 tied teams each
+        class_opponents = np.bincount(classes, weights=opponents.ravel()[order], minlength=len(class_size))
+        complete = np.empty(seasons * num_teams, dtype=bool)
+        complete[order] = class_opponents[classes] == class_size[classes] * (class_size[classes] - 1)
+        complete = complete.reshape(seasons, num_teams)
+
+        sweep = np.where(beat == size - 1, 1.0, np.where(lost == size - 1, 0.0, NEUTRAL))
+        return np.where((size >= 3) & ~complete, sweep, record)
+
+
+    def pair_sums(self, values):
+        """
+        Add up per-game values of every pair of teams
+
+        args:
+        values: array broadcast to (seasons, games)
+
+        return:
+        array of shape (seasons, pairs)
+        """
+        values = np.broadcast_to(values, self.played.shape)
+        if self.pair_incidence is not None:
+            return values.astype(np.float32, copy=False) @ self.pair_incidence[0]
+        num_pairs = len(self.pair_low)
+        offsets = (np.arange(len(values), dtype=np.intp) * num_pairs)[:, None]
+        return np.bincount((offsets + self.pair).ravel(), weights=values.ravel(),
+                           minlength=len(values) * num_pairs).reshape(len(values), num_pairs)
+
+
+    def pair_team_sums(self, low_values, high_values):
+        """
+        Add up per-pair values for both teams of every pair, see team_sums
+        """
+        if self.pair_incidence is not None:
+            return low_values @ self.pair_incidence[1] + high_values @ self.pair_incidence[2]
+        return team_sums(low_values, high_values, self.pair_low, self.pair_high, self.num_teams)
+
+
+    def common_games(self, group, minimum=1):
+        """
+        Return every team's win percentage against the opponents every team tied with it played
+
+        Leagues larger than MAX_COMMON_TEAMS skip this tiebreaker, every team gets NEUTRAL.
+
+        args:
+        group: int array of shape (teams,) or (seasons, teams), -1 for teams outside every group
+        minimum: fewest common games for the tiebreaker to count
+
+        return:
+        float array of shape (seasons, teams)
+        """
+        pct = self.pct
+        group = np.broadcast_to(group, pct.shape)
+        seasons, num_teams = group.shape
+        if num_teams > MAX_COMMON_TEAMS:
+            return np.full(group.shape, NEUTRAL)
+        words = (num_teams + 63) // 64
+        #bit o of a team's row is set when it played team o
+        opponent_bits = np.zeros((num_teams, words), dtype=np.uint64)
+        one = np.uint64(1)
+        for team, opponent in ((self.away, self.home), (self.home, self.away)):
+            np.bitwise_or.at(opponent_bits, (team, opponent >> 6), one << (opponent & 63).astype(np.uint64))
+
+        away_mask = np.empty((seasons, len(self.away)), dtype=bool)
+        home_mask = np.empty((seasons, len(self.away)), dtype=bool)
+        away_shift = (self.home & 63).astype(np.uint64)
+        home_shift = (self.away & 63).astype(np.uint64)
+        chunk = max(1, COMMON_CHUNK_WORDS // (num_teams * words))
+        for start in range(0, seasons, chunk):
+            stop = min(start + chunk, seasons)
+            common = common_opponents(group[start:stop], pct[start:stop], opponent_bits)
+            rows = np.arange(stop - start)[:, None]
+            away_mask[start:stop] = (common[rows, self.away, self.home >> 6] >> away_shift) & one
+            home_mask[start:stop] = (common[rows, self.home, self.away >> 6] >> home_shift) & one
+        return self.percentage(away_mask, home_mask, minimum)
+
+
+
+def tie_classes(group, pct):
+    """
+    Sort teams into classes of the same season, group and win percentage
+
+    args:
+    group: int array of shape (seasons, teams)
+    pct: array of shape (seasons, teams)
+
+    return:
+    flat sort order and the class number of every sorted entry as a tuple
+    """
+    season = np.repeat(np.arange(group.shape[0]), group.shape[1])
+    group, pct = group.ravel(), pct.ravel()
+    order = np.lexsort((pct, group, season))
+    sorted_group, sorted_pct, sorted_season = group[order], pct[order], season[order]
+    start = np.ones(len(order), dtype=bool)
+    start[1:] = ((sorted_group[1:] != sorted_group[:-1]) | (sorted_pct[1:] != sorted_pct[:-1])
+                 | (sorted_season[1:] != sorted_season[:-1]))
+    return order, np.cumsum(start) - 1
+
+
+
+def common_opponents(group, pct, opponent_bits):
+    """
+    Intersect the opponents of every class of tied teams
+
+    args:
+    group: int array of shape (seasons, teams)
+    pct: array of shape (seasons, teams)
+    opponent_bits: uint64 array of shape (teams, words) with every team's opponents as a bitset
+
+    return:
+    uint64 array of shape (seasons, teams, words) with the opponents every team tied with a team played
+    """
+    seasons, num_teams = group.shape
+    order, classes = tie_classes(group, pct)
+    starts = np.flatnonzero(np.diff(classes, prepend=-1))
+    bits = np.bitwise_and.reduceat(opponent_bits[order % num_teams], starts, axis=0)
+    common = np.empty((seasons * num_teams, opponent_bits.shape[1]), dtype=np.uint64)
+    common[order] = bits[classes]
+    return common.reshape(seasons, num_teams, -1)
+
+
+
+class GroupTable:
+    """
+    This class lays the teams of every group out as the rows of a padded (groups, size) table
+
+    Ranking a row at a time with a lexsort along the last axis keeps every
+    sort as short as a group, instead of sorting all seasons and teams together.
+    """
+
+    def __init__(self, groups, num_teams):
+        """
+        Build the table.
+
+        args:
+        groups: list of team index arrays, one per group
+        num_teams: number of teams, also used as the index of the padding column
+        """
+        size = max((len(rows) for rows in groups), default=1)
+        self.num_teams = num_teams
+        self.members = np.full((len(groups), size), num_teams, dtype=np.intp)
+        #group of every team, -1 outside every group
+        self.group = np.full(num_teams, -1, dtype=np.intp)
+        for row, rows in enumerate(groups):
+            self.members[row, :len(rows)] = rows
+            self.group[rows] = row
+
+
+    def gather(self, values, fill):
+        """
+        Return a (seasons, teams) array as a (seasons, groups, size) table with fill in the padding
+        """
+        values = np.asarray(values)
+        padding = np.full((values.shape[0], 1), fill, dtype=values.dtype)
+        return np.concatenate([values, padding], axis=1)[:, self.members]
+
+
+    def scatter(self, table):
+        """
+        Return a (seasons, groups, size) table as a (seasons, teams) array with -1 for teams outside every group
+        """
+        values = np.full((table.shape[0], self.num_teams + 1), -1, dtype=table.dtype)
+        values[:, self.members] = table
+        return values[:, :-1]
+
+
+    def rank(self, keys):
+        """
+        Rank the teams of every group in every season
+
+        args:
+        keys: list of (seasons, teams) arrays, most important first, higher is better;
+              teams equal on every key are ranked in team order
+
+        return:
+        int16 array of shape (seasons, teams) with 0 for the top team and -1 outside every group
+        """
+        #negated so an ascending sort puts the best team first and the padding last
+        tables = [self.gather(-np.asarray(key, dtype=np.float64), np.inf) for key in keys]
+        team = np.broadcast_to(self.members, tables[0].shape)
+        order = np.lexsort([team] + tables[::-1], axis=-1)
+        positions = np.empty(order.shape, dtype=np.int16)
+        np.put_along_axis(positions, order, np.arange(order.shape[-1], dtype=np.int16), axis=-1)
+        return self.scatter(positions)
+
+
+    def follow_division_order(self, ranks, pct, division, division_rank):
+        """
+        Reorder tied teams of the same division so they keep their division order
+
+        Before comparing teams of different divisions, the NFL breaks ties inside
+        each division first; the places the tied division mates hold are handed
+        out again by division rank.
+
+        args:
+        ranks: int16 array of shape (seasons, teams) from rank
+        pct: array of shape (seasons, teams) with every team's win percentage
+        division: int array of shape (teams,) with every team's division
+        division_rank: int16 array of shape (seasons, teams)
+
+        return:
+        reordered ranks
+        """
+        last = np.iinfo(np.int16).max
+        rank_table = self.gather(ranks, last)
+        pct_table = self.gather(pct, -1.0)
+        division_table = np.broadcast_to(np.append(division, -1)[self.members], rank_table.shape)
+        by_rank = np.lexsort((rank_table, pct_table, division_table), axis=-1)
+        by_division = np.lexsort((self.gather(division_rank, last), pct_table, division_table), axis=-1)
+        reordered = np.empty_like(rank_table)
+        np.put_along_axis(reordered, by_division, np.take_along_axis(rank_table, by_rank, axis=-1), axis=-1)
+        return self.scatter(reordered)
+
+
+
+def distinct_seasons(*arrays):
+    """
+    Find the seasons that differ from every earlier one
+
+    args:
+    arrays: integer arrays of shape (seasons, ...) describing every season
+
+    return:
+    index of one season per distinct row and, for every season, the position of its row among them as a tuple
+    """
+    rows = np.ascontiguousarray(np.concatenate([np.asarray(a, dtype=np.int16).reshape(len(a), -1) for a in arrays], axis=1))
+    keys = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+
+
+def rank_standings(wins, losses, ties, away, home, outcomes, division_groups, conference_groups,
+                   playoff_teams=league.PLAYOFF_TEAMS):
+    """
+    Rank divisions and seed conferences in every season with the NFL tiebreakers
+
+    Teams with the same win percentage are separated, in order, by head-to-head
+    record among the tied teams (for three or more only a sweep, or when all of
+    them met, see GameRecords.head_to_head), division record (for division ranks), common
+    games, conference record, strength of victory and strength of schedule, and
+    finally by team order in place of a coin toss. Every tiebreaker is applied
+    in one pass over all seasons, without the NFL's restart after a team is
+    eliminated from a tie of three or more. Division winners take the top
+    seeds and the rest of the conference competes for the wild cards, where
+    tied teams of the same division keep their division order.
+
+    args:
+    wins, losses, ties: arrays of shape (seasons, teams) with the final records
+    away, home: team index of every game in outcomes
+    outcomes: array of shape (seasons, games) with monte_carlo outcome codes; records from weeks without
+              outcomes (e.g. before a checkpoint) count in the win percentage but not in the tiebreakers
+    division_groups: division name -> team index array
+    conference_groups: conference name -> team index array
+    playoff_teams: playoff spots per conference
+
+    return:
+    division ranks, conference ranks and seeds as (seasons, teams) int arrays; seed 0 means no playoffs and -1 marks teams outside every division
+    """
+    wins, losses, ties, outcomes = (np.asarray(values) for values in (wins, losses, ties, outcomes))
+    #seasons with the same results have the same standings, rank each distinct one once
+    first, inverse = distinct_seasons(outcomes, wins, losses, ties)
+    if len(first) < len(inverse):
+        ranked = rank_distinct(wins[first], losses[first], ties[first], away, home, outcomes[first],
+                               division_groups, conference_groups, playoff_teams)
+        return tuple(ranks[inverse] for ranks in ranked)
+    return rank_distinct(wins, losses, ties, away, home, outcomes, division_groups, conference_groups, playoff_teams)
+
+
+
+def rank_distinct(wins, losses, ties, away, home, outcomes, division_groups, conference_groups, playoff_teams):
+    """
+    Rank standings without looking for repeated seasons, see rank_standings
+    """
+    from aggregator import win_percentage
+
+    seasons, num_teams = np.shape(wins)
+    pct = win_percentage(wins, losses, ties)
+    records = GameRecords(away, home, outcomes, pct)
+    divisions = GroupTable(list(division_groups.values()), num_teams)
+    #teams outside every division are ranked nowhere
+    conferences = GroupTable([rows[divisions.group[rows] >= 0] for rows in conference_groups.values()], num_teams)
+    division, conference = divisions.group, conferences.group
+
+    same_division = (division[records.away] == division[records.home]) & (division[records.away] >= 0)
+    same_conference = (conference[records.away] == conference[records.home]) & (conference[records.away] >= 0)
+    division_pct = records.percentage(same_division)
+    conference_pct = records.percentage(same_conference)
+    victory = records.opponent_percentage(wins_only=True)
+    schedule = records.opponent_percentage(wins_only=False)
+
+    division_rank = divisions.rank([pct, records.head_to_head(division), division_pct,
+                                    records.common_games(division), conference_pct, victory, schedule])
+
+    conference_rank = conferences.rank([pct, records.head_to_head(conference), conference_pct,
+                                        records.common_games(conference, MIN_COMMON_GAMES), victory, schedule])
+    conference_rank = conferences.follow_division_order(conference_rank, pct, division, division_rank)
+
+    #division winners are seeded ahead of the rest of their conference, ties are only among teams of the same kind
+    winner = division_rank == 0
+    seed_group = np.where(conference >= 0, conference * 2 + ~winner, -1)
+    order = conferences.rank([winner, pct, records.head_to_head(seed_group), conference_pct,
+                              records.common_games(seed_group, MIN_COMMON_GAMES), victory, schedule])
+    order = conferences.follow_division_order(order, pct, division, division_rank)
+    seeds = np.where(order < playoff_teams, order + 1, 0).astype(np.int16)
+    seeds[order < 0] = -1
+    return division_rank, conference_rank, seeds
+
+
+
+#GameResult outcome -> monte_carlo outcome code
+OUTCOME_CODES = {"win1": WIN1, "win2": WIN2, "tie": TIE}
+
+
+def season_standings(teams, results, divisions=league.DIVISIONS, conferences=None, playoff_teams=league.PLAYOFF_TEAMS):
+    """
+    Rank the divisions and seed the conferences of one played season
+
+    args:
+    teams: dictionary containing Team instances indexed by team names, with the season's records
+    results: GameResult list of the season's games, e.g. from FFHelper.simulate_season(structured=True)
+    divisions: dictionary of division name to team names
+    conferences: dictionary of division name -> conference name, see league.conference_of
+    playoff_teams: playoff spots per conference
+
+    return:
+    dictionary keyed by team name of {"division_rank", "conference_rank", "seed"}, ranks start at 1 and seed 0 means no playoffs;
+    teams outside every division are left out
+    """
+    names = list(teams.keys())
+    index = {name: i for i, name in enumerate(names)}
+    games = [result for result in results if result.outcome in OUTCOME_CODES]
+    away = np.array([index[result.away] for result in games], dtype=np.intp)
+    home = np.array([index[result.home] for result in games], dtype=np.intp)
+    outcomes = np.array([[OUTCOME_CODES[result.outcome] for result in games]], dtype=np.int8)
+    records = [[getattr(teams[name], column) for name in names] for column in ("current_wins", "current_losses", "current_ties")]
+    division_groups, conference_groups = league.group_indices(names, divisions, conferences)
+    division_rank, conference_rank, seeds = rank_standings(*(np.array([column]) for column in records), away, home, outcomes,
+                                                           division_groups, conference_groups, playoff_teams)
+    return {name: {"division_rank": int(division_rank[0, t]) + 1, "conference_rank": int(conference_rank[0, t]) + 1,
+                   "seed": int(seeds[0, t])}
+            for t, name in enumerate(names) if seeds[0, t] >= 0}
@@ -0,0 +1,153 @@
+#counter-based random numbers: every draw is a pure function of (master seed, season, game),
+#so any season can be replayed on its own and bulk, parallel and single-season runs agree draw for draw
+#numpy is only imported for batched draws, so replaying one season stays cheap to import
+
+#64-bit constants of the SplitMix64 mixing function
+MASK = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+MIX1 = 0xBF58476D1CE4E5B9
+MIX2 = 0x94D049BB133111EB
+
+#uniforms keep the top 53 bits of a mixed word, the precision of a float
+FLOAT_SCALE = 2.0 ** -53
+
+
+def mix(z):
+    """
+    Scramble a 64-bit integer with the SplitMix64 finalizer
+
+    args:
+    z: int in [0, 2**64)
+
+    return:
+    int in [0, 2**64)
+    """
+    z = ((z ^ (z >> 30)) * MIX1) & MASK
+    z = ((z ^ (z >> 27)) * MIX2) & MASK
+    return z ^ (z >> 31)
+
+
+
+def mix_array(z):
+    """
+    Scramble a uint64 array with the SplitMix64 finalizer, the same function as mix
+    """
+    import numpy as np
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(MIX1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(MIX2)
+    return z ^ (z >> np.uint64(31))
+
+
+
+def seed_key(seed):
+    """
+    Fold a master seed of any size into a 64-bit key
+
+    args:
+    seed: non-negative int, e.g. the 128-bit entropy of a numpy SeedSequence
+
+    return:
+    int in [0, 2**64)
+    """
+    if seed < 0:
+        raise ValueError("seed must be non-negative")
+    key = mix(GOLDEN)
+    while True:
+        key = mix(((key ^ (seed & MASK)) + GOLDEN) & MASK)
+        seed >>= 64
+        if not seed:
+            return key
+
+
+
+class CounterStream:
+    """
+    This class gives the uniform draw of any (season, game) of a run directly, without drawing the ones before it
+
+    A game is numbered by its position among the games a run simulates, so
+    with a checkpoint game 0 is the first game after the decided weeks.
+    """
+
+    def __init__(self, seed):
+        """
+        Initialize the stream of a master seed.
+
+        args:
+        seed: master seed (non-negative int)
+        """
+        self.seed = seed
+        self.key = seed_key(seed)
+
+
+    def season_key(self, season):
+        """
+        Return the 64-bit key of one season
+        """
+        return mix((self.key + (season + 1) * GOLDEN) & MASK)
+
+
+    def uniform(self, season, game):
+        """
+        Return the uniform draw in [0, 1) of one game of one season
+        """
+        return (mix((self.season_key(season) + (game + 1) * GOLDEN) & MASK) >> 11) * FLOAT_SCALE
+
+
+    def uniforms(self, seasons, games):
+        """
+        Return the uniform draws of many games of many seasons at once, equal to uniform for every pair
+
+        args:
+        seasons: int array of season numbers
+        games: int array of game numbers
+
+        return:
+        float64 array of shape (len(seasons), len(games))
+        """
+        import numpy as np
+        with np.errstate(over="ignore"):
+            seasons = np.asarray(seasons, dtype=np.uint64)
+            games = np.asarray(games, dtype=np.uint64)
+            season_keys = mix_array(np.uint64(self.key) + (seasons + np.uint64(1)) * np.uint64(GOLDEN))
+            mixed = mix_array(season_keys[:, None] + ((games + np.uint64(1)) * np.uint64(GOLDEN))[None, :])
+        return (mixed >> np.uint64(11)).astype(np.float64) * FLOAT_SCALE
+
+
+    def season(self, season, game=0):
+        """
+        Return a SeasonStream drawing one season's games in order
+
+        args:
+        season: season number
+        game: number of the first game drawn
+        """
+        return SeasonStream(self, season, game)
+
+
+
+class SeasonStream:
+    """
+    This class stands in for random.Random in the game-by-game simulation, drawing one season's games in order
+    """
+
+    def __init__(self, stream, season, game=0):
+        """
+        Initialize the draws of one season.
+
+        args:
+        stream: CounterStream of the run
+        season: season number
+        game: number of the next game
+        """
+        self.stream = stream
+        self.season = season
+        self.game = game
+
+
+    def random(self):
+        """
+        Return the draw of the next game and move on to the game after it
+        """
+        u = self.stream.uniform(self.season, self.game)
+        self.game += 1
+        return u
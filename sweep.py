@@ -0,0 +1,284 @@
+#import itertools to expand the grid, numpy to evaluate many grid points in one pass over the schedule
+import itertools
+from collections import namedtuple
+
+import numpy as np
+
+import FFHelper
+import monte_carlo
+from weather import WEATHER_TYPES, default_sampler
+
+#one point of a sweep, weather entries are (efficiency, net production) multipliers and *_line entries LSRL (slope, intercept) pairs
+ModelParameters = namedtuple("ModelParameters", ["home_multiplier", "win_streak_bonus", "rain", "snow", "wind",
+                                                 "x_off_line", "x_def_line", "x_wins_line"])
+
+#the constants the program uses today
+DEFAULT_PARAMETERS = ModelParameters(FFHelper.HOME_MULTIPLIER, FFHelper.WIN_STREAK_BONUS,
+                                     FFHelper.WEATHER_EFFECTS["Rain"], FFHelper.WEATHER_EFFECTS["Snow"],
+                                     FFHelper.WEATHER_EFFECTS["Wind"], FFHelper.X_OFF_LINE, FFHelper.X_DEF_LINE,
+                                     FFHelper.X_WINS_LINE)
+
+#most grid points x seasons x teams simulated at once, small chunks stay in cache and bound the memory
+MAX_CHUNK_CELLS = 1 << 19
+
+
+def parameter_grid(**values):
+    """
+    Build every combination of the given parameter values
+
+    args:
+    values: ModelParameters field name -> list of values, fields left out keep their default
+
+    return:
+    list of ModelParameters
+    """
+    unknown = set(values) - set(ModelParameters._fields)
+    if unknown:
+        raise TypeError(f"Unknown model parameters: {', '.join(sorted(unknown))}")
+    axes = [values.get(field, [getattr(DEFAULT_PARAMETERS, field)]) for field in ModelParameters._fields]
+    return [ModelParameters(*point) for point in itertools.product(*axes)]
+
+
+
+def weather_multipliers(grid):
+    """
+    Gather the weather multipliers of every grid point
+
+    args:
+    grid: list of ModelParameters
+
+    return:
+    efficiency and net production multiplier arrays of shape (grid points, len(WEATHER_TYPES)) as a tuple
+    """
+    efficiency = np.ones((len(grid), len(WEATHER_TYPES)), dtype=np.float64)
+    net_production = np.ones((len(grid), len(WEATHER_TYPES)), dtype=np.float64)
+    for code, weather in enumerate(WEATHER_TYPES):
+        field = weather.lower()
+        if field in ModelParameters._fields:
+            efficiency[:, code] = [getattr(point, field)[0] for point in grid]
+            net_production[:, code] = [getattr(point, field)[1] for point in grid]
+    return efficiency, net_production
+
+
+
+def expected_wins_grid(grid, teams):
+    """
+    Evaluate the LSRL expected wins of every team at every grid point
+
+    args:
+    grid: list of ModelParameters
+    teams: dictionary containing Team instances indexed by team names
+
+    return:
+    expected wins array of shape (grid points, teams) in teams order
+    """
+    off = np.array([team.off for team in teams.values()], dtype=np.float64)
+    de = np.array([team.de for team in teams.values()], dtype=np.float64)
+    x_off = np.array([point.x_off_line for point in grid], dtype=np.float64)
+    x_def = np.array([point.x_def_line for point in grid], dtype=np.float64)
+    x_wins = np.array([point.x_wins_line for point in grid], dtype=np.float64)
+    net = (x_off[:, :1] * off + x_off[:, 1:]) - (x_def[:, :1] * de + x_def[:, 1:])
+    return x_wins[:, :1] * net + x_wins[:, 1:]
+
+
+
+class SweepResult:
+    """
+    This class holds the simulated and expected wins of every team at every grid point
+    """
+
+    def __init__(self, grid, team_names, seasons, seed, mean_wins, variance_wins, x_wins):
+        """
+        Initialize the result.
+
+        args:
+        grid: list of ModelParameters
+        team_names: list of team names in array order
+        seasons: seasons simulated per grid point
+        seed: seed of the shared weather draws
+        mean_wins, variance_wins: simulated wins arrays of shape (grid points, teams)
+        x_wins: LSRL expected wins array of shape (grid points, teams)
+        """
+        self.grid = list(grid)
+        self.team_names = list(team_names)
+        self.seasons = seasons
+        self.seed = seed
+        self.mean_wins = mean_wins
+        self.variance_wins = variance_wins
+        self.x_wins = x_wins
+
+
+    def __len__(self):
+        return len(self.grid)
+
+
+    def errors(self, target_wins):
+        """
+        Score every grid point against known win totals
+
+        args:
+        target_wins: dictionary of team name -> wins, e.g. the real final records
+
+        return:
+        dictionary with the root mean square error of the simulated ("simulated") and LSRL ("expected") wins per grid point
+        """
+        rows = [t for t, name in enumerate(self.team_names) if name in target_wins]
+        target = np.array([target_wins[self.team_names[t]] for t in rows], dtype=np.float64)
+        return {
+            "simulated": np.sqrt(((self.mean_wins[:, rows] - target) ** 2).mean(axis=1)),
+            "expected": np.sqrt(((self.x_wins[:, rows] - target) ** 2).mean(axis=1)),
+        }
+
+
+    def best(self, target_wins, by="simulated"):
+        """
+        Find the grid point closest to known win totals
+
+        args:
+        target_wins: dictionary of team name -> wins
+        by: "simulated" or "expected", which wins to score
+
+        return:
+        ModelParameters and its root mean square error as a tuple
+        """
+        errors = self.errors(target_wins)[by]
+        g = int(np.argmin(errors))
+        return self.grid[g], float(errors[g])
+
+
+    def summary(self):
+        """
+        Summarize every grid point
+
+        return:
+        list of dictionaries with the parameters and per-team mean, variance and expected wins
+        """
+        return [
+            {
+                "parameters": point._asdict(),
+                "teams": {
+                    name: {"mean_wins": float(self.mean_wins[g, t]), "variance_wins": float(self.variance_wins[g, t]),
+                           "x_wins": float(self.x_wins[g, t])}
+                    for t, name in enumerate(self.team_names)
+                },
+            }
+            for g, point in enumerate(self.grid)
+        ]
+
+
+
+def sweep(grid, schedule_file, teams, n=1000, seed=None, weather_in_score=False, chunk_size=None, schedule=None,
+          sampler=None, checkpoint=None):
+    """
+    Simulate n seasons at every grid point against the same weather draws
+
+    The weather of every game in every season is drawn once and shared by all
+    grid points (common random numbers), so differences between grid points
+    come from the parameters rather than from sampling noise. Grid points are
+    simulated together, a chunk at a time, in one pass over the schedule.
+    Without weather_in_score no game depends on a random draw, so one season
+    per grid point gives the exact result for any n.
+
+    args:
+    grid: list of ModelParameters, e.g. from parameter_grid
+    schedule_file: path to the schedule CSV file
+    teams: dictionary containing Team instances indexed by team names
+    n: seasons per grid point
+    seed: seed of the weather draws
+    weather_in_score: score games with the weather-adjusted efficiency and net production;
+                      play_game draws the weather but scores with the unadjusted stats, so the
+                      default False matches the simulator and the weather multipliers only change
+                      the results when this is True
+    chunk_size: grid points simulated at once, defaults to what fits in MAX_CHUNK_CELLS
+    schedule: optional (week, away, home) arrays, skips reading schedule_file
+    sampler: WeatherSampler for the home stadiums, defaults to the shipped stadium profiles
+    checkpoint: checkpoint.SeasonCheckpoint to start every season from
+
+    return:
+    SweepResult
+    """
+    grid = list(grid)
+    names, efficiency, net_production, production_allowed = monte_carlo.team_arrays(teams)
+    if schedule is None:
+        schedule = monte_carlo.schedule_arrays(schedule_file, names)
+    week, away, home = schedule
+    if checkpoint is not None:
+        remaining = week > checkpoint.week
+        week, away, home = week[remaining], away[remaining], home[remaining]
+    if sampler is None:
+        sampler = default_sampler()
+
+    #common random numbers: one weather draw per game and season, shared by every grid point
+    simulated = n if weather_in_score else 1
+    if weather_in_score:
+        weather = sampler.draw_codes(sampler.rows_for(names)[home], (n,), np.random.default_rng(seed))
+    rounds = monte_carlo.schedule_rounds(away, home)
+
+    num_teams = len(names)
+    home_multiplier = np.array([point.home_multiplier for point in grid], dtype=np.float64)
+    streak_bonus = np.array([point.win_streak_bonus for point in grid], dtype=np.float64)
+    efficiency_multiplier, net_multiplier = weather_multipliers(grid)
+    if checkpoint is not None:
+        start_wins, _, _, start_streak = checkpoint.arrays(names)
+
+    #weather-free base scores, the home multiplier is applied per grid point
+    team1_base = efficiency[away] + (net_production[away] - production_allowed[home])
+    team2_base = efficiency[home] + (net_production[home] - production_allowed[away])
+    if weather_in_score:
+        #scores of every game under every weather at every grid point, shape (grid points, games * weathers),
+        #so a block of games is one lookup per team instead of recomputing the multipliers per season
+        num_weather = len(WEATHER_TYPES)
+        team1_table = (efficiency[away, None] * efficiency_multiplier[:, None, :]
+                       + (net_production[away, None] * net_multiplier[:, None, :] - production_allowed[home, None]))
+        team2_table = (efficiency[home, None] * efficiency_multiplier[:, None, :]
+                       + (net_production[home, None] * net_multiplier[:, None, :] - production_allowed[away, None]))
+        team2_table *= home_multiplier[:, None, None]
+        team1_table = team1_table.reshape(len(grid), -1)
+        team2_table = team2_table.reshape(len(grid), -1)
+        #position of every game and season's weather in the flattened tables
+        lookup = np.arange(len(away))[None, :] * num_weather + weather
+
+    mean_wins = np.zeros((len(grid), num_teams), dtype=np.float64)
+    variance_wins = np.zeros((len(grid), num_teams), dtype=np.float64)
+    if chunk_size is None:
+        chunk_size = max(1, MAX_CHUNK_CELLS // max(simulated * num_teams, 1))
+
+    for first in range(0, len(grid), chunk_size):
+        g = slice(first, min(first + chunk_size, len(grid)))
+        size = g.stop - g.start
+        #grid points and seasons share the leading axis, row size * season + s, like one big batch of seasons
+        wins = np.zeros((size * simulated, num_teams), dtype=np.int16)
+        streak = np.zeros((size * simulated, num_teams), dtype=np.int16)
+        if checkpoint is not None:
+            wins[:] = start_wins
+            streak[:] = start_streak
+        home_factor = np.repeat(home_multiplier[g], simulated)[:, None]
+        bonus = np.repeat(streak_bonus[g], simulated)[:, None]
+
+        for start, stop in rounds:
+            a = away[start:stop]
+            h = home[start:stop]
+            if weather_in_score:
+                game_lookup = lookup[:, start:stop]
+                team1_score = team1_table[g][:, game_lookup].reshape(size * simulated, -1)
+                team2_score = team2_table[g][:, game_lookup].reshape(size * simulated, -1)
+            else:
+                team1_score = team1_base[start:stop]
+                team2_score = team2_base[start:stop] * home_factor
+
+            #win streak multiplier per grid point
+            team1_score = team1_score * (1 + bonus * streak[:, a])
+            team2_score = team2_score * (1 + bonus * streak[:, h])
+
+            win1 = team1_score > team2_score
+            win2 = team2_score > team1_score
+            wins[:, a] += win1
+            wins[:, h] += win2
+            streak[:, a] = np.where(win1, streak[:, a] + 1, 0)
+            streak[:, h] = np.where(win2, streak[:, h] + 1, 0)
+
+        wins = wins.reshape(size, simulated, num_teams)
+        mean_wins[g] = wins.mean(axis=1)
+        variance_wins[g] = wins.var(axis=1)
+
+    return SweepResult(grid, names, n, seed, mean_wins, variance_wins, expected_wins_grid(grid, teams))
@@ -0,0 +1,136 @@
+#import numpy to draw made-up stats and pairings in bulk, csv to stream the files out week by week
+import argparse
+import csv
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from league import League
+from weather import WEATHER_TYPES, load_stadium_weather
+
+#paths of the files written for a made-up league
+SyntheticLeague = namedtuple("SyntheticLeague", ["offense_file", "defense_file", "schedule_file", "league_file",
+                                                 "stadium_weather_file"])
+
+
+def team_names(num_teams):
+    """
+    Return the made-up names of a league's teams, zero padded so they sort in order
+    """
+    width = max(5, len(str(num_teams - 1)))
+    return [f"Team {i:0{width}d}" for i in range(num_teams)]
+
+
+
+def league_structure(names, division_size=4, divisions_per_conference=4):
+    """
+    Split teams into conferences and divisions in name order
+
+    args:
+    names: list of team names
+    division_size: teams per division, the last division may be smaller
+    divisions_per_conference: divisions per conference, the last conference may have fewer
+
+    return:
+    dictionary of conference name -> dictionary of division name -> team names, see league.League
+    """
+    conferences = {}
+    for start in range(0, len(names), division_size):
+        division = start // division_size
+        conference = f"Conference {division // divisions_per_conference + 1}"
+        conferences.setdefault(conference, {})[f"{conference} Division {division % divisions_per_conference + 1}"] = names[start:start + division_size]
+    return conferences
+
+
+
+def write_league(directory, num_teams, weeks=17, seed=0, division_size=4, divisions_per_conference=4):
+    """
+    Write offense, defense, schedule, stadium climate and league config files for a league of made-up teams
+
+    Team stats are drawn from the ranges of the 2023 files, every stadium gets
+    the climate of a random shipped stadium and every week pairs the teams at
+    random. Rows are written a week at a time, so leagues with millions of
+    games don't have to fit in memory as Python objects.
+
+    args:
+    directory: where to write the files
+    num_teams: number of teams, with an odd count one team sits out every week
+    weeks: number of weeks in the schedule, also the league's season length
+    seed: seed for the made-up stats, climates and pairings
+    division_size: teams per division
+    divisions_per_conference: divisions per conference
+
+    return:
+    SyntheticLeague with the written paths
+    """
+    rng = np.random.default_rng(seed)
+    names = team_names(num_teams)
+    paths = SyntheticLeague(*(os.path.join(directory, name) for name in
+                              ("Offense.csv", "Defense.csv", "Schedule.csv", "League.json", "Stadium Weather.csv")))
+
+    def uniform(low, high):
+        return np.round(rng.uniform(low, high, num_teams), 1).tolist()
+
+    with open(paths.offense_file, "w", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["Name", "GP", "PTS", "All", "QB", "RB", "WR", "TE", "All", "Run", "Run%", "Pass", "Pass%"])
+        points, run, pass_ = uniform(13, 30), uniform(22, 32), uniform(29, 40)
+        #every team gets its own positional production, the first All column is their total
+        positions = uniform(6, 24), uniform(6, 28), uniform(8, 30), uniform(3, 12)
+        writer.writerows([name, weeks, points[i], round(sum(position[i] for position in positions), 1),
+                          *(position[i] for position in positions), round(run[i] + pass_[i], 1),
+                          run[i], "", pass_[i], ""] for i, name in enumerate(names))
+    with open(paths.defense_file, "w", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["Name", "GP", "PA", "DEF", "QB", "RB", "WR", "TE"])
+        writer.writerows(zip(names, [weeks] * num_teams, uniform(16, 30), uniform(3, 11), uniform(13, 20),
+                             uniform(15, 22), uniform(22, 30), uniform(6, 11)))
+
+    #reuse the distinct shipped climate profiles
+    profiles = sorted({tuple(profile[weather] for weather in WEATHER_TYPES) for profile in load_stadium_weather().values()})
+    climates = rng.integers(0, len(profiles), num_teams).tolist()
+    with open(paths.stadium_weather_file, "w", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["Name", *WEATHER_TYPES])
+        writer.writerows([name, *(f"{p:g}" for p in profiles[climate])] for name, climate in zip(names, climates))
+
+    name_array = np.array(names, dtype=object)
+    games = num_teams // 2
+    with open(paths.schedule_file, "w", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["Week", "Team1", "Team2"])
+        for week in range(1, weeks + 1):
+            order = name_array[rng.permutation(num_teams)]
+            writer.writerows(zip([week] * games, order[0:2 * games:2].tolist(), order[1:2 * games:2].tolist()))
+
+    League(f"Synthetic {num_teams}", league_structure(names, division_size, divisions_per_conference), weeks,
+           min(7, max(1, division_size * divisions_per_conference // 2)), paths.stadium_weather_file).save(paths.league_file)
+    return paths
+
+
+
+def main(argv=None):
+    """
+    Parse the command line and write a made-up league
+    """
+    parser = argparse.ArgumentParser(description="Write the input files of a made-up league for scale testing")
+    parser.add_argument("directory", help="where to write the files")
+    parser.add_argument("--teams", type=int, default=2000, help="number of teams")
+    parser.add_argument("--weeks", type=int, default=17, help="number of weeks")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the made-up stats and pairings")
+    parser.add_argument("--division-size", type=int, default=4, help="teams per division")
+    parser.add_argument("--divisions", type=int, default=4, help="divisions per conference")
+    args = parser.parse_args(argv)
+    if args.teams < 2 or args.weeks < 1 or args.division_size < 1 or args.divisions < 1:
+        parser.error("need at least 2 teams, 1 week, and divisions and conferences of at least 1")
+
+    os.makedirs(args.directory, exist_ok=True)
+    paths = write_league(args.directory, args.teams, args.weeks, args.seed, args.division_size, args.divisions)
+    print(f"Wrote {args.teams} teams and {args.teams // 2 * args.weeks} games to {args.directory}, "
+          f"use them with {paths.league_file} in $FFHELPER_LEAGUE")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,50 @@
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
 import unittest
-from FFHelper import Team, reset_all_teams, get_weather, simulate_game
+
+import numpy as np
+
+from FFHelper import Team, TeamTable, reset_all_teams, get_weather, simulate_game, create_teams, simulate_season, iter_seasons, format_result, read_team_rows, read_team_rows_csv
+import adaptive
+import aggregator
+import benchmarks
+import checkpoint
+import FFHelper
+import instrumentation
+import league
+import matchups
+import monte_carlo
+import outcome_store
+import parallel
+import positional
+import regression
+import result_cache
+import schedule_cache
+import season_store
+import service
+import sinks
+import standings
+import streams
+import sweep
+import synthetic
+import weather
+
+#paths to the 2023 CSV files next to this script
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+OFFENSE_FILE = os.path.join(DATA_DIR, "2023 Fantasy Offense Stats.csv")
+DEFENSE_FILE = os.path.join(DATA_DIR, "2023 Fantasy Defense Stats.csv")
+SCHEDULE_FILE = os.path.join(DATA_DIR, "2023 Schedule.csv")
+
+#keep cached files from the tests out of the user's cache directory
+os.environ.setdefault("FFHELPER_CACHE_DIR", tempfile.mkdtemp(prefix="ffhelper-tests-"))
 
 class Test(unittest.TestCase):
 
@@ -214,4 +259,1470 @@ class Test(unittest.TestCase):
         
         #calls simulate_game and checks if the outcome is team 1 win, team 2 win, or tie
         winner, loser, outcome = simulate_game(self.team, team2)
-        self.assertIn(outcome, ["win1", "win2", "tie"])
\ No newline at end of file
+        self.assertIn(outcome, ["win1", "win2", "tie"])
+
+
+class TestTeamTable(unittest.TestCase):
+
+    def test_create_teams_share_table(self):
+        """
+        Test create_teams stores every team as a row of one TeamTable
+        """
+        teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        table = teams["Miami Dolphins"].table
+        self.assertEqual(len(table), 32)
+        for team in teams.values():
+            self.assertIs(team.table, table)
+            self.assertEqual(table.column("team_efficiency")[team.index], team.team_efficiency)
+            self.assertEqual(table.column("x_wins")[team.index], team.x_wins)
+
+    def test_slots(self):
+        """
+        Test Team is a __slots__ view without a per-instance dictionary
+        """
+        team = Team("Sample Team", {"All": 10, "Run": 5, "Pass": 5}, {"DEF": 1})
+        self.assertFalse(hasattr(team, "__dict__"))
+        with self.assertRaises(AttributeError):
+            team.unknown_stat = 1
+
+    def test_net_production_column(self):
+        """
+        Test the precomputed net production follows changes to off and de
+        """
+        table = TeamTable()
+        team = Team("Sample Team", {"All": 10, "Run": 5, "Pass": 5}, {"DEF": 1}, table)
+        self.assertEqual(table.column("net_production")[team.index], round(10 + 1 * 7.06))
+        team.off = 20
+        team.de = 2
+        self.assertEqual(team.calculate_net_production(), round(20 + 2 * 7.06))
+
+
+class TestTeamLoader(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up an empty cache directory
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.old_cache_dir = os.environ["FFHELPER_CACHE_DIR"]
+        os.environ["FFHELPER_CACHE_DIR"] = self.tmpdir.name
+
+    def tearDown(self):
+        os.environ["FFHELPER_CACHE_DIR"] = self.old_cache_dir
+        self.tmpdir.cleanup()
+
+    def test_duplicate_all_column(self):
+        """
+        Test the first "All" column (total fantasy production) is the one used for off
+        """
+        rows = {name: (offense, defense) for name, offense, defense in read_team_rows(OFFENSE_FILE, DEFENSE_FILE)}
+        self.assertEqual(len(rows), 32)
+        self.assertEqual(rows["San Francisco 49ers"][0]["All"], 85.8)
+        self.assertEqual(rows["San Francisco 49ers"][1]["DEF"], 8.3)
+
+    def test_warm_start_from_cache(self):
+        """
+        Test a second load comes from the cache and gives identical teams
+        """
+        cold = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.assertEqual(len(os.listdir(self.tmpdir.name)), 1)
+        warm = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        uncached = create_teams(OFFENSE_FILE, DEFENSE_FILE, cache=False)
+        for name in cold:
+            self.assertEqual(repr(cold[name]), repr(warm[name]))
+            self.assertEqual(repr(cold[name]), repr(uncached[name]))
+
+    def test_csv_reader_matches_pandas(self):
+        """
+        Test the standard-library reader gives the same rows as the pandas join
+        """
+        self.assertEqual(read_team_rows_csv(OFFENSE_FILE, DEFENSE_FILE), read_team_rows(OFFENSE_FILE, DEFENSE_FILE))
+
+    def test_expect_without_pandas(self):
+        """
+        Test importing FFHelper and printing expected records never imports pandas
+        """
+        code = ("import sys, FFHelper\n"
+                f"teams = FFHelper.create_teams({OFFENSE_FILE!r}, {DEFENSE_FILE!r}, cache=False)\n"
+                "FFHelper.print_expected_records(teams)\n"
+                "print('pandas' in sys.modules, 'numpy' in sys.modules)\n")
+        output = subprocess.run([sys.executable, "-c", code], cwd=DATA_DIR, capture_output=True, text=True, check=True).stdout
+        self.assertIn("Miami Dolphins - Expected Wins", output)
+        self.assertEqual(output.splitlines()[-1], "False False")
+
+    def test_missing_defense_row(self):
+        """
+        Test a team without defense stats is reported
+        """
+        defense_file = os.path.join(self.tmpdir.name, "Defense.csv")
+        with open(DEFENSE_FILE) as f:
+            lines = f.readlines()
+        with open(defense_file, "w") as f:
+            f.writelines(lines[:-1])
+        with self.assertRaises(KeyError):
+            create_teams(OFFENSE_FILE, defense_file, cache=False)
+
+
+class TestMonteCarlo(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams for testing
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+
+    def test_simulate_seasons_matches_simulate_season(self):
+        """
+        Test simulate_seasons gives every team the same record as the per-game simulate_season
+        """
+        simulate_season(SCHEDULE_FILE, self.teams)
+        batch = monte_carlo.simulate_seasons(50, SCHEDULE_FILE, self.teams, seed=7)
+        self.assertEqual(len(batch), 50)
+        for t, name in enumerate(batch.team_names):
+            team = self.teams[name]
+            self.assertTrue((batch.wins[:, t] == team.current_wins).all())
+            self.assertTrue((batch.losses[:, t] == team.current_losses).all())
+            self.assertTrue((batch.ties[:, t] == team.current_ties).all())
+
+    def test_win_distribution(self):
+        """
+        Test win_distribution counts one final win total per team per season
+        """
+        batch = monte_carlo.simulate_seasons(20, SCHEDULE_FILE, self.teams, seed=7)
+        distribution = batch.win_distribution()
+        self.assertEqual(distribution.shape, (32, 18))
+        self.assertTrue((distribution.sum(axis=1) == 20).all())
+
+    def test_weather_draws(self):
+        """
+        Test the batched weather draws only give indoor stadiums clear weather
+        """
+        batch = monte_carlo.simulate_seasons(200, SCHEDULE_FILE, self.teams, seed=7)
+        week, away, home = monte_carlo.schedule_arrays(SCHEDULE_FILE, batch.team_names)
+        indoor = home == batch.team_index("Arizona Cardinals")
+        self.assertTrue((batch.weather[:, indoor] == 0).all())
+        packers = home == batch.team_index("Green Bay Packers")
+        self.assertEqual(set(batch.weather[:, packers].ravel().tolist()), {0, 1, 2, 3})
+
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams for testing
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+
+    def test_seeded_weather(self):
+        """
+        Test get_weather gives the same draws for two generators with the same seed
+        """
+        rng1 = random.Random(11)
+        rng2 = random.Random(11)
+        draws1 = [get_weather("Buffalo Bills", rng1) for _ in range(50)]
+        draws2 = [get_weather("Buffalo Bills", rng2) for _ in range(50)]
+        self.assertEqual(draws1, draws2)
+
+    def test_counter_stream(self):
+        """
+        Test every draw only depends on the seed, season and game, in bulk and one at a time
+        """
+        stream = streams.CounterStream(5)
+        draws = stream.uniforms(np.arange(3, 6), np.arange(10))
+        self.assertEqual(draws[1, 7], stream.uniform(4, 7))
+        self.assertTrue((draws == streams.CounterStream(5).uniforms(np.arange(3, 6), np.arange(10))).all())
+        self.assertFalse((draws == streams.CounterStream(6).uniforms(np.arange(3, 6), np.arange(10))).all())
+        season = stream.season(4, 6)
+        self.assertEqual([season.random(), season.random()], [stream.uniform(4, 6), stream.uniform(4, 7)])
+        self.assertTrue(((draws >= 0) & (draws < 1)).all())
+
+    def test_replay_season(self):
+        """
+        Test one season of a parallel run is regenerated game by game with the same weather and records
+        """
+        parallel.init_worker(self.teams, monte_carlo.schedule_arrays(SCHEDULE_FILE, list(self.teams)))
+        batch = parallel.simulate_shard(8, 100, 20, keep_games=True)
+        results = FFHelper.replay_season(SCHEDULE_FILE, self.teams, 8, 117)
+        self.assertEqual(results[0].season, 117)
+        self.assertEqual([weather.WEATHER_TYPES.index(result.weather) for result in results], batch.weather[17].tolist())
+        codes = {"win1": monte_carlo.WIN1, "win2": monte_carlo.WIN2, "tie": monte_carlo.TIE}
+        self.assertEqual([codes[result.outcome] for result in results], batch.outcomes[17].tolist())
+        self.assertEqual([team.current_wins for team in self.teams.values()], batch.wins[17].tolist())
+        #the same seasons come out of a run with other shards
+        self.assertTrue((parallel.simulate_shard(8, 110, 10, keep_games=True).weather == batch.weather[10:]).all())
+
+    def test_worker_count_does_not_change_results(self):
+        """
+        Test the merged tally is the same with one worker or several
+        """
+        serial = parallel.simulate_seasons_parallel(300, SCHEDULE_FILE, self.teams, seed=3, workers=1, shard_size=100)
+        pooled = parallel.simulate_seasons_parallel(300, SCHEDULE_FILE, self.teams, seed=3, workers=2, shard_size=100)
+        self.assertEqual(serial.seasons, 300)
+        self.assertTrue((serial.wins == pooled.wins).all())
+        self.assertTrue((serial.losses == pooled.losses).all())
+        self.assertTrue((serial.ties == pooled.ties).all())
+
+
+
+class TestScheduleCache(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a small schedule csv in a temporary directory
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.schedule_file = os.path.join(self.tmpdir.name, "Schedule.csv")
+        self.write_schedule([("1", "A", "B"), ("2", "B", "C")])
+        self.team_names = ["A", "B", "C"]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_schedule(self, games):
+        """
+        Write the given (week, team1, team2) rows to the schedule csv
+        """
+        with open(self.schedule_file, "w") as f:
+            f.write('"Week","Team1","Team2"\n')
+            for game in games:
+                f.write(",".join(f'"{value}"' for value in game) + "\n")
+
+    def test_compile_and_memory_map(self):
+        """
+        Test the schedule is compiled to team indices and saved to a memory-mapped sidecar
+        """
+        week, away, home = schedule_cache.load_schedule(self.schedule_file, self.team_names)
+        self.assertEqual(week.tolist(), [1, 2])
+        self.assertEqual(away.tolist(), [0, 1])
+        self.assertEqual(home.tolist(), [1, 2])
+        header, games = schedule_cache.read_schedule(schedule_cache.sidecar_path(self.schedule_file))
+        self.assertIsInstance(games, np.memmap)
+        self.assertEqual(header["sha256"], schedule_cache.file_digest(self.schedule_file))
+
+    def test_rebuild_when_csv_changes(self):
+        """
+        Test the sidecar is rebuilt when the schedule csv contents change
+        """
+        schedule_cache.load_schedule(self.schedule_file, self.team_names)
+        self.write_schedule([("1", "C", "A")])
+        schedule_cache._loaded.clear()
+        week, away, home = schedule_cache.load_schedule(self.schedule_file, self.team_names)
+        self.assertEqual(away.tolist(), [2])
+        self.assertEqual(home.tolist(), [0])
+
+    def test_other_team_order(self):
+        """
+        Test a cached schedule is translated to a caller's own team order
+        """
+        schedule_cache.load_schedule(self.schedule_file, self.team_names)
+        week, away, home = schedule_cache.load_schedule(self.schedule_file, ["C", "B", "A"])
+        self.assertEqual(away.tolist(), [2, 1])
+        self.assertEqual(home.tolist(), [1, 0])
+
+    def test_caller_loads_fewer_teams(self):
+        """
+        Test a schedule loads for a caller without an unscheduled team, and fails for a missing scheduled team
+        """
+        schedule_cache.load_schedule(self.schedule_file, ["D", "A", "B", "C"])
+        week, away, home = schedule_cache.load_schedule(self.schedule_file, ["B", "C", "A"])
+        self.assertEqual(away.tolist(), [2, 0])
+        self.assertEqual(home.tolist(), [0, 1])
+        with self.assertRaises(KeyError):
+            schedule_cache.load_schedule(self.schedule_file, ["A", "B"])
+
+
+
+class TestWeatherSampler(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a sampler over the shipped stadium profiles
+        """
+        self.stadium_weather = weather.load_stadium_weather()
+        self.sampler = weather.WeatherSampler(self.stadium_weather)
+
+    def test_stadium_file(self):
+        """
+        Test every team has a stadium profile whose probabilities add up to 1
+        """
+        self.assertEqual(len(self.stadium_weather), 32)
+        for profile in self.stadium_weather.values():
+            self.assertAlmostEqual(sum(profile.values()), 1.0)
+
+    def test_alias_tables(self):
+        """
+        Test every alias table gives back exactly its stadium's probabilities
+        """
+        for name, profile in self.stadium_weather.items():
+            r = self.sampler.row(name)
+            k = len(weather.WEATHER_TYPES)
+            rebuilt = [0.0] * k
+            for column in range(k):
+                rebuilt[column] += self.sampler.prob[r][column] / k
+                rebuilt[self.sampler.alias[r][column]] += (1 - self.sampler.prob[r][column]) / k
+            for w, weather_type in enumerate(weather.WEATHER_TYPES):
+                self.assertAlmostEqual(rebuilt[w], profile[weather_type])
+
+    def test_bulk_draws(self):
+        """
+        Test bulk draws for a batch of seasons follow the stadium probabilities
+        """
+        rows = self.sampler.rows_for(["Buffalo Bills", "Dallas Cowboys", "Unknown Team"])
+        codes = self.sampler.draw_codes(rows, (20000,), np.random.default_rng(1))
+        self.assertEqual(codes.shape, (20000, 3))
+        #indoor and unknown stadiums are always clear
+        self.assertTrue((codes[:, 1:] == 0).all())
+        frequencies = np.bincount(codes[:, 0], minlength=4) / 20000
+        for w, weather_type in enumerate(weather.WEATHER_TYPES):
+            self.assertAlmostEqual(frequencies[w], self.stadium_weather["Buffalo Bills"][weather_type], delta=0.02)
+
+
+
+class TestGameResults(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams and a temporary output directory
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_structured_season(self):
+        """
+        Test the structured season yields one GameResult per game, matching the formatted strings
+        """
+        results = list(simulate_season(SCHEDULE_FILE, self.teams, structured=True))
+        self.assertEqual(len(results), 272)
+        self.assertEqual((results[0].week, results[0].away, results[0].home), (1, "Detroit Lions", "Kansas City Chiefs"))
+        self.assertIn(results[0].weather, weather.WEATHER_TYPES)
+        reset_all_teams(self.teams)
+        self.assertEqual([format_result(result) for result in results], simulate_season(SCHEDULE_FILE, self.teams))
+
+    def test_csv_sink(self):
+        """
+        Test the csv sink streams every result of several seasons in batches
+        """
+        path = os.path.join(self.tmpdir.name, "results.csv")
+        with sinks.open_sink(path, batch_size=100) as sink:
+            sink.write_all(iter_seasons(2, SCHEDULE_FILE, self.teams))
+        self.assertEqual(sink.count, 544)
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 544)
+        self.assertEqual(rows[-1]["season"], "1")
+
+    def test_jsonl_sink(self):
+        """
+        Test the JSON Lines sink writes one object per game
+        """
+        path = os.path.join(self.tmpdir.name, "results.jsonl")
+        with sinks.open_sink(path, batch_size=50) as sink:
+            sink.write_all(simulate_season(SCHEDULE_FILE, self.teams, structured=True))
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 272)
+        self.assertIn(records[0]["outcome"], ["win1", "win2", "tie"])
+
+    def test_sink_is_abstract(self):
+        """
+        Test a sink has to implement write_batch
+        """
+        with self.assertRaises(TypeError):
+            sinks.ResultSink(os.path.join(self.tmpdir.name, "results.txt"))
+
+
+
+class TestAggregator(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams and an aggregator over them
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.names = list(self.teams.keys())
+
+    def test_add_teams(self):
+        """
+        Test one simulated season is counted from the Team records
+        """
+        simulate_season(SCHEDULE_FILE, self.teams)
+        totals = aggregator.SeasonAggregator(self.names)
+        totals.add_teams(self.teams)
+        self.assertEqual(totals.seasons, 1)
+        for t, name in enumerate(self.names):
+            self.assertEqual(totals.win_counts[t, self.teams[name].current_wins], 1)
+        #7 seeds and 4 division winners per conference
+        self.assertEqual(totals.seed_counts[:, 1:].sum(), 14)
+        self.assertEqual(totals.division_rank_counts[:, 0].sum(), 8)
+
+    def test_merge(self):
+        """
+        Test merging partial aggregates gives the same counts as one aggregate over every season
+        """
+        batch = monte_carlo.simulate_seasons(30, SCHEDULE_FILE, self.teams, seed=1)
+        whole = aggregator.SeasonAggregator(self.names)
+        whole.add_batch(batch)
+        first = aggregator.SeasonAggregator(self.names)
+        second = aggregator.SeasonAggregator(self.names)
+        first.add_records(batch.wins[:10], batch.losses[:10], batch.ties[:10],
+                          (batch.away, batch.home, batch.outcomes[:10]))
+        second.add_records(batch.wins[10:], batch.losses[10:], batch.ties[10:],
+                           (batch.away, batch.home, batch.outcomes[10:]))
+        first.merge(second)
+        self.assertEqual(first.seasons, 30)
+        self.assertTrue((first.win_counts == whole.win_counts).all())
+        self.assertTrue((first.seed_counts == whole.seed_counts).all())
+
+    def test_seeds(self):
+        """
+        Test division winners take the top seeds even with fewer wins than a wild card
+        """
+        wins = [0] * len(self.names)
+        losses = [17] * len(self.names)
+        ties = [0] * len(self.names)
+        #Bills and Dolphins are both in the AFC East, Broncos win the AFC West with 9 wins
+        for name, w in [("Buffalo Bills", 14), ("Miami Dolphins", 13), ("Denver Broncos", 9)]:
+            wins[self.names.index(name)] = w
+            losses[self.names.index(name)] = 17 - w
+        division_groups, conference_groups = aggregator.league.group_indices(self.names)
+        division_rank, conference_rank, seeds = aggregator.playoff_seeds(
+            np.array([wins]), np.array([losses]), np.array([ties]),
+            division_groups, conference_groups)
+        self.assertEqual(seeds[0, self.names.index("Buffalo Bills")], 1)
+        self.assertEqual(seeds[0, self.names.index("Denver Broncos")], 2)
+        self.assertEqual(seeds[0, self.names.index("Miami Dolphins")], 5)
+        self.assertEqual(conference_rank[0, self.names.index("Denver Broncos")], 2)
+
+    def test_mean_and_variance(self):
+        """
+        Test mean and variance of wins come from the histogram
+        """
+        totals = aggregator.SeasonAggregator(["A", "B"], max_games=2, divisions={})
+        totals.add_records([[2, 0], [0, 2]], [[0, 2], [2, 0]], [[0, 0], [0, 0]])
+        self.assertEqual(totals.mean_wins().tolist(), [1.0, 1.0])
+        self.assertEqual(totals.variance_wins().tolist(), [1.0, 1.0])
+
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_compare_to_baselines(self):
+        """
+        Test only changes past the tolerance in the worse direction count as regressions
+        """
+        baselines = {"bulk_seasons_per_sec": 1000.0, "import_seconds": 0.1, "bulk_peak_bytes": 100}
+        results = {"bulk_seasons_per_sec": 700.0, "import_seconds": 0.05, "bulk_peak_bytes": 200, "new_seconds": 1.0}
+        regressions = benchmarks.compare_to_baselines(results, baselines, tolerance=0.25)
+        self.assertEqual([name for name, baseline, value in regressions], ["bulk_seasons_per_sec", "bulk_peak_bytes"])
+        self.assertEqual(benchmarks.compare_to_baselines(results, baselines, tolerance=1.0), [])
+
+    def test_synthetic_league(self):
+        """
+        Test the made-up league files load and every team plays once a week
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            offense_file, defense_file, schedule_file = benchmarks.write_synthetic_league(directory, 40, weeks=3)
+            teams = create_teams(offense_file, defense_file, cache=False)
+            self.assertEqual(len(teams), 40)
+            batch = monte_carlo.simulate_seasons(5, schedule_file, teams, seed=0)
+            self.assertTrue(((batch.wins + batch.losses + batch.ties) == 3).all())
+
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams and a temporary output directory
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_disabled_has_no_wrappers(self):
+        """
+        Test disabling puts the original functions back
+        """
+        original = FFHelper.get_weather
+        tracker = instrumentation.Instrumentation()
+        tracker.enable()
+        self.assertIsNot(FFHelper.get_weather, original)
+        tracker.disable()
+        self.assertIs(FFHelper.get_weather, original)
+
+    def test_season_report(self):
+        """
+        Test one instrumented season counts every game and weather draw
+        """
+        report_path = os.path.join(self.tmpdir.name, "report.json")
+        pstats_path = os.path.join(self.tmpdir.name, "profile.out")
+        with instrumentation.profiled(report_path, pstats_path, track_memory=True):
+            FFHelper.simulate_season(SCHEDULE_FILE, self.teams)
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual(report["games"], 272)
+        self.assertEqual(report["stages"]["get_weather"]["calls"], 272)
+        self.assertEqual(report["stages"]["simulate_season"]["calls"], 1)
+        self.assertGreater(report["games_per_sec"], 0)
+        self.assertGreater(report["peak_bytes"], 0)
+        self.assertTrue(os.path.getsize(pstats_path) > 0)
+
+    def test_bulk_report(self):
+        """
+        Test a sharded run is timed by stage and its games are counted once
+        """
+        original = monte_carlo.simulate_seasons
+        with instrumentation.profiled() as tracker:
+            self.assertIsNot(monte_carlo.simulate_seasons, original)
+            parallel.simulate_seasons_parallel(30, SCHEDULE_FILE, self.teams, seed=1, workers=1, shard_size=10)
+        self.assertIs(monte_carlo.simulate_seasons, original)
+        report = tracker.report()
+        self.assertEqual(report["games"], 30 * 272)
+        self.assertGreater(report["games_per_sec"], 0)
+        self.assertEqual(report["stages"]["parallel.simulate_seasons_parallel"]["calls"], 1)
+        self.assertEqual(report["stages"]["monte_carlo.simulate_seasons"]["calls"], 3)
+
+
+
+class TestBatchCli(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a temporary output directory and the file options for the 2023 data
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.files = ["--offense", OFFENSE_FILE, "--defense", DEFENSE_FILE]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_command(self, *argv):
+        """
+        Run FFHelper.main with an output file and return the file's contents
+        """
+        path = os.path.join(self.tmpdir.name, "out")
+        FFHelper.main(list(argv) + self.files + ["--output", path])
+        with open(path, newline="") as f:
+            return f.read()
+
+    def test_simulate_json(self):
+        """
+        Test the simulate summary is reproducible JSON covering every team
+        """
+        argv = ["simulate", "--schedule", SCHEDULE_FILE, "--seasons", "50", "--workers", "1", "--seed", "3", "--format", "json"]
+        first = json.loads(self.run_command(*argv))
+        self.assertEqual(first["seasons"], 50)
+        self.assertEqual(first["seed"], 3)
+        self.assertEqual(len(first["teams"]), 32)
+        self.assertEqual(sum(first["teams"]["Buffalo Bills"]["win_histogram"]), 50)
+        bills = first["teams"]["Buffalo Bills"]
+        self.assertEqual(len(bills["seeds"]), 7)
+        self.assertAlmostEqual(sum(bills["seeds"]), bills["playoffs"])
+        self.assertEqual(json.loads(self.run_command(*argv)), first)
+
+    def test_expect_csv(self):
+        """
+        Test the expect command writes one CSV row per team with the LSRL records
+        """
+        rows = list(csv.DictReader(self.run_command("expect", "--format", "csv").splitlines()))
+        self.assertEqual(len(rows), 32)
+        teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        row = next(row for row in rows if row["team"] == "Detroit Lions")
+        self.assertAlmostEqual(float(row["x_wins"]), teams["Detroit Lions"].x_wins)
+
+    def test_stats_json(self):
+        """
+        Test the stats command matches Team.to_dict
+        """
+        stats = json.loads(self.run_command("stats", "--format", "json"))
+        teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.assertEqual(stats[0], teams[stats[0]["name"]].to_dict())
+
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams and a results file with the first six weeks decided the opposite way of the model
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.results_file = os.path.join(self.tmpdir.name, "results.csv")
+        with open(self.results_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(checkpoint.RESULT_COLUMNS)
+            for result in simulate_season(SCHEDULE_FILE, self.teams, structured=True):
+                if result.week <= 6:
+                    home_won = result.outcome == "win2"
+                    writer.writerow([result.week, result.away, result.home, 13 if home_won else 27, 27 if home_won else 13])
+        reset_all_teams(self.teams)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_resume_matches_full_season(self):
+        """
+        Test resuming from a checkpoint of simulated weeks gives the same records as the full season
+        """
+        results = list(simulate_season(SCHEDULE_FILE, self.teams, structured=True))
+        full = checkpoint.SeasonCheckpoint.from_teams(self.teams, 18)
+        reset_all_teams(self.teams)
+        for result in results:
+            if result.week <= 9:
+                winner = {"win1": "away", "win2": "home"}.get(result.outcome)
+                checkpoint.apply_results(self.teams, [(result.week, result.away, result.home,
+                                                       1 if winner == "away" else 0, 1 if winner == "home" else 0)])
+        start = checkpoint.SeasonCheckpoint.from_teams(self.teams, 9)
+        rest = list(simulate_season(SCHEDULE_FILE, self.teams, structured=True, start_week=10))
+        #weather draws differ, the scores don't depend on them
+        self.assertEqual([result._replace(weather=None) for result in rest],
+                         [result._replace(weather=None) for result in results if result.week >= 10])
+        self.assertTrue(np.array_equal(checkpoint.SeasonCheckpoint.from_teams(self.teams, 18).wins, full.wins))
+        start.restore(self.teams)
+        self.assertEqual(self.teams["Detroit Lions"].current_wins, int(start.wins[start.team_names.index("Detroit Lions")]))
+
+    def test_results_checkpoint(self):
+        """
+        Test real results set the records and the vectorized and game by game engines agree from the checkpoint
+        """
+        start = checkpoint.checkpoint_from_results(self.teams, self.results_file, through_week=4)
+        self.assertEqual(start.week, 4)
+        games = self.teams["Buffalo Bills"].current_wins + self.teams["Buffalo Bills"].current_losses
+        self.assertEqual(games + self.teams["Buffalo Bills"].current_ties, 4)
+
+        batch = monte_carlo.simulate_seasons(3, SCHEDULE_FILE, self.teams, seed=0, checkpoint=start)
+        played = list(FFHelper.iter_seasons(1, SCHEDULE_FILE, self.teams, random.Random(0), start))
+        self.assertEqual(min(result.week for result in played), 5)
+        for name, team in self.teams.items():
+            t = batch.team_index(name)
+            self.assertEqual(int(batch.wins[0, t]), team.current_wins)
+            self.assertEqual(int(batch.losses[0, t]), team.current_losses)
+        self.assertEqual(batch.outcomes.shape[1], len(played))
+
+    def test_save_and_load(self):
+        """
+        Test a checkpoint survives a JSON round trip
+        """
+        start = checkpoint.checkpoint_from_results(self.teams, self.results_file)
+        path = os.path.join(self.tmpdir.name, "checkpoint.json")
+        start.save(path)
+        loaded = checkpoint.SeasonCheckpoint.load(path)
+        self.assertEqual(loaded.week, 6)
+        self.assertEqual(loaded.to_dict(), start.to_dict())
+
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+
+    def test_default_point_matches_simulator(self):
+        """
+        Test the default grid point reproduces the simulator and the LSRL expected wins
+        """
+        grid = sweep.parameter_grid(home_multiplier=[1.0, FFHelper.HOME_MULTIPLIER, 1.2], win_streak_bonus=[0, FFHelper.WIN_STREAK_BONUS])
+        self.assertEqual(len(grid), 6)
+        result = sweep.sweep(grid, SCHEDULE_FILE, self.teams, n=20, seed=0)
+        g = grid.index(sweep.DEFAULT_PARAMETERS)
+        batch = monte_carlo.simulate_seasons(20, SCHEDULE_FILE, self.teams, seed=0, keep_games=False)
+        self.assertTrue(np.allclose(result.mean_wins[g], batch.wins.mean(axis=0)))
+        self.assertTrue(np.allclose(result.x_wins[g], [team.x_wins for team in self.teams.values()]))
+        #dropping the home advantage changes some results
+        self.assertFalse(np.array_equal(result.mean_wins[0], result.mean_wins[g]))
+
+    def test_common_random_numbers(self):
+        """
+        Test grid points share the weather draws and chunking does not change the results
+        """
+        grid = sweep.parameter_grid(snow=[(1, 1), (0.5, 1.5), (1, 1)])
+        chunked = sweep.sweep(grid, SCHEDULE_FILE, self.teams, n=40, seed=5, weather_in_score=True, chunk_size=1)
+        together = sweep.sweep(grid, SCHEDULE_FILE, self.teams, n=40, seed=5, weather_in_score=True)
+        self.assertTrue(np.array_equal(chunked.mean_wins, together.mean_wins))
+        self.assertTrue(np.array_equal(together.mean_wins[0], together.mean_wins[2]))
+
+        #with every weather multiplier at 1 the weather draws change nothing
+        flat = sweep.parameter_grid(rain=[(1, 1)], snow=[(1, 1)], wind=[(1, 1)])
+        weathered = sweep.sweep(flat, SCHEDULE_FILE, self.teams, n=10, seed=1, weather_in_score=True)
+        plain = sweep.sweep(flat, SCHEDULE_FILE, self.teams, n=10, seed=1)
+        self.assertTrue(np.allclose(weathered.mean_wins, plain.mean_wins))
+
+    def test_best(self):
+        """
+        Test the sweep picks the regression line that reproduces target wins
+        """
+        grid = sweep.parameter_grid(x_wins_line=[(0.418, 8.5), (0.5, 8.0)])
+        result = sweep.sweep(grid, SCHEDULE_FILE, self.teams, n=1)
+        target = {name: 0.5 * team.net + 8.0 for name, team in self.teams.items()}
+        best, error = result.best(target, by="expected")
+        self.assertEqual(best.x_wins_line, (0.5, 8.0))
+        self.assertAlmostEqual(error, 0.0)
+        with self.assertRaises(TypeError):
+            sweep.parameter_grid(home_advantage=[1.1])
+
+
+
+class TestRegression(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up made-up team seasons that follow known lines plus noise
+        """
+        rng = np.random.default_rng(0)
+        off = rng.uniform(24, 86, 320)
+        de = rng.uniform(3, 11, 320)
+        points = 0.2 * off + 11 + rng.normal(0, 1, 320)
+        allowed = -1.3 * de + 31 + rng.normal(0, 1, 320)
+        net = (0.2 * off + 11) - (-1.3 * de + 31)
+        wins = 0.4 * net + 8.5 + rng.normal(0, 1, 320)
+        self.data = {"off": off, "de": de, "points_per_game": points, "points_allowed_per_game": allowed, "wins": wins}
+
+    def test_recovers_lines(self):
+        """
+        Test the refit finds the lines the data was made from, inside its bootstrap intervals
+        """
+        fit = regression.fit_lsrl(self.data, bootstrap=2000, seed=1)
+        self.assertAlmostEqual(fit.x_off_line[0], 0.2, delta=0.01)
+        self.assertAlmostEqual(fit.x_def_line[0], -1.3, delta=0.1)
+        self.assertAlmostEqual(fit.x_wins_line[0], 0.4, delta=0.05)
+        intervals = fit.confidence_intervals()
+        for name, slope in (("x_off_line", 0.2), ("x_def_line", -1.3), ("x_wins_line", 0.4)):
+            low, high = intervals[name][0]
+            self.assertTrue(low < slope < high)
+        self.assertEqual(fit.samples.shape, (2000, 3, 2))
+
+    def test_batched_matches_single_fits(self):
+        """
+        Test a batch of resamples fits the same lines as fitting each resample alone
+        """
+        rows = np.random.default_rng(2).integers(0, 320, size=(3, 320))
+        columns = [self.data[key] for key in ("off", "de", "points_per_game", "points_allowed_per_game", "wins")]
+        batched = regression.fit_lines(*(column[rows] for column in columns))
+        for b in range(3):
+            self.assertTrue(np.allclose(batched[b], regression.fit_lines(*(column[rows[b]] for column in columns))))
+
+    def test_apply_to_teams(self):
+        """
+        Test fitted lines feed back into Team and a season's files load with their records
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            records_file = os.path.join(directory, "records.csv")
+            teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+            with open(records_file, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(regression.RECORD_COLUMNS)
+                for name, team in teams.items():
+                    writer.writerow([name, round(team.x_wins), 17 - round(team.x_wins), 0])
+            data = regression.load_seasons([(OFFENSE_FILE, DEFENSE_FILE, records_file)])
+        self.assertEqual(len(data["wins"]), 32)
+        fit = regression.fit_lsrl(data, bootstrap=0)
+        fit.apply(teams)
+        team = teams["Detroit Lions"]
+        net = (fit.x_off_line[0] * team.off + fit.x_off_line[1]) - (fit.x_def_line[0] * team.de + fit.x_def_line[1])
+        self.assertAlmostEqual(team.x_wins, fit.x_wins_line[0] * net + fit.x_wins_line[1])
+        with self.assertRaises(ValueError):
+            fit.confidence_intervals()
+
+
+
+class TestMatchups(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+
+    def test_matches_play_game(self):
+        """
+        Test the index gives the scores play_game computed from the stats for every pair
+        """
+        index = matchups.MatchupIndex(self.teams)
+        loose = {name: Team(name, {"GP": 17, "All": team.off, "Run": team.plays_per_game, "Pass": 0},
+                            {"DEF": team.de, "QB": team.offensive_production_allowed}) for name, team in self.teams.items()}
+        for home in ("Buffalo Bills", "Detroit Lions"):
+            for away in self.teams:
+                if away == home:
+                    continue
+                #teams on separate tables take the unindexed path
+                _, away_score, home_score, _ = FFHelper.play_game(loose[away], loose[home])
+                self.assertEqual(index.scores(home, away, "Snow"), (home_score, away_score))
+                self.assertEqual(FFHelper.play_game(self.teams[away], self.teams[home])[1:3], (away_score, home_score))
+
+    def test_rebuilt_when_stats_change(self):
+        """
+        Test the table's index is cached and rebuilt after a stat changes
+        """
+        table = self.teams["Detroit Lions"].table
+        index = table.matchups()
+        self.assertIs(table.matchups(), index)
+        self.teams["Detroit Lions"].de += 5
+        rebuilt = table.matchups()
+        self.assertIsNot(rebuilt, index)
+        self.assertGreater(rebuilt.scores("Detroit Lions", "Chicago Bears")[0], index.scores("Detroit Lions", "Chicago Bears")[0])
+
+    def test_predict_and_weather(self):
+        """
+        Test ad-hoc predictions and weather-adjusted scores
+        """
+        index = matchups.MatchupIndex(self.teams)
+        home_score, away_score, winner = index.predict("Buffalo Bills", "Miami Dolphins", "Snow", home_streak=2)
+        self.assertEqual(winner, "Buffalo Bills" if home_score > away_score else "Miami Dolphins")
+        weathered = matchups.MatchupIndex(self.teams, weather_in_score=True)
+        bills, dolphins = self.teams["Buffalo Bills"], self.teams["Miami Dolphins"]
+        efficiency, net_production = FFHelper.apply_weather_effects("Snow", dolphins)
+        self.assertAlmostEqual(weathered.scores("Buffalo Bills", "Miami Dolphins", "Snow")[1],
+                               efficiency + (net_production - bills.offensive_production_allowed))
+
+
+
+class TestService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Start one service over the 2023 files
+        """
+        cls.service = service.SimulationService(OFFENSE_FILE, DEFENSE_FILE, SCHEDULE_FILE, cache_size=4, workers=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+
+    def test_coalesce_and_cache(self):
+        """
+        Test identical queries in flight share one simulation and later ones come from the cache
+        """
+        params = {"seasons": 30, "seed": 11}
+
+        async def run():
+            first, second = await asyncio.gather(self.service.query("simulate", params), self.service.query("simulate", params))
+            third = await self.service.query("simulate", params)
+            return first, second, third
+
+        coalesced, hits = self.service.coalesced, self.service.cache.hits
+        first, second, third = asyncio.run(run())
+        self.assertIs(first, second)
+        self.assertIs(first, third)
+        self.assertEqual(self.service.coalesced, coalesced + 1)
+        self.assertEqual(self.service.cache.hits, hits + 1)
+        self.assertEqual(first["seasons"], 30)
+        self.assertEqual(len(first["teams"]), 32)
+
+    def test_typed_and_unseeded_queries(self):
+        """
+        Test query string numbers share the cache key of JSON numbers and unseeded simulations are never cached
+        """
+        async def run():
+            posted = await self.service.query("simulate", {"seasons": 20, "seed": 12})
+            hits = self.service.cache.hits
+            got = await self.service.query("simulate", {"seasons": "20", "seed": "12"})
+            self.assertEqual(self.service.cache.hits, hits + 1)
+            self.assertIs(got, posted)
+            first = await self.service.query("simulate", {"seasons": "20"})
+            second = await self.service.query("simulate", {"seasons": "20"})
+            return first, second
+
+        cached = len(self.service.cache)
+        first, second = asyncio.run(run())
+        self.assertNotEqual(first["seed"], second["seed"])
+        self.assertEqual(len(self.service.cache), min(cached + 1, self.service.cache.max_size))
+        with self.assertRaises(service.BadRequest):
+            asyncio.run(self.service.query("simulate", {"seasons": "many"}))
+
+    def test_results_directory(self):
+        """
+        Test results files are only read from the configured directory, by plain name
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "week6.csv"), "w") as f:
+                f.write("Week,Team1,Team2,Outcome\n")
+            restricted = service.SimulationService(OFFENSE_FILE, DEFENSE_FILE, SCHEDULE_FILE, cache_size=0, workers=1,
+                                                   results_dir=directory)
+            try:
+                self.assertEqual(restricted.results_path("week6.csv"), os.path.realpath(os.path.join(directory, "week6.csv")))
+                for name in (os.path.abspath(OFFENSE_FILE), "../week6.csv", "missing.csv", "sub/../week6.csv"):
+                    with self.assertRaises(service.BadRequest) as raised:
+                        asyncio.run(restricted.query("simulate", {"seasons": 2, "seed": 1, "results": name}))
+                    self.assertEqual(str(raised.exception), f"Unknown results file: {name}")
+            finally:
+                restricted.close()
+        with self.assertRaises(service.BadRequest):
+            asyncio.run(self.service.query("simulate", {"seasons": 2, "seed": 1, "results": os.path.abspath(OFFENSE_FILE)}))
+
+    def test_lru_eviction(self):
+        """
+        Test the cache drops the least recently used result
+        """
+        cache = service.ResultCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(list(cache.entries), ["a", "c"])
+
+    def test_http(self):
+        """
+        Test queries over HTTP, including errors
+        """
+        async def request(port, target, body=b"", length=None):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            method = "POST" if body else "GET"
+            length = len(body) if length is None else length
+            writer.write(f"{method} {target} HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n".encode() + body)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            head, _, payload = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), json.loads(payload)
+
+        async def run():
+            server = await asyncio.start_server(self.service.handle_http, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return [await request(port, "/stats?team=Detroit%20Lions"),
+                        await request(port, "/matchup", json.dumps({"home": "Buffalo Bills", "away": "Miami Dolphins", "weather": "Snow"}).encode()),
+                        await request(port, "/matchup?home=Nowhere&away=Miami%20Dolphins"),
+                        await request(port, "/simulate?seasons=5&bogus=1"),
+                        await request(port, "/nothing"),
+                        await request(port, "/stats", length="ten"),
+                        await request(port, "/stats", length=-5)]
+
+        stats, matchup, unknown_team, bad_param, missing, bad_length, negative_length = asyncio.run(run())
+        self.assertEqual(stats, (200, self.service.teams["Detroit Lions"].to_dict()))
+        self.assertEqual(matchup[0], 200)
+        self.assertIn(matchup[1]["winner"], ("Buffalo Bills", "Miami Dolphins"))
+        self.assertEqual(unknown_team[0], 400)
+        self.assertEqual(bad_param[0], 400)
+        self.assertEqual(missing[0], 404)
+        self.assertEqual(bad_length[0], 400)
+        self.assertEqual(negative_length[0], 400)
+
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up an empty cache directory and copies of the 2023 files that can be edited
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = result_cache.SimulationCache(os.path.join(self.tmpdir.name, "results"))
+        self.files = []
+        for path in (OFFENSE_FILE, DEFENSE_FILE, SCHEDULE_FILE):
+            copy = os.path.join(self.tmpdir.name, os.path.basename(path))
+            with open(path, "rb") as source, open(copy, "wb") as target:
+                target.write(source.read())
+            self.files.append(copy)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hit_after_miss(self):
+        """
+        Test a repeated seeded run is read back with the same counts
+        """
+        first, hit = result_cache.simulate_cached(*self.files, 40, 3, workers=1, cache=self.cache)
+        self.assertFalse(hit)
+        second, hit = result_cache.simulate_cached(*self.files, 40, 3, workers=1, cache=self.cache)
+        self.assertTrue(hit)
+        self.assertEqual(second.summary(), first.summary())
+        self.assertEqual(second.seed, 3)
+        _, hit = result_cache.simulate_cached(*self.files, 40, 4, workers=1, cache=self.cache)
+        self.assertFalse(hit)
+
+    def test_changed_inputs_miss(self):
+        """
+        Test editing an input changes the address of the run and the shard size doesn't
+        """
+        teams = create_teams(self.files[0], self.files[1], cache=False)
+        key = self.cache.key(teams, self.files[2], 40, 3)
+        first, _ = result_cache.simulate_cached(*self.files, 40, 3, teams, workers=1, shard_size=7, cache=self.cache)
+        second, hit = result_cache.simulate_cached(*self.files, 40, 3, teams, workers=1, shard_size=40, cache=self.cache)
+        self.assertTrue(hit)
+        self.assertEqual(second.summary(), first.summary())
+
+        with open(self.files[1], newline="") as f:
+            text = f.read()
+        with open(self.files[1], "w", newline="") as f:
+            f.write(text.replace('"Dallas Cowboys","17","18.5","10.6","15.2"', '"Dallas Cowboys","17","18.5","10.6","25.2"'))
+        self.assertNotEqual(self.cache.key(create_teams(self.files[0], self.files[1], cache=False), self.files[2], 40, 3), key)
+        #teams that didn't come from the files are addressed by their own stats
+        renamed = dict(zip(reversed(list(teams)), teams.values()))
+        self.assertNotEqual(self.cache.key(renamed, self.files[2], 40, 3), key)
+        _, hit = result_cache.simulate_cached(*self.files, 40, 3, renamed, workers=1, cache=self.cache)
+        self.assertFalse(hit)
+        self.cache.clear()
+        _, hit = result_cache.simulate_cached(*self.files, 10, None, workers=1, cache=self.cache)
+        self.assertFalse(hit)
+        self.assertEqual(len(self.cache.entries()), 0)
+
+    def test_eviction(self):
+        """
+        Test the least recently used entries are deleted past the size cap
+        """
+        for seed in range(3):
+            result_cache.simulate_cached(*self.files, 5, seed, workers=1, cache=self.cache)
+        entry_size = self.cache.entries()[0][1]
+        oldest = self.cache.entries()[0][2]
+        self.cache.max_bytes = 2 * entry_size + entry_size // 2
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertFalse(os.path.exists(oldest))
+        self.assertEqual(len(self.cache.entries()), 2)
+
+
+
+class TestLeague(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a temporary directory for made-up leagues
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_shipped_league(self):
+        """
+        Test the shipped config has every 2023 team in the NFL's conferences and divisions
+        """
+        nfl = league.load_league()
+        self.assertEqual(nfl.season_games, 17)
+        self.assertEqual(nfl.playoff_teams, 7)
+        self.assertEqual(list(nfl.conferences), ["AFC", "NFC"])
+        self.assertEqual(len(nfl.divisions), 8)
+        self.assertEqual(league.conference_of("NFC West"), "NFC")
+        teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.assertEqual(sorted(nfl.conference_teams("AFC") + nfl.conference_teams("NFC")), sorted(teams))
+        self.assertEqual(set(weather.load_stadium_weather(nfl.stadium_weather)), set(teams))
+
+    def test_top_teams(self):
+        """
+        Test the partial sort keeps the order of a full sort, ties included
+        """
+        values = [random.Random(4).randint(0, 5) for _ in range(50)]
+        items = list(enumerate(values))
+        full = FFHelper.top_teams(items, lambda item: item[1])
+        self.assertEqual(full, sorted(items, key=lambda item: item[1], reverse=True))
+        for top in (0, 1, 7, 50, 80):
+            self.assertEqual(FFHelper.top_teams(items, lambda item: item[1], top), full[:top])
+
+    def test_print_team_records(self):
+        """
+        Test the records are printed per conference and cut to the best teams
+        """
+        teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        simulate_season(SCHEDULE_FILE, teams)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            FFHelper.print_team_records(teams, top=3)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "AFC Teams:")
+        self.assertEqual(lines[5], "NFC Teams:")
+        self.assertEqual(len(lines), 10)
+        wins = [int(line.split("Wins: ")[1].split(",")[0]) for line in lines[1:4]]
+        self.assertEqual(wins, sorted(wins, reverse=True))
+
+    def test_synthetic_league(self):
+        """
+        Test a made-up league's files load and group its teams by the written config
+        """
+        paths = synthetic.write_league(self.tmpdir.name, 42, weeks=3, seed=1)
+        made_up = league.load_league(paths.league_file)
+        self.assertEqual(made_up.season_games, 3)
+        self.assertEqual(len(made_up.conferences), 3)
+        self.assertEqual(len(made_up.divisions), 11)
+        teams = create_teams(paths.offense_file, paths.defense_file, cache=False)
+        self.assertEqual(sorted(made_up.divisions["Conference 3 Division 3"]), ["Team 00040", "Team 00041"])
+        self.assertEqual(set(weather.load_stadium_weather(made_up.stadium_weather)), set(teams))
+        #positional production differs by team and adds up to the team's total
+        self.assertGreater(len({team.rb_production for team in teams.values()}), 1)
+        for team in teams.values():
+            self.assertAlmostEqual(team.off, team.qb_production + team.rb_production + team.wr_production + team.te_production,
+                                   delta=0.06)
+
+        names = list(teams)
+        divisions, conferences = league.group_indices(names, made_up.divisions, made_up.division_conferences)
+        self.assertEqual(sorted(len(rows) for rows in conferences.values()), [10, 16, 16])
+        batch = monte_carlo.simulate_seasons(4, paths.schedule_file, teams, seed=0)
+        self.assertTrue(((batch.wins + batch.losses + batch.ties) == 3).all())
+
+        totals = aggregator.SeasonAggregator(names, 3, made_up.divisions, made_up.playoff_teams,
+                                             made_up.division_conferences)
+        totals.add_batch(batch)
+        path = os.path.join(self.tmpdir.name, "totals.npz")
+        totals.save(path)
+        self.assertEqual(aggregator.SeasonAggregator.load(path).conferences, totals.conferences)
+        self.assertEqual(aggregator.SeasonAggregator.load(path).summary(), totals.summary())
+
+    def test_large_synthetic_league(self):
+        """
+        Test a made-up league with more teams than an int16 index holds compiles, simulates and tallies
+        """
+        paths = synthetic.write_league(self.tmpdir.name, 33000, weeks=1, seed=2)
+        made_up = league.load_league(paths.league_file)
+        teams = create_teams(paths.offense_file, paths.defense_file, cache=False)
+        names = list(teams)
+        week, away, home = monte_carlo.schedule_arrays(paths.schedule_file, names)
+        self.assertEqual(len(week), 16500)
+        self.assertGreater(max(away.max(), home.max()), np.iinfo(np.int16).max)
+        self.assertEqual(sorted(np.concatenate([away, home]).tolist()), list(range(33000)))
+
+        batch = monte_carlo.simulate_seasons(2, paths.schedule_file, teams, seed=0)
+        self.assertTrue(((batch.wins + batch.losses + batch.ties) == 1).all())
+        totals = aggregator.SeasonAggregator(names, 1, made_up.divisions, made_up.playoff_teams,
+                                             made_up.division_conferences)
+        totals.add_batch(batch)
+        self.assertEqual(totals.seasons, 2)
+        self.assertEqual(len(totals.summary()), 33000)
+
+
+
+class TestStandings(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a made-up league: East (0, 3) and West (2, 1) in C1, North (4, 5) in C2
+        """
+        self.divisions = {"C1 East": ["T0", "T3"], "C1 West": ["T2", "T1"], "C2 North": ["T4", "T5"]}
+        self.names = ["T0", "T1", "T2", "T3", "T4", "T5"]
+        self.division_groups, self.conference_groups = league.group_indices(self.names, self.divisions)
+
+    def rank(self, games, playoff_teams=3):
+        """
+        Rank one season of (away, home, outcome) games
+        """
+        away = np.array([game[0] for game in games])
+        home = np.array([game[1] for game in games])
+        outcomes = np.array([[game[2] for game in games]], dtype=np.int8)
+        wins, losses, ties = (np.zeros((1, len(self.names)), dtype=np.int16) for _ in range(3))
+        for a, h, outcome in games:
+            winner, loser = (a, h) if outcome == monte_carlo.WIN1 else (h, a)
+            wins[0, winner] += 1
+            losses[0, loser] += 1
+        return standings.rank_standings(wins, losses, ties, away, home, outcomes, self.division_groups,
+                                        self.conference_groups, playoff_teams)
+
+    def test_tiebreakers(self):
+        """
+        Test head-to-head decides a division and conference record a wild card
+        """
+        win1, win2 = monte_carlo.WIN1, monte_carlo.WIN2
+        games = [(0, 3, win1), (2, 1, win1), (3, 4, win1), (1, 5, win1), (3, 2, win1), (1, 4, win1), (2, 4, win1)]
+        division_rank, conference_rank, seeds = self.rank(games)
+        #T2 and T1 are 2-1, T2 won their game
+        self.assertEqual(division_rank[0, 2], 0)
+        self.assertEqual(division_rank[0, 1], 1)
+        #T3 and T1 are 2-1 and never met, T3 went 1-1 in the conference and T1 0-1
+        self.assertEqual(seeds[0, [0, 2, 3, 1]].tolist(), [1, 2, 3, 0])
+        #the three 2-1 teams of C1 didn't all meet and none beat both others, so conference record drops T1
+        #and strength of schedule puts T3 ahead of T2
+        self.assertEqual(conference_rank[0, [0, 3, 2, 1]].tolist(), [0, 1, 2, 3])
+
+    def test_three_team_head_to_head(self):
+        """
+        Test head-to-head among three tied teams only counts for a sweep or when all of them met
+        """
+        win1, win2, not_played = monte_carlo.WIN1, monte_carlo.WIN2, monte_carlo.NOT_PLAYED
+        away, home = np.array([0, 0, 1, 2]), np.array([1, 2, 2, 3])
+        outcomes = np.array([
+            [win1, not_played, not_played, win1], #T0 beat T1, T2 met neither
+            [win1, win1, not_played, win1], #T0 beat both, T1 and T2 never met
+            [win1, win1, win1, win2], #everyone met
+        ], dtype=np.int8)
+        pct = np.array([[0.5, 0.5, 0.5, 0.2]] * 3)
+        records = standings.GameRecords(away, home, outcomes, pct)
+        head_to_head = records.head_to_head(np.zeros(4, dtype=np.intp))
+        self.assertEqual(head_to_head[:, :3].tolist(), [[0.5, 0.5, 0.5], [1.0, 0.5, 0.5], [1.0, 0.5, 0.0]])
+
+    def test_division_order_in_wild_cards(self):
+        """
+        Test tied wild cards of the same division keep their division order
+        """
+        self.divisions["C1 East"] = ["T0", "T3", "T4"]
+        self.divisions["C2 North"] = ["T5"]
+        self.names = ["T0", "T1", "T2", "T3", "T4", "T5"]
+        self.division_groups, self.conference_groups = league.group_indices(self.names, self.divisions)
+        win1, win2 = monte_carlo.WIN1, monte_carlo.WIN2
+        #T3 and T4 are 1-1, T4 won their game, T1 loses its only game
+        games = [(0, 3, win1), (0, 4, win1), (3, 4, win2), (3, 5, win1), (4, 5, win1), (2, 1, win1)]
+        division_rank, _, seeds = self.rank(games, playoff_teams=3)
+        self.assertEqual(division_rank[0, [0, 4, 3]].tolist(), [0, 1, 2])
+        self.assertEqual(seeds[0, 4], 3)
+        self.assertEqual(seeds[0, 3], 0)
+
+    def test_random_seasons(self):
+        """
+        Test every season of random results gets full, record-ordered standings, ranked once per distinct season
+        """
+        teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        names = list(teams.keys())
+        week, away, home = monte_carlo.schedule_arrays(SCHEDULE_FILE, names)
+        rng = np.random.default_rng(2)
+        outcomes = rng.choice(np.array([monte_carlo.WIN1, monte_carlo.WIN2, monte_carlo.TIE], dtype=np.int8),
+                              p=[0.49, 0.49, 0.02], size=(50, len(away)))
+        outcomes = np.concatenate([outcomes, outcomes[:5]])
+        records = [np.zeros((len(outcomes), len(names)), dtype=np.int16) for _ in range(3)]
+        for side, other in ((away, home), (home, away)):
+            won = outcomes == (monte_carlo.WIN1 if side is away else monte_carlo.WIN2)
+            lost = outcomes == (monte_carlo.WIN2 if side is away else monte_carlo.WIN1)
+            for g in range(len(away)):
+                records[0][:, side[g]] += won[:, g]
+                records[1][:, side[g]] += lost[:, g]
+                records[2][:, side[g]] += outcomes[:, g] == monte_carlo.TIE
+        division_groups, conference_groups = league.group_indices(names)
+        division_rank, conference_rank, seeds = standings.rank_standings(*records, away, home, outcomes,
+                                                                         division_groups, conference_groups)
+        self.assertEqual(np.bincount(seeds.ravel()).tolist(), [18 * 55] + [2 * 55] * 7)
+        self.assertTrue((division_rank[50:] == division_rank[:5]).all())
+        pct = aggregator.win_percentage(*records)
+        for rows in division_groups.values():
+            better = pct[:, rows, None] > pct[:, None, rows]
+            ahead = division_rank[:, rows, None] < division_rank[:, None, rows]
+            self.assertTrue((ahead | ~better).all())
+        single = standings.rank_standings(*(values[7:8] for values in records), away, home, outcomes[7:8],
+                                          division_groups, conference_groups)
+        self.assertTrue((single[2] == seeds[7:8]).all())
+
+    def test_print_playoff_seeds(self):
+        """
+        Test a simulated season prints 7 seeds per conference, the same-record Saints ahead of the Packers they beat
+        """
+        teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        results = list(simulate_season(SCHEDULE_FILE, teams, structured=True))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            FFHelper.print_playoff_seeds(teams, results)
+        lines = output.getvalue().splitlines()
+        self.assertEqual([line for line in lines if line.endswith("Seeds:")], ["AFC Playoff Seeds:", "NFC Playoff Seeds:"])
+        self.assertEqual(len(lines), 18)
+        ranks = standings.season_standings(teams, results)
+        self.assertLess(ranks["New Orleans Saints"]["seed"], ranks["Green Bay Packers"]["seed"])
+
+
+
+class TestOutcomeStore(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams and a directory for the store
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_pack_round_trip(self):
+        """
+        Test 2-bit codes come back unchanged, including a season count that doesn't fill the last byte
+        """
+        codes = np.random.default_rng(0).integers(0, 4, (11, 5))
+        packed = outcome_store.pack(codes)
+        self.assertEqual(packed.shape, (5, 3))
+        for game in range(5):
+            self.assertTrue((outcome_store.unpack(packed[game], 11) == codes[:, game]).all())
+
+    def test_matches_simulation(self):
+        """
+        Test the store holds the same games and records as the shards it was built from, and conditions select the right seasons
+        """
+        store = outcome_store.build_store(self.tmpdir.name, 70, SCHEDULE_FILE, self.teams, seed=4, workers=1, shard_size=32)
+        self.assertEqual(len(store), 70)
+        parallel.init_worker(self.teams, monte_carlo.schedule_arrays(SCHEDULE_FILE, list(self.teams)))
+        batch = parallel.simulate_shard(4, 32, 32, keep_games=True)
+        seasons = slice(32, 64)
+        game = store.game("Buffalo Bills", 14)
+        self.assertIn(store.team("Buffalo Bills"), (store.away[game], store.home[game]))
+        self.assertTrue((store.outcomes(game)[seasons] == batch.outcomes[:, game]).all())
+        self.assertTrue((store.weather(game)[seasons] == batch.weather[:, game]).all())
+        self.assertTrue((store.column("wins", "Buffalo Bills")[seasons] == batch.wins[:, batch.team_index("Buffalo Bills")]).all())
+
+        snow = store.where([("Buffalo Bills", 14, "Snow")])
+        self.assertEqual(snow.sum(), (store.weather(game) == weather.WEATHER_TYPES.index("Snow")).sum())
+        won = store.condition("Buffalo Bills", 14, "win")
+        self.assertTrue((won | store.condition("Buffalo Bills", 14, "loss") | store.condition("Buffalo Bills", 14, "tie")).all())
+        result = store.query("Buffalo Bills", [("Buffalo Bills", 14, "win" if won[0] else "loss")])
+        self.assertEqual(result["seasons"], 70)
+        self.assertEqual(sum(result["win_histogram"]), 70)
+        self.assertAlmostEqual(sum(result["seed_probabilities"]), result["playoffs"])
+        self.assertEqual(store.query("Buffalo Bills", [("Buffalo Bills", 14, "tie" if won[0] else "win")])["seasons"], 0)
+        with self.assertRaises(ValueError):
+            store.condition("Buffalo Bills", 14, "Hail")
+
+
+
+class TestSeasonStore(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a directory with the 2023 files copied as three seasons, the oldest without a schedule
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for year in (2021, 2022, 2023):
+            sources = [OFFENSE_FILE, DEFENSE_FILE] + ([SCHEDULE_FILE] if year > 2021 else [])
+            for path in sources:
+                with open(path, "rb") as source, open(os.path.join(self.tmpdir.name, os.path.basename(path).replace("2023", str(year))), "wb") as target:
+                    target.write(source.read())
+        with open(os.path.join(self.tmpdir.name, "notes.csv"), "w") as f:
+            f.write("not a season\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_discover_and_load(self):
+        """
+        Test every season is found and parsed into compact columns with percentages as numbers
+        """
+        self.assertEqual(list(season_store.discover_seasons(self.tmpdir.name)), [2021, 2022, 2023])
+        store = season_store.load_seasons(self.tmpdir.name, workers=2)
+        self.assertEqual(store.seasons, [2021, 2022, 2023])
+        self.assertEqual(len(store), 96)
+        self.assertEqual(len(store.team_names), 32)
+        self.assertEqual(sorted(store.schedules), [2022, 2023])
+        self.assertEqual(store.column("GP").dtype, np.uint8)
+        self.assertEqual(store.column("Run%").dtype, np.float32)
+        stats = store.stats(2022, "San Francisco 49ers")
+        self.assertEqual((stats["Run%"], stats["Pass%"], stats["All"], stats["Plays"]), (48.7, 51.3, 85.8, 60.2))
+        self.assertEqual(stats["QB Allowed"], 15.2)
+        self.assertEqual(len(store.column("PTS", 2023)), 32)
+        with self.assertRaises(KeyError):
+            store.row(2020, "San Francisco 49ers")
+
+    def test_teams_and_schedule_match_files(self):
+        """
+        Test a stored season builds the same teams and schedule as reading its files directly
+        """
+        store = season_store.load_seasons(self.tmpdir.name)
+        teams = store.teams(2023)
+        expected = create_teams(OFFENSE_FILE, DEFENSE_FILE, cache=False)
+        self.assertEqual(list(teams), list(expected))
+        for name, team in expected.items():
+            self.assertEqual(teams[name].x_wins, team.x_wins)
+            self.assertEqual(teams[name].calculate_net_production(), team.calculate_net_production())
+        for stored, read in zip(store.schedule(2022), monte_carlo.schedule_arrays(SCHEDULE_FILE, list(expected))):
+            self.assertEqual(stored.tolist(), read.tolist())
+
+
+
+class TestAdaptive(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams for testing
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.names = list(self.teams.keys())
+
+    def test_standard_errors(self):
+        """
+        Test the errors of expected wins and playoff odds shrink with the square root of the seasons
+        """
+        wins = np.random.default_rng(0).integers(0, 18, (400, 32))
+        totals = aggregator.SeasonAggregator(self.names)
+        totals.add_records(wins, 17 - wins, np.zeros_like(wins))
+        wins_error, playoff_error = adaptive.standard_errors(totals)
+        self.assertTrue(np.allclose(wins_error, np.sqrt(totals.variance_wins() / 400)))
+        p = (totals.seed_counts[:, 1:].sum(axis=1) + 1) / 402
+        self.assertTrue(np.allclose(playoff_error, np.sqrt(p * (1 - p) / 400)))
+        self.assertTrue((playoff_error > 0).all())
+
+    def test_stops_when_precise(self):
+        """
+        Test a run stops at the first check once the tracked odds are precise enough
+        """
+        totals, report = adaptive.simulate_adaptive(SCHEDULE_FILE, self.teams, seed=2, min_seasons=500, tracked=["Buffalo Bills"])
+        self.assertEqual((report["stopped"], report["seasons"], totals.seasons), (adaptive.CONVERGED, 500, 500))
+        self.assertEqual(list(report["teams"]), ["Buffalo Bills"])
+        self.assertLessEqual(report["max_playoff_error"], report["playoff_tolerance"])
+
+    def test_budgets(self):
+        """
+        Test unreachable tolerances stop on the season or time budget, with the seasons a fixed run would simulate
+        """
+        totals, report = adaptive.simulate_adaptive(SCHEDULE_FILE, self.teams, playoff_tolerance=0, max_seasons=1300,
+                                                    seed=6, min_seasons=300, batch_size=200, workers=2)
+        self.assertEqual((report["stopped"], report["seasons"]), (adaptive.SEASON_BUDGET, 1300))
+        self.assertFalse(report["converged"])
+        fixed = parallel.simulate_seasons_parallel(1300, SCHEDULE_FILE, self.teams, seed=6, workers=1,
+                                                   tally_class=aggregator.SeasonAggregator)
+        self.assertTrue((totals.win_counts == fixed.win_counts).all())
+        self.assertTrue((totals.seed_counts == fixed.seed_counts).all())
+        _, report = adaptive.simulate_adaptive(SCHEDULE_FILE, self.teams, playoff_tolerance=0, max_seconds=0, seed=6, min_seasons=100)
+        self.assertEqual((report["stopped"], report["seasons"]), (adaptive.TIME_BUDGET, 100))
+
+
+
+class TestPositional(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the 2023 teams and their positional matchup index
+        """
+        self.teams = create_teams(OFFENSE_FILE, DEFENSE_FILE)
+        self.index = positional.positional_index(self.teams, SCHEDULE_FILE)
+
+    def test_positional_stats_loaded(self):
+        """
+        Test teams keep the per-position production and production allowed from the files
+        """
+        niners = self.teams["San Francisco 49ers"]
+        self.assertEqual((niners.qb_production, niners.rb_production, niners.wr_production, niners.te_production),
+                         (18, 28.1, 29.6, 10))
+        self.assertEqual((niners.qb_allowed, niners.rb_allowed, niners.wr_allowed, niners.te_allowed), (15.2, 15.8, 27.7, 8.4))
+        self.assertAlmostEqual(niners.offensive_production_allowed, 15.2 + 15.8 + 27.7 + 8.4)
+
+    def test_matchup_values(self):
+        """
+        Test an expected output is the team's production times the opponent's allowed share and the home stadium's weather
+        """
+        game = self.index.matchup("Buffalo Bills", 7)
+        self.assertEqual((game["opponent"], game["home"]), ("New England Patriots", False))
+        bills, patriots = self.teams["Buffalo Bills"], self.teams["New England Patriots"]
+        average = np.mean([team.rb_allowed for team in self.teams.values()])
+        profile = weather.load_stadium_weather()["New England Patriots"]
+        self.assertEqual(positional.POSITION_WEATHER_EFFECTS["Snow"], (FFHelper.WEATHER_EFFECTS["Snow"][0],) * 4)
+        climate = sum(profile[w] * FFHelper.WEATHER_EFFECTS[w][0] for w in weather.WEATHER_TYPES) / sum(profile.values())
+        self.assertAlmostEqual(game["expected"]["RB"], bills.rb_production * patriots.rb_allowed / average * climate)
+        byes = [week for week in range(1, 19) if self.index.matchup("Buffalo Bills", week)["opponent"] is None]
+        self.assertEqual(len(byes), 1)
+        self.assertTrue(np.isnan(self.index.matchup("Buffalo Bills", byes[0])["expected"]["QB"]))
+
+    def test_queries(self):
+        """
+        Test the weekly ranking and strength of schedule are sorted lookups over the teams playing
+        """
+        best = self.index.best_matchups("rb", 9)
+        self.assertEqual(len(best), np.count_nonzero(self.index.opponent[8] >= 0))
+        self.assertEqual([row["expected"] for row in best], sorted((row["expected"] for row in best), reverse=True))
+        self.assertEqual(len(self.index.best_matchups("RB", 9, top=3)), 3)
+        sos = self.index.strength_of_schedule("QB", 14, 17)
+        self.assertEqual(len(sos), 32)
+        self.assertTrue(all(1 <= row["games"] <= 4 for row in sos))
+        self.assertEqual([row["factor"] for row in sos], sorted((row["factor"] for row in sos), reverse=True))
+        with self.assertRaises(ValueError):
+            self.index.best_matchups("K", 9)
+        with self.assertRaises(ValueError):
+            self.index.strength_of_schedule("QB", 14, 30)
+
+    def test_cached_per_schedule(self):
+        """
+        Test the index is reused for the same schedule and stats and rebuilt after a stat changes
+        """
+        self.assertIs(positional.positional_index(self.teams, SCHEDULE_FILE), self.index)
+        self.teams["Buffalo Bills"].rb_production = 40
+        rebuilt = positional.positional_index(self.teams, SCHEDULE_FILE)
+        self.assertIsNot(rebuilt, self.index)
+        self.assertEqual(rebuilt.production[rebuilt.team_index["Buffalo Bills"], 1], 40)
+
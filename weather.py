@@ -0,0 +1,195 @@
+#import csv to read the stadium climate file, random for single draws
+#numpy is only imported for batched draws, so single draws stay cheap to import
+import csv
+import os
+import random
+
+#weather states in the order used for encoded weather draws
+WEATHER_TYPES = ("Clear", "Rain", "Snow", "Wind")
+
+#stadium climate profiles shipped next to this script
+STADIUM_WEATHER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Stadium Weather.csv")
+
+
+def load_stadium_weather(weather_file=STADIUM_WEATHER_FILE):
+    """
+    Read the weather probabilities of every home stadium
+
+    args:
+    weather_file: path to a csv with a Name column and one column per weather type
+
+    return:
+    dictionary keyed by team name of {weather: probability} dictionaries
+    """
+    stadium_weather = {}
+    with open(weather_file, newline="") as f:
+        for row in csv.DictReader(f):
+            stadium_weather[row["Name"]] = {weather: float(row.get(weather) or 0) for weather in WEATHER_TYPES}
+    return stadium_weather
+
+
+
+def build_alias_table(probs):
+    """
+    Build a Vose alias table for one discrete distribution
+
+    args:
+    probs: list of probabilities (they are normalized here)
+
+    return:
+    probability and alias lists as a tuple
+    """
+    k = len(probs)
+    total = sum(probs)
+    scaled = [p * k / total for p in probs]
+    prob = [1.0] * k
+    alias = list(range(k))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+    #leftovers only differ from 1 by rounding error
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+
+
+class WeatherSampler:
+    """
+    This class draws game weather from precomputed alias tables, one per home stadium
+    """
+
+    def __init__(self, stadium_weather):
+        """
+        Initialize the sampler, building every stadium's alias table once.
+
+        args:
+        stadium_weather: dictionary keyed by team name of {weather: probability} dictionaries
+        """
+        self.stadiums = list(stadium_weather.keys())
+        self.rows = {name: i for i, name in enumerate(self.stadiums)}
+        #last row is the default clear-weather stadium used for unknown home teams
+        self.default_row = len(self.stadiums)
+
+        tables = [build_alias_table([profile.get(weather, 0.0) for weather in WEATHER_TYPES]) for profile in stadium_weather.values()]
+        tables.append(build_alias_table([1.0] + [0.0] * (len(WEATHER_TYPES) - 1)))
+        self.prob = [table[0] for table in tables]
+        self.alias = [table[1] for table in tables]
+        #numpy copies of the tables, built on the first batched draw
+        self.prob_array = None
+        self.alias_array = None
+
+
+    def row(self, home_team):
+        """
+        Return the alias table row of a home team
+
+        args:
+        home_team: name of the home team
+        """
+        return self.rows.get(home_team, self.default_row)
+
+
+    def rows_for(self, team_names):
+        """
+        Return the alias table rows of several home teams as an array
+
+        args:
+        team_names: list of team names
+        """
+        import numpy as np
+        return np.array([self.row(name) for name in team_names], dtype=np.intp)
+
+
+    def draw(self, home_team, rng=random):
+        """
+        Draw the weather of one game
+
+        args:
+        home_team: name of the home team
+        rng: random.Random instance, defaults to the global random module
+
+        return:
+        the weather condition as a string
+        """
+        r = self.row(home_team)
+        u = rng.random() * len(WEATHER_TYPES)
+        column = int(u)
+        if u - column < self.prob[r][column]:
+            return WEATHER_TYPES[column]
+        return WEATHER_TYPES[self.alias[r][column]]
+
+
+    def draw_codes(self, rows, size=(), rng=None):
+        """
+        Draw the weather of many games at once
+
+        args:
+        rows: array of alias table rows, e.g. the home team of every game in a week or season
+        size: leading shape of independent draws, e.g. (seasons,) for a batch of seasons
+        rng: numpy Generator
+
+        return:
+        int8 array of shape size + rows.shape with indices into WEATHER_TYPES
+        """
+        import numpy as np
+        if rng is None:
+            rng = np.random.default_rng()
+        rows = np.asarray(rows, dtype=np.intp)
+        shape = (size if isinstance(size, tuple) else (size,)) + rows.shape
+        u = rng.random(shape) * len(WEATHER_TYPES)
+        return self.codes_from_uniforms(rows, u)
+
+
+    def codes_from_uniforms(self, rows, u):
+        """
+        Turn scaled uniform draws in [0, len(WEATHER_TYPES)) into weather codes
+
+        args:
+        rows: array of alias table rows, broadcast against u
+        u: array of uniforms already multiplied by len(WEATHER_TYPES)
+
+        return:
+        int8 array of weather codes with the shape of u
+        """
+        import numpy as np
+        if self.prob_array is None:
+            self.prob_array = np.array(self.prob, dtype=np.float64)
+            self.alias_array = np.array(self.alias, dtype=np.int8)
+        column = u.astype(np.intp)
+        np.minimum(column, len(WEATHER_TYPES) - 1, out=column)
+        keep = (u - column) < self.prob_array[rows, column]
+        return np.where(keep, column, self.alias_array[rows, column]).astype(np.int8)
+
+
+
+#sampler over the default league's stadium profiles, built on first use
+_default_sampler = None
+
+
+def default_stadium_weather_file():
+    """
+    Return the stadium climate file of the default league, the shipped file when the league names none
+    """
+    import league
+    return league.DEFAULT_LEAGUE.stadium_weather or STADIUM_WEATHER_FILE
+
+
+
+def default_sampler():
+    """
+    Return the WeatherSampler for the default league's stadium climate file, building it once
+    """
+    global _default_sampler
+    if _default_sampler is None:
+        _default_sampler = WeatherSampler(load_stadium_weather(default_stadium_weather_file()))
+    return _default_sampler